@@ -0,0 +1,140 @@
+# monitoring/analytics.py
+
+from django.db.models import F, FloatField, Func, OuterRef, Subquery, Sum
+
+from . import archive
+from .modeling import refresh_fleet_modeled_power, unmodeled_system_ids, with_electrical_bounds
+from .models import ElectricalData, MeteorologicalData, ModeledPower, PVSystem
+
+
+def modeled_power_totals():
+    """Total modeled power (W) per system id, for systems that have a modeled series."""
+    return dict(
+        ModeledPower.objects.values_list('system').annotate(total=Sum('calculated_power')).order_by()
+    )
+
+
+def model_unmodeled_systems():
+    """Build the modeled series of systems that never had one, so fleet views include them."""
+    system_ids = unmodeled_system_ids()
+    if system_ids:
+        refresh_fleet_modeled_power(system_ids)
+
+
+def system_scores(systems, power_totals):
+    """Score out of 20 for each system with a modeled series, from its modeled power per W of panel capacity."""
+    scores = []
+
+    for system in systems:
+        if system.id not in power_totals:
+            continue
+
+        # Normalize power by system capacity and number of panels
+        normalized_power = power_totals[system.id] / (system.capacity * 1000 * system.number_of_panels)
+
+        # Apply scaling factor
+        score = min(max(normalized_power * 20, 0), 20)  # Adjusting the factor to 20 for better distribution
+
+        scores.append({
+            'system_id': system.id,
+            'name': system.name,
+            'score': score,
+            'capacity': system.capacity,
+            'num_panels': system.number_of_panels
+        })
+
+    return scores
+
+
+def system_powers(systems, power_totals):
+    """Total modeled power of each system with a modeled series."""
+    return [
+        {
+            'system_id': system.id,
+            'name': system.name,
+            'total_calculated_power': power_totals[system.id]
+        }
+        for system in systems if system.id in power_totals
+    ]
+
+
+def meteorological_sum(field):
+    """Sum of a meteo field over the outer system's [first_time, last_time]."""
+    return Subquery(
+        MeteorologicalData.objects.filter(
+            time__gte=OuterRef('first_time'), time__lte=OuterRef('last_time')
+        ).annotate(total=Func(F(field), function='SUM')).values('total')[:1],
+        output_field=FloatField(),
+    )
+
+
+def electrical_totals():
+    """Electrical sums per system id, in one grouped query plus the sums stored with archived months."""
+    totals = {
+        row['system']: row
+        for row in ElectricalData.objects.values('system').annotate(
+            total_voltage=Sum('u_dc'),
+            total_current_t1=Sum('t1'),
+        ).order_by()
+    }
+    for system_id, sums in archive.month_sums(archive.ELECTRICAL, ['u_dc', 't1']).items():
+        row = totals.setdefault(system_id, {'system': system_id, 'total_voltage': None, 'total_current_t1': None})
+        row['total_voltage'] = (row['total_voltage'] or 0) + sums['u_dc']
+        row['total_current_t1'] = (row['total_current_t1'] or 0) + sums['t1']
+    return totals
+
+
+def meteorological_totals():
+    """Meteo sums over each system's own electrical time span, per system id, across both tiers."""
+    rows = {
+        row['id']: row
+        for row in with_electrical_bounds(PVSystem.objects.all()).annotate(
+            total_gti=meteorological_sum('gti'),
+            total_air_temp=meteorological_sum('air_temp'),
+        ).values('id', 'first_time', 'last_time', 'total_gti', 'total_air_temp')
+    }
+    # Archived electrical rows widen a system's span; sum the database's meteo over the whole of it
+    for system_id, (first, last) in archive.bounds(archive.ELECTRICAL).items():
+        row = rows[system_id]
+        row['first_time'] = min(filter(None, [row['first_time'], first]))
+        row['last_time'] = max(filter(None, [row['last_time'], last]))
+        row.update(MeteorologicalData.objects.filter(
+            time__gte=row['first_time'], time__lte=row['last_time']
+        ).aggregate(total_gti=Sum('gti'), total_air_temp=Sum('air_temp')))
+
+    spans = [row for row in rows.values() if row['first_time'] is not None]
+    archived = archive.range_sums(
+        archive.METEOROLOGICAL, ['gti', 'air_temp'], [(row['first_time'], row['last_time']) for row in spans]
+    )
+    for row, sums in zip(spans, archived):
+        if sums['gti'] or sums['air_temp']:
+            row['total_gti'] = (row['total_gti'] or 0) + sums['gti']
+            row['total_air_temp'] = (row['total_air_temp'] or 0) + sums['air_temp']
+    return {
+        system_id: {'id': system_id, 'total_gti': row['total_gti'], 'total_air_temp': row['total_air_temp']}
+        for system_id, row in rows.items()
+    }
+
+
+def system_totals(systems, power_totals, electrical_totals, meteorological_totals):
+    """Electrical, modeled and meteo totals of each system with a modeled series."""
+    totals = []
+
+    for system in systems:
+        if system.id not in power_totals:
+            continue
+        # A modeled series can outlive its raw rows (detached by retention, say)
+        electrical = electrical_totals.get(system.id, {})
+        meteorological = meteorological_totals.get(system.id, {})
+
+        totals.append({
+            'system_id': system.id,
+            'name': system.name,
+            'total_voltage': electrical.get('total_voltage') or 0,
+            'total_calculated_power': power_totals[system.id],
+            'total_current_t1': electrical.get('total_current_t1') or 0,
+            'total_gti': meteorological.get('total_gti') or 0,
+            'total_air_temp': meteorological.get('total_air_temp') or 0,
+        })
+
+    return totals
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class MonitoringConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'monitoring'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import metrics, signals  # noqa: F401
+        if settings.METRICS_ENABLED:
+            metrics.install()
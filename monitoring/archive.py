@@ -0,0 +1,339 @@
+# monitoring/archive.py
+
+import os
+import uuid
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+import h5py
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+
+from . import loaders
+from .exports import HDF5_CHUNK_ROWS, TIME_UNITS
+from .models import ArchivedMonth, ElectricalData, MeteorologicalData, PVSystem
+from .partitions import add_months, is_partitioned, month_floor, partition_name, partitions
+
+ELECTRICAL = 'electrical'
+METEOROLOGICAL = 'meteorological'
+MODELS = {ELECTRICAL: ElectricalData, METEOROLOGICAL: MeteorologicalData}
+ARCHIVE_FIELDS = {
+    ELECTRICAL: ['adresse', 'i1', 'u_dc', 'p_dc', 't1', 't2', 'i_sum'],
+    METEOROLOGICAL: [
+        'gti', 'ghi', 'dni', 'dhi', 'air_temp', 'rh', 'pressure', 'wind_speed', 'wind_dir', 'wind_gust', 'rain',
+    ],
+}
+
+# Raw rows older than the archive threshold live in HDF5 files under
+# ARCHIVE_DIR, one per month (and per system, for electrical data), each
+# holding a ``time`` dataset (int64 ns since the epoch, UTC) and one float64
+# dataset per field, chunked and gzip-compressed. ArchivedMonth rows
+# catalogue the files, so finding the ones a query needs is one indexed
+# lookup. The readers below return what the database would for the same
+# range; the modeling pipeline merges both tiers through them.
+
+
+def _ns(value):
+    return pd.Timestamp(value).value
+
+
+def _timestamp(ns):
+    return pd.Timestamp(ns, tz='UTC').to_pydatetime()
+
+
+def _any_of(filters):
+    return reduce(or_, filters, Q(pk__in=[]))
+
+
+def _months(kind, system_ids=None):
+    months = ArchivedMonth.objects.filter(kind=kind)
+    if system_ids is not None:
+        months = months.filter(system_id__in=system_ids)
+    return months
+
+
+def _overlapping(system_id, lo, hi):
+    q = Q(system__isnull=True) if system_id is None else Q(system_id=system_id)
+    if lo is not None:
+        q &= Q(last_time__gte=lo)
+    if hi is not None:
+        q &= Q(first_time__lt=hi)
+    return q
+
+
+def read_month(archived, fields, lo=None, hi=None):
+    """
+    ``fields`` of an archived month's rows in [lo, hi) as typed arrays.
+
+    Only the ``time`` dataset is read whole; the range is located in it and
+    just the chunks of the other datasets covering it are decompressed.
+    """
+    with h5py.File(os.path.join(settings.ARCHIVE_DIR, archived.path), 'r') as hdf5:
+        times = hdf5['time'][:]
+        first = np.searchsorted(times, _ns(lo)) if lo is not None else 0
+        last = np.searchsorted(times, _ns(hi)) if hi is not None else len(times)
+        columns = {}
+        for field in fields:
+            if field == 'time':
+                columns[field] = times[first:last].view('datetime64[ns]')
+            elif field == 'system_id':
+                columns[field] = np.full(last - first, archived.system_id, dtype='int64')
+            else:
+                columns[field] = hdf5[field][first:last]
+    return columns
+
+
+def load_columns(kind, fields, windows):
+    """
+    ``fields`` of the archived rows in ``windows`` as typed arrays, like :func:`monitoring.loaders.load_columns`.
+
+    ``windows`` maps system ids (None for the meteo series) to ``(lo, hi)``
+    bounds, either of which may be None.
+    """
+    months = _months(kind).filter(_any_of(_overlapping(key, lo, hi) for key, (lo, hi) in windows.items()))
+    chunks = [
+        read_month(archived, fields, *windows[archived.system_id])
+        for archived in months.order_by('system_id', 'month')
+    ]
+    if not chunks:
+        return loaders.empty_columns(fields)
+    return {field: np.concatenate([chunk[field] for chunk in chunks]) for field in fields}
+
+
+def with_archived(frame, kind, fields, windows):
+    """``frame``, as loaded from the database by :func:`monitoring.loaders.load_frame`, plus the archived rows in ``windows``."""
+    archived = pd.DataFrame(load_columns(kind, fields, windows), columns=fields)
+    if archived.empty:
+        return frame
+    archived['time'] = archived['time'].dt.tz_localize('UTC')
+    return pd.concat([archived, frame], ignore_index=True)
+
+
+def bounds(kind, system_ids=None):
+    """``{system_id: (first time, last time)}`` of the archived rows (keyed None for the meteo series)."""
+    return {
+        row['system']: (row['first'], row['last'])
+        for row in _months(kind, system_ids).values('system').annotate(
+            first=Min('first_time'), last=Max('last_time'),
+        ).order_by()
+    }
+
+
+def overlaps(lo, hi, system_ids=None):
+    """Whether archived rows of the meteo series or of ``system_ids`` (default: every system) may fall in [lo, hi)."""
+    systems = Q(system__isnull=False) if system_ids is None else Q(system_id__in=system_ids)
+    months = ArchivedMonth.objects.filter(Q(kind=METEOROLOGICAL) | Q(kind=ELECTRICAL) & systems)
+    if lo is not None:
+        months = months.filter(last_time__gte=lo)
+    if hi is not None:
+        months = months.filter(first_time__lt=hi)
+    return months.exists()
+
+
+def covers(kind, lo, hi, system_id=None):
+    """Whether archived months of ``system_id``'s series (None: the meteo series) of ``kind`` overlap [lo, hi)."""
+    return _months(kind).filter(_overlapping(system_id, lo, hi)).exists()
+
+
+def has_rows(kind, lo, hi, system_id=None):
+    """Whether any archived row falls in [lo, hi]."""
+    return len(load_columns(kind, ['time'], {system_id: (lo, hi + timedelta(microseconds=1))})['time']) > 0
+
+
+def last_before(kind, time, system_ids=None):
+    """``{system_id: time of the last archived row before time}``."""
+    months = _months(kind, system_ids).filter(first_time__lt=time)
+    latest = months.values('system').annotate(month=Max('month')).order_by()
+    result = {}
+    for archived in months.filter(_any_of(Q(system=row['system'], month=row['month']) for row in latest)):
+        if archived.last_time < time:
+            result[archived.system_id] = archived.last_time
+        else:
+            times = read_month(archived, ['time'], hi=time)['time']
+            result[archived.system_id] = _timestamp(times[-1].view('int64'))
+    return result
+
+
+def first_after(kind, time, system_ids=None, inclusive=False):
+    """``{system_id: time of the first archived row after (or with inclusive, at) time}``."""
+    months = _months(kind, system_ids).filter(**{'last_time__gte' if inclusive else 'last_time__gt': time})
+    earliest = months.values('system').annotate(month=Min('month')).order_by()
+    result = {}
+    for archived in months.filter(_any_of(Q(system=row['system'], month=row['month']) for row in earliest)):
+        if archived.first_time > time or (inclusive and archived.first_time == time):
+            result[archived.system_id] = archived.first_time
+        else:
+            lo = time if inclusive else time + timedelta(microseconds=1)
+            times = read_month(archived, ['time'], lo=lo)['time']
+            result[archived.system_id] = _timestamp(times[0].view('int64'))
+    return result
+
+
+def month_sums(kind, fields, system_ids=None):
+    """``{system_id: {field: sum}}`` over all archived rows, from the sums stored at archive time."""
+    totals = {}
+    for system_id, sums in _months(kind, system_ids).values_list('system', 'sums'):
+        system_totals = totals.setdefault(system_id, dict.fromkeys(fields, 0.0))
+        for field in fields:
+            system_totals[field] += sums.get(field, 0.0)
+    return totals
+
+
+def range_sums(kind, fields, ranges):
+    """
+    Sums of ``fields`` over the archived rows of the shared series within each [lo, hi] of ``ranges``.
+
+    Months lying wholly in a range use the sums stored at archive time; only
+    the months a range cuts through are read.
+    """
+    months = list(_months(kind).filter(_any_of(_overlapping(None, lo, hi) for lo, hi in ranges)).order_by('month'))
+    results = []
+    for lo, hi in ranges:
+        sums = dict.fromkeys(fields, 0.0)
+        for archived in months:
+            if archived.last_time < lo or archived.first_time > hi:
+                continue
+            if archived.first_time >= lo and archived.last_time <= hi:
+                month = {field: archived.sums.get(field, 0.0) for field in fields}
+            else:
+                columns = read_month(archived, fields, lo, hi + timedelta(microseconds=1))
+                month = {field: float(np.nansum(columns[field])) for field in fields}
+            for field in fields:
+                sums[field] += month[field]
+        results.append(sums)
+    return results
+
+
+def _path(kind, month, system_id):
+    # A fresh name per write, so readers of the previous file are never cut off mid-read
+    name = f'{month:%Y-%m}-{uuid.uuid4().hex[:8]}.h5'
+    return os.path.join(kind, name) if system_id is None else os.path.join(kind, str(system_id), name)
+
+
+def _write(path, columns, fields):
+    path = os.path.join(settings.ARCHIVE_DIR, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    size = len(columns['time'])
+    with h5py.File(path, 'w') as hdf5:
+        for name in ['time', *fields]:
+            hdf5.create_dataset(
+                name,
+                data=columns[name].view('int64') if name == 'time' else columns[name],
+                chunks=(min(HDF5_CHUNK_ROWS, size),),
+                shuffle=True,
+                compression='gzip',
+                compression_opts=4,
+            )
+        hdf5['time'].attrs['units'] = TIME_UNITS
+
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(os.path.join(settings.ARCHIVE_DIR, path))
+        except FileNotFoundError:
+            pass
+
+
+def _month_table(kind, month):
+    """The table holding ``month`` of ``kind``: its partition when the electrical table is partitioned."""
+    table = MODELS[kind]._meta.db_table
+    if kind == ELECTRICAL and is_partitioned() and partition_name(month) in dict(partitions()):
+        return partition_name(month), True
+    return table, False
+
+
+def archive_month(kind, month, system_ids=None):
+    """
+    Move the raw rows of ``month`` into HDF5 files, one per system for electrical data.
+
+    Rows join any already archived for the month. On PostgreSQL writers to
+    the month's table (its partition, when partitioned) are locked out while
+    its rows are read, written out and deleted in one transaction, so no row
+    is lost or kept twice; an emptied partition is truncated rather than
+    deleted from. Returns the number of rows moved.
+    """
+    model, fields = MODELS[kind], ARCHIVE_FIELDS[kind]
+    lo, hi = month, add_months(month, 1)
+    if kind == ELECTRICAL:
+        keys = PVSystem.objects.order_by('id')
+        if system_ids is not None:
+            keys = keys.filter(id__in=system_ids)
+        keys = list(keys.values_list('id', flat=True))
+    else:
+        keys = [None]
+
+    moved, written, replaced = 0, [], []
+    try:
+        with transaction.atomic():
+            table, partition = _month_table(kind, month)
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LOCK TABLE {table} IN SHARE MODE')
+
+            for key in keys:
+                queryset = model.objects.filter(time__gte=lo, time__lt=hi)
+                if key is not None:
+                    queryset = queryset.filter(system_id=key)
+                columns = loaders.load_columns(queryset, ['time', *fields])
+                rows = len(columns['time'])
+                if not rows:
+                    continue
+                existing = ArchivedMonth.objects.filter(kind=kind, system_id=key, month=month).first()
+                if existing is not None:
+                    previous = read_month(existing, ['time', *fields])
+                    columns = {field: np.concatenate([previous[field], columns[field]]) for field in columns}
+                    replaced.append(existing.path)
+                order = np.argsort(columns['time'], kind='stable')
+                columns = {field: values[order] for field, values in columns.items()}
+
+                path = _path(kind, month, key)
+                _write(path, columns, fields)
+                written.append(path)
+                times = columns['time'].view('int64')
+                ArchivedMonth.objects.update_or_create(
+                    kind=kind, system_id=key, month=month,
+                    defaults={
+                        'path': path,
+                        'rows': len(times),
+                        'first_time': _timestamp(times[0]),
+                        'last_time': _timestamp(times[-1]),
+                        'sums': {field: float(np.nansum(columns[field])) for field in fields},
+                    },
+                )
+                moved += rows
+
+            if moved:
+                if partition and system_ids is None:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'TRUNCATE {table}')
+                else:
+                    queryset = model.objects.filter(time__gte=lo, time__lt=hi)
+                    if kind == ELECTRICAL:
+                        queryset = queryset.filter(system_id__in=keys)
+                    queryset.delete()
+            transaction.on_commit(lambda: _remove(replaced))
+    except BaseException:
+        _remove(written)
+        raise
+    return moved
+
+
+def archive_before(cutoff, kinds=(ELECTRICAL, METEOROLOGICAL)):
+    """Archive every whole month of raw data before ``cutoff``; returns ``{(kind, month): rows moved}``."""
+    archived = {}
+    for kind in kinds:
+        first = MODELS[kind].objects.filter(time__lt=cutoff).aggregate(first=Min('time'))['first']
+        if first is None:
+            continue
+        month = month_floor(first)
+        while add_months(month, 1) <= cutoff:
+            rows = archive_month(kind, month)
+            if rows:
+                archived[(kind, month)] = rows
+            month = add_months(month, 1)
+    return archived
@@ -0,0 +1,506 @@
+# monitoring/benchmarks.py
+
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+import pandas as pd
+import h5py
+import pvlib
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from .cache import get_cache
+from .exports import EXPORT_FIELDS, write_electrical_hdf5
+from .importers import ELECTRICAL_COLUMNS, ELECTRICAL_TIME_FORMAT, import_file, write_frame, copy_available
+from .loaders import load_frame
+from .modeling import (
+    RESAMPLE_RULE, TEMP_COEFF, meteorological_grid, model_frame, model_power, refresh_fleet_modeled_power,
+    refresh_modeled_power, resample_meteorological,
+)
+from .parallel import model_frame_parallel
+from .models import ElectricalData, MeteorologicalData, PVSystem
+from .rollups import update_electrical_rollups, update_meteorological_rollups
+from .signals import deferred
+from .serializers import ElectricalDataSerializer
+from .synthetic import create_systems, generate_fleet
+
+
+def synthetic_merged_frame(rows, seed=0):
+    """A merged electrical/meteorological frame with a plausible diurnal irradiance profile."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2023-01-01', periods=rows, freq=RESAMPLE_RULE, tz='UTC')
+    hour = index.hour.to_numpy() + index.minute.to_numpy() / 60
+    gti = np.clip(1000 * np.sin((hour - 6) / 12 * np.pi), -5, None) + rng.normal(0, 20, rows)
+    return pd.DataFrame({
+        'gti': gti,
+        'air_temp': 20 + 8 * np.sin((hour - 9) / 24 * 2 * np.pi) + rng.normal(0, 1, rows),
+        'wind_speed': np.abs(rng.normal(3, 1.5, rows)),
+        't1': rng.normal(30, 5, rows),
+        't2': rng.normal(30, 5, rows),
+        'u_dc': rng.normal(600, 20, rows),
+    }, index=index)
+
+
+def legacy_model_power(merged_df, capacity):
+    """The original per-row ``iterrows`` loop, kept as a correctness and speed baseline."""
+    p_stc = capacity * 1000
+    powers = []
+    for _, row in merged_df.iterrows():
+        gti = row['gti']
+        if gti <= 0:
+            powers.append(0)
+            continue
+        temp_cell = pvlib.temperature.pvsyst_cell(
+            poa_global=gti,
+            temp_air=row['air_temp'],
+            wind_speed=row['wind_speed']
+        )
+        p_dc = pvlib.pvsystem.pvwatts_dc(gti, temp_cell, p_stc, gamma_pdc=TEMP_COEFF)
+        if not np.isfinite(p_dc) or np.isnan(p_dc):
+            p_dc = 0
+        powers.append(p_dc)
+    return np.asarray(powers, dtype=float)
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def bench_modeling(sizes=(10_000, 100_000, 1_000_000), capacity=16.56, legacy_limit=100_000):
+    """
+    Time the vectorized model against the legacy loop for each frame size.
+
+    The legacy loop is only run up to ``legacy_limit`` rows; beyond that its
+    time is extrapolated linearly from the largest measured size.
+    """
+    results = []
+    legacy_rate = None
+    for rows in sizes:
+        merged_df = synthetic_merged_frame(rows)
+        vector_seconds, _ = _timed(model_power, merged_df, capacity)
+        if rows <= legacy_limit:
+            legacy_seconds, _ = _timed(legacy_model_power, merged_df, capacity)
+            legacy_rate = legacy_seconds / rows
+            estimated = False
+        else:
+            if legacy_rate is None:
+                sample = merged_df.iloc[:min(rows, legacy_limit)]
+                legacy_rate = _timed(legacy_model_power, sample, capacity)[0] / len(sample)
+            legacy_seconds = legacy_rate * rows
+            estimated = True
+        results.append({
+            'rows': rows,
+            'vectorized_s': vector_seconds,
+            'legacy_s': legacy_seconds,
+            'legacy_estimated': estimated,
+            'speedup': legacy_seconds / vector_seconds if vector_seconds else float('inf'),
+        })
+    return results
+
+
+def _peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@contextmanager
+def scratch_system(rows, seed=0):
+    """
+    A throwaway system with ``rows`` minutes of electrical data.
+
+    Everything runs inside a transaction that is rolled back on exit, so
+    benchmarks leave the database as they found it.
+    """
+    rng = np.random.default_rng(seed)
+    with transaction.atomic():
+        system = PVSystem.objects.create(
+            name='benchmark', capacity=10.0, inverter_type='benchmark', number_of_panels=25,
+            technology='Mono-Si', year_of_installation=2020,
+        )
+        chunk = 100_000
+        start = pd.Timestamp('2020-01-01', tz='UTC')
+        use_copy = copy_available()
+        for offset in range(0, rows, chunk):
+            size = min(chunk, rows - offset)
+            write_frame(ElectricalData, pd.DataFrame({
+                'system_id': system.id,
+                'time': pd.date_range(start + pd.Timedelta(minutes=offset), periods=size, freq='1min'),
+                'adresse': 1,
+                'i1': rng.normal(8, 1, size),
+                'u_dc': rng.normal(600, 20, size),
+                'p_dc': rng.normal(4000, 500, size),
+                't1': rng.normal(30, 5, size),
+                't2': rng.normal(30, 5, size),
+                'i_sum': rng.normal(8, 1, size),
+            }), use_copy)
+        yield system
+        transaction.set_rollback(True)
+
+
+LOADER_FIELDS = ['time', 'i1', 'u_dc', 'p_dc', 't1', 't2', 'i_sum']
+
+
+def legacy_load(queryset):
+    """How the views built frames before the columnar loader."""
+    frame = pd.DataFrame.from_records(queryset.values())
+    frame.set_index('time', inplace=True)
+    return frame
+
+
+def columnar_load(queryset):
+    return load_frame(queryset, LOADER_FIELDS, index='time')
+
+
+def bench_loader(rows=1_000_000):
+    """Latency and peak traced memory of the legacy ``values()`` path against the columnar loader."""
+    results = []
+    with scratch_system(rows) as system:
+        queryset = ElectricalData.objects.filter(system=system).order_by('time')
+        for name, loader in [('values() + from_records', legacy_load), ('columnar loader', columnar_load)]:
+            seconds, _ = _timed(loader, queryset)
+            results.append({
+                'loader': name,
+                'rows': rows,
+                'seconds': seconds,
+                'peak_bytes': _peak_memory(loader, queryset),
+            })
+    return results
+
+
+def _json_round_trip(queryset):
+    content = JSONRenderer().render(ElectricalDataSerializer(queryset, many=True).data)
+    json.loads(content)
+    return len(content)
+
+
+def _hdf5_round_trip(queryset):
+    with tempfile.TemporaryFile() as target:
+        write_electrical_hdf5(target, queryset)
+        size = target.seek(0, 2)
+        with h5py.File(target, 'r') as hdf5:
+            for group in hdf5['electrical'].values():
+                for name in ['time', *EXPORT_FIELDS]:
+                    group[name][:]
+        return size
+
+
+def bench_export(rows=1_000_000):
+    """Throughput and payload size of exporting ``rows`` electrical rows as JSON vs HDF5, including reading them back."""
+    results = []
+    with scratch_system(rows) as system:
+        queryset = ElectricalData.objects.filter(system=system).order_by('time')
+        for name, export in [('JSON viewset serializer', _json_round_trip), ('HDF5 export', _hdf5_round_trip)]:
+            seconds, size = _timed(export, queryset)
+            results.append({
+                'format': name,
+                'rows': rows,
+                'seconds': seconds,
+                'rows_per_s': rows / seconds,
+                'bytes': size,
+            })
+    return results
+
+
+def synthetic_readings(system_id, rows, seed=0):
+    """``rows`` one-minute electrical readings as a SCADA gateway would post them."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2021-01-01', periods=rows, freq='1min', tz='UTC')
+    u_dc = rng.normal(600, 20, rows)
+    return [
+        {'system': system_id, 'time': time.isoformat(), 'u_dc': u, 'p_dc': u * 6.5, 'i1': u / 75, 't1': 30.0}
+        for time, u in zip(times, u_dc.tolist())
+    ]
+
+
+def bench_ingest(rows=100_000, batch_size=5000, single_rows=500):
+    """
+    Sustained rows/s of the batch endpoint against one POST per reading.
+
+    Requests go through the viewset (authentication, parsing, validation,
+    the insert and the derived-table signals) in a rolled-back transaction.
+    """
+    from .views import ElectricalDataViewSet
+
+    factory = APIRequestFactory()
+    results = []
+    with scratch_system(0) as system:
+        user = User.objects.create(username='benchmark')
+        readings = synthetic_readings(system.id, single_rows + rows)
+
+        def post(view, payload):
+            request = factory.post('/', payload, format='json')
+            force_authenticate(request, user)
+            response = view(request)
+            assert response.status_code == 201, response.data
+
+        create = ElectricalDataViewSet.as_view({'post': 'create'})
+        started = time.perf_counter()
+        for reading in readings[:single_rows]:
+            post(create, reading)
+        # Including the refresh of the derived tables the requests deferred
+        deferred.flush()
+        seconds = time.perf_counter() - started
+        results.append({'mode': 'one POST per reading', 'rows': single_rows, 'seconds': seconds})
+
+        batch = ElectricalDataViewSet.as_view({'post': 'batch'})
+        started = time.perf_counter()
+        for offset in range(single_rows, single_rows + rows, batch_size):
+            post(batch, readings[offset:offset + batch_size])
+        seconds = time.perf_counter() - started
+        results.append({'mode': f'batches of {batch_size}', 'rows': rows, 'seconds': seconds})
+
+    for result in results:
+        result['rows_per_s'] = result['rows'] / result['seconds']
+    return results
+
+
+def synthetic_fleet_frames(systems, days, seed=0):
+    """Raw 1-minute electrical rows of ``systems`` systems (with gaps) and the resampled meteo series."""
+    rng = np.random.default_rng(seed)
+    minutes = days * 24 * 60
+    times = pd.date_range('2023-01-01', periods=minutes, freq='1min', tz='UTC')
+    frames = []
+    for system_id in range(1, systems + 1):
+        present = rng.random(minutes) > 0.1
+        frames.append(pd.DataFrame({
+            'system_id': system_id,
+            'time': times[present],
+            't1': rng.normal(30, 5, present.sum()),
+            't2': rng.normal(30, 5, present.sum()),
+            'u_dc': rng.normal(600, 20, present.sum()),
+        }))
+    meteorological = resample_meteorological(pd.DataFrame({
+        'time': times,
+        'gti': np.clip(rng.normal(400, 300, minutes), 0, None),
+        'air_temp': rng.normal(25, 3, minutes),
+        'wind_speed': rng.uniform(0, 5, minutes),
+    }))
+    capacities = {system_id: 10.0 + system_id for system_id in range(1, systems + 1)}
+    return pd.concat(frames, ignore_index=True), meteorological, capacities
+
+
+def bench_parallel_modeling(systems=8, days=365, workers=(1, 2, 4, 8), chunk='30D'):
+    """Wall time of the modeling pipeline in-process and on process pools of each size in ``workers``."""
+    electrical, meteorological, capacities = synthetic_fleet_frames(systems, days)
+    baseline, _ = _timed(model_frame, electrical, meteorological, capacities)
+    results = [{'workers': 'in-process', 'rows': len(electrical), 'seconds': baseline, 'speedup': 1.0}]
+    for count in workers:
+        seconds, _ = _timed(model_frame_parallel, electrical, meteorological, capacities, count, chunk)
+        results.append({'workers': count, 'rows': len(electrical), 'seconds': seconds, 'speedup': baseline / seconds})
+    return results
+
+
+# The suite: every hot path measured against a synthetic fleet seeded into
+# a throwaway database (see the ``benchmark suite`` command), with results
+# saved as JSON so runs can be compared.
+
+FLEETS = {
+    'small': (3, 30),
+    'medium': (30, 365),
+    'large': (300, 1825),
+}
+
+
+def parse_fleet(value):
+    """A fleet preset name or ``<systems>x<days>``, as ``(systems, days)``."""
+    if value in FLEETS:
+        return FLEETS[value]
+    systems, _, days = value.partition('x')
+    try:
+        return int(systems), int(days)
+    except ValueError:
+        raise ValueError(f"Expected one of {', '.join(FLEETS)} or <systems>x<days>, got {value!r}")
+
+
+def seed_fleet(systems, days, start='2023-01-01', seed=0):
+    """
+    Create ``systems`` synthetic PV systems with ``days`` of 1-minute data (see :mod:`monitoring.synthetic`).
+
+    The rollups are rebuilt at the end. Returns the systems.
+    """
+    fleet = create_systems(systems, seed)
+    generate_fleet(fleet, start, days, seed)
+    start = pd.Timestamp(start, tz='UTC')
+    end = start + pd.Timedelta(days=days)
+    for system in fleet:
+        update_electrical_rollups(system.id, start, end)
+    update_meteorological_rollups(start, end)
+    return fleet
+
+
+def measure(func, repeat=3, setup=None):
+    """
+    Latency of ``func`` over ``repeat`` timed calls, then its query count and peak traced memory over one more.
+
+    ``setup`` runs before every call, outside the measurement.
+    """
+    latencies = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    if setup is not None:
+        setup()
+    with CaptureQueriesContext(connection) as queries:
+        peak_bytes = _peak_memory(func)
+    return {
+        'repeat': repeat,
+        'latency_s': {
+            'min': min(latencies), 'median': statistics.median(latencies), 'max': max(latencies),
+        },
+        'peak_bytes': peak_bytes,
+        'queries': len(queries),
+    }
+
+
+def _get(client, path, params=None):
+    def call():
+        response = client.get(path, params or {})
+        assert response.status_code == 200, (path, response.status_code)
+        # Streaming responses only do their work as they are consumed
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+    return call
+
+
+def _electrical_csv(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        'Time': pd.date_range('2030-01-01', periods=rows, freq='1min').strftime(ELECTRICAL_TIME_FORMAT),
+        'Adresse': 1,
+        **{column: rng.normal(100, 10, rows) for column in ELECTRICAL_COLUMNS if column != 'Adresse'},
+    }).to_csv(path, index=False)
+
+
+def bench_suite(systems, days, repeat=3, import_rows=100_000, seed=0):
+    """
+    Seed a fleet into the current database and measure every hot path against it.
+
+    Cases cover the modeling functions (with a cold and a warm meteo grid),
+    each analytics endpoint with a cold cache (plus one cached hit), the
+    viewsets and the CSV importer. Requests go through the full URL, auth and
+    rendering stack. Returns the fleet description and one result per case.
+    """
+    started = time.perf_counter()
+    fleet = seed_fleet(systems, days, seed=seed)
+    seed_seconds = time.perf_counter() - started
+    system = fleet[0]
+    day = pd.Timestamp('2023-01-01', tz='UTC') + pd.Timedelta(days=days // 2)
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create(username='benchmark'))
+    def cold_cache():
+        get_cache().clear()
+
+    def cold():
+        get_cache().clear()
+        meteorological_grid.clear()
+
+    cases = [
+        ('modeling: refresh fleet (cold grid)', refresh_fleet_modeled_power, cold),
+        ('modeling: refresh fleet (warm grid)', refresh_fleet_modeled_power, None),
+        ('modeling: refresh one system, one day',
+         lambda: refresh_modeled_power(system, day, day + pd.Timedelta(days=1)), None),
+        ('GET /api/pvsystems/scores/', _get(client, '/api/pvsystems/scores/'), cold_cache),
+        ('GET /api/totals-p_dc/', _get(client, '/api/totals-p_dc/'), cold_cache),
+        ('GET /api/system-totals/', _get(client, '/api/system-totals/'), cold_cache),
+        ('GET /api/system-totals/ (cached)', _get(client, '/api/system-totals/'), None),
+        ('GET /api/pvsystems/<id>/calculate/',
+         _get(client, f'/api/pvsystems/{system.id}/calculate/'), cold_cache),
+        ('GET /api/pvsystems/<id>/calculate/?format=ndjson',
+         _get(client, f'/api/pvsystems/{system.id}/calculate/', {'format': 'ndjson'}), None),
+        ('GET /api/pvsystems/<id>/calculate/?max_points=1000',
+         _get(client, f'/api/pvsystems/{system.id}/calculate/', {'max_points': 1000}), cold_cache),
+        ('GET /api/kpis/?resolution=1d', _get(client, '/api/kpis/', {'resolution': '1d'}), cold_cache),
+        ('GET /api/kpis/?resolution=1h&system=<id>',
+         _get(client, '/api/kpis/', {'resolution': '1h', 'system': system.id}), cold_cache),
+        ('GET /api/rollups/?resolution=1h&system=<id>',
+         _get(client, '/api/rollups/', {'resolution': '1h', 'system': system.id}), None),
+        ('GET /api/pvsystems/', _get(client, '/api/pvsystems/'), None),
+        ('GET /api/electricaldata/', _get(client, '/api/electricaldata/'), None),
+        ('GET /api/electricaldata/?system=<id>&start&end (one day)', _get(client, '/api/electricaldata/', {
+            'system': system.id, 'start': day.isoformat(), 'end': (day + pd.Timedelta(days=1)).isoformat(),
+        }), None),
+        ('GET /api/electricaldata/?system=<id>&max_points=1000',
+         _get(client, '/api/electricaldata/', {'system': system.id, 'max_points': 1000}), None),
+        ('GET /api/meteorologicaldata/', _get(client, '/api/meteorologicaldata/'), None),
+    ]
+
+    results = []
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for name, func, setup in cases:
+            results.append({'case': name, **measure(func, repeat, setup)})
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'electrical.csv')
+        _electrical_csv(path, import_rows, seed)
+        target = PVSystem.objects.create(
+            name='Import target', capacity=10.0, inverter_type='Synthetic', number_of_panels=25,
+            technology='Mono-Si', year_of_installation=2020,
+        )
+        result = measure(
+            lambda: import_file(ElectricalData, path, target.id),
+            repeat, setup=lambda: ElectricalData.objects.filter(system=target).delete(),
+        )
+        result['rows_per_s'] = import_rows / result['latency_s']['median']
+        results.append({'case': f'import_file: {import_rows} electrical rows', **result})
+
+    return {
+        'systems': systems,
+        'days': days,
+        'electrical_rows': ElectricalData.objects.exclude(system=target).count(),
+        'meteorological_rows': MeteorologicalData.objects.count(),
+        'seed_s': seed_seconds,
+        'cases': results,
+    }
+
+
+def environment():
+    """What a result was measured on, saved alongside it."""
+    return {
+        'created_at': datetime.now(dt_timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'database': connection.vendor,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results, baseline):
+    """``[(fleet, case, baseline median, median, ratio)]`` for the cases two suite results share."""
+    def medians(run):
+        return {
+            ((fleet['systems'], fleet['days']), case['case']): case['latency_s']['median']
+            for fleet in run['fleets'] for case in fleet['cases']
+        }
+
+    before, after = medians(baseline), medians(results)
+    return [
+        (key[0], key[1], before[key], after[key], after[key] / before[key] if before[key] else float('inf'))
+        for key in after if key in before
+    ]
@@ -0,0 +1,159 @@
+# monitoring/cache.py
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count, Max
+from rest_framework.response import Response
+
+from .metrics import analytics_cache_requests
+from .models import ElectricalData, MeteorologicalData, PVSystem
+from .renderers import StreamingRenderer
+
+CACHE_ALIAS = 'analytics'
+METEOROLOGICAL = 'meteo'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _watermark_key(scope):
+    return f'watermark:{scope}'
+
+
+def _watermark_timeout(cache):
+    # Writes invalidate watermarks in the cache of the process that made them. A
+    # per-process cache never hears about other workers' or management commands'
+    # writes, so there watermarks expire after ANALYTICS_WATERMARK_TIMEOUT instead
+    return settings.ANALYTICS_WATERMARK_TIMEOUT if isinstance(cache, LocMemCache) else None
+
+
+def get_watermarks(system_ids):
+    """
+    ``(max time, row count)`` of each system's electrical data and of the meteo data.
+
+    Watermarks live in the cache until new rows invalidate them (or, in a
+    per-process cache, for ``ANALYTICS_WATERMARK_TIMEOUT`` seconds), so
+    steady state costs one cache round trip; misses are filled with one
+    grouped query per table.
+    """
+    cache = get_cache()
+    scopes = [*system_ids, METEOROLOGICAL]
+    cached = cache.get_many([_watermark_key(scope) for scope in scopes])
+    watermarks = {scope: cached.get(_watermark_key(scope)) for scope in scopes}
+
+    missing = [scope for scope in system_ids if watermarks[scope] is None]
+    if missing:
+        rows = ElectricalData.objects.filter(system_id__in=missing).values('system').annotate(
+            last=Max('time'), rows=Count('id')
+        ).order_by()
+        found = {row['system']: (row['last'], row['rows']) for row in rows}
+        for system_id in missing:
+            watermarks[system_id] = found.get(system_id, (None, 0))
+    if watermarks[METEOROLOGICAL] is None:
+        meteo = MeteorologicalData.objects.aggregate(last=Max('time'), rows=Count('id'))
+        watermarks[METEOROLOGICAL] = (meteo['last'], meteo['rows'])
+
+    cache.set_many({
+        _watermark_key(scope): watermarks[scope]
+        for scope in scopes if cached.get(_watermark_key(scope)) is None
+    }, timeout=_watermark_timeout(cache))
+    return watermarks
+
+
+def invalidate_watermarks(system_ids=None):
+    """Drop the watermarks of ``system_ids`` (or of the meteo data when None) after new rows arrive."""
+    scopes = [METEOROLOGICAL] if system_ids is None else system_ids
+    get_cache().delete_many([_watermark_key(scope) for scope in scopes])
+
+
+def _record(endpoint, outcome):
+    analytics_cache_requests.inc(endpoint=endpoint, outcome=outcome)
+    cache = get_cache()
+    key = f'stats:{endpoint}:{outcome}'
+    # add() is a no-op when the counter exists, making incr() safe
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+def cache_stats(endpoints):
+    cache = get_cache()
+    keys = [f'stats:{endpoint}:{outcome}' for endpoint in endpoints for outcome in ('hits', 'misses')]
+    counters = cache.get_many(keys)
+    stats = {}
+    for endpoint in endpoints:
+        hits = counters.get(f'stats:{endpoint}:hits', 0)
+        misses = counters.get(f'stats:{endpoint}:misses', 0)
+        stats[endpoint] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else None,
+        }
+    return stats
+
+
+CACHED_ENDPOINTS = []
+
+
+def lookup(endpoint, kwargs, query_params, system_kwarg=None):
+    """
+    ``(key, data)`` for a call of ``endpoint``; ``data`` is None on a miss.
+
+    The key covers the endpoint, its URL kwargs and query parameters, the
+    PV system definitions and the data watermarks of the systems involved
+    (the one named by ``system_kwarg``, or every system), so any write that
+    moves a watermark makes old entries unreachable.
+    """
+    systems = PVSystem.objects.order_by('id')
+    if system_kwarg is not None:
+        systems = systems.filter(id=kwargs[system_kwarg])
+    definitions = list(systems.values_list('id', 'name', 'capacity', 'number_of_panels'))
+    watermarks = get_watermarks([definition[0] for definition in definitions])
+
+    fingerprint = repr((
+        endpoint,
+        sorted(kwargs.items()),
+        sorted(query_params.lists()),
+        definitions,
+        sorted(watermarks.items(), key=lambda item: str(item[0])),
+    ))
+    key = f'{endpoint}:{hashlib.sha256(fingerprint.encode()).hexdigest()}'
+
+    data = get_cache().get(key)
+    _record(endpoint, 'misses' if data is None else 'hits')
+    return key, data
+
+
+def store(key, data):
+    get_cache().set(key, data)
+
+
+def cached_analytics(endpoint, system_kwarg=None):
+    """
+    Cache a DRF function view's successful response data under :func:`lookup`'s key.
+
+    Requests for a streaming format bypass the cache entirely.
+    """
+    if endpoint not in CACHED_ENDPOINTS:
+        CACHED_ENDPOINTS.append(endpoint)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if isinstance(request.accepted_renderer, StreamingRenderer):
+                return view(request, *args, **kwargs)
+
+            key, data = lookup(endpoint, kwargs, request.query_params, system_kwarg)
+            if data is not None:
+                return Response(data)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                store(key, response.data)
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,76 @@
+# monitoring/downsampling.py
+
+import numpy as np
+
+from .profiling import phase
+
+DOWNSAMPLE_MODES = ['lttb', 'minmax']
+MAX_POINTS_LIMIT = 10_000
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps out of ``(x, y)``.
+
+    The first and last points are always kept; the rest are split into
+    ``threshold - 2`` buckets and each contributes the point forming the
+    largest triangle with the previously kept point and the next bucket's
+    mean. Bucket means are computed in one pass and each bucket's areas are
+    vectorized, leaving a Python loop over buckets only.
+    """
+    size = len(x)
+    if threshold >= size:
+        return np.arange(size)
+    if threshold < 3:
+        return np.array([0, size - 1])[:max(threshold, 0)]
+
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, size - 1, threshold - 1).astype(int)
+    counts = np.diff(edges)
+    # Mean of every bucket, plus the last point standing in as the bucket after the last one
+    mean_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, size - 1
+    previous = 0
+    for bucket, (lo, hi) in enumerate(zip(edges[:-1], edges[1:])):
+        ax, ay = x[previous], y[previous]
+        cx, cy = mean_x[bucket + 1], mean_y[bucket + 1]
+        areas = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        previous = lo + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(y, threshold):
+    """
+    Indices of the minimum and maximum of ``y`` in each of ``threshold // 2`` equal buckets.
+
+    Sorting by (bucket, value) puts every bucket's minimum first and maximum
+    last, so both are found without a Python loop.
+    """
+    size = len(y)
+    buckets = threshold // 2
+    if threshold >= size or buckets < 1:
+        return np.arange(min(size, max(threshold, 0)))
+
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(0, size, buckets + 1).astype(int)
+    bucket_ids = np.repeat(np.arange(buckets), np.diff(edges))
+    order = np.lexsort((y, bucket_ids))
+    return np.unique(np.concatenate([order[edges[:-1]], order[edges[1:] - 1]]))
+
+
+def downsample(frame, value_column, max_points, mode='lttb'):
+    """The rows of time-ordered ``frame`` kept when reducing ``value_column`` to at most ``max_points``."""
+    if len(frame) <= max_points:
+        return frame
+    with phase('downsample'):
+        if mode == 'minmax':
+            indices = minmax_indices(frame[value_column].to_numpy(), max_points)
+        else:
+            x = frame['time'].to_numpy(dtype='datetime64[ns]').view('int64')
+            indices = lttb_indices(x, frame[value_column].to_numpy(), max_points)
+        return frame.iloc[indices]
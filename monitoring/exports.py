@@ -0,0 +1,70 @@
+# monitoring/exports.py
+
+import h5py
+import numpy as np
+
+from .loaders import iter_columns
+
+EXPORT_FIELDS = ['i1', 'u_dc', 'p_dc', 't1', 't2', 'i_sum']
+DEFAULT_CHUNK_SIZE = 100_000
+HDF5_CHUNK_ROWS = 65_536
+TIME_UNITS = 'nanoseconds since 1970-01-01T00:00:00Z'
+
+
+def _dataset(group, name, dtype):
+    return group.create_dataset(
+        name,
+        shape=(0,),
+        maxshape=(None,),
+        dtype=dtype,
+        chunks=(HDF5_CHUNK_ROWS,),
+        shuffle=True,
+        compression='gzip',
+        compression_opts=4,
+    )
+
+
+def _append(dataset, values):
+    size = dataset.shape[0]
+    dataset.resize((size + len(values),))
+    dataset[size:] = values
+
+
+def _system_group(root, system_id):
+    group = root.create_group(str(system_id))
+    group.attrs['system_id'] = system_id
+    _dataset(group, 'time', 'int64').attrs['units'] = TIME_UNITS
+    for field in EXPORT_FIELDS:
+        _dataset(group, field, 'float64')
+    return group
+
+
+def write_electrical_hdf5(target, queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write the electrical rows of ``queryset`` to ``target`` (a path or binary file) as HDF5.
+
+    Each system gets a group ``/electrical/<system id>`` holding a ``time``
+    dataset (int64 nanoseconds since the Unix epoch, UTC) and one float64
+    dataset per measurement with NaN for NULL. Datasets are chunked and
+    gzip-compressed, and are appended to ``chunk_size`` rows at a time as they
+    come off the server-side cursor. Returns the number of rows written.
+    """
+    rows = 0
+    with h5py.File(target, 'w') as hdf5:
+        root = hdf5.create_group('electrical')
+        groups = {}
+        for chunk in iter_columns(
+            queryset.order_by('system_id', 'time'), ['system_id', 'time', *EXPORT_FIELDS], chunk_size
+        ):
+            # Rows are sorted by system, so each system is one contiguous run of the chunk
+            system_ids, starts = np.unique(chunk['system_id'], return_index=True)
+            bounds = [*starts[1:], len(chunk['system_id'])]
+            for system_id, lo, hi in zip(system_ids.tolist(), starts, bounds):
+                if system_id not in groups:
+                    groups[system_id] = _system_group(root, system_id)
+                group = groups[system_id]
+                _append(group['time'], chunk['time'][lo:hi].view('int64'))
+                for field in EXPORT_FIELDS:
+                    _append(group[field], chunk[field][lo:hi])
+            rows += len(chunk['system_id'])
+    return rows
@@ -0,0 +1,86 @@
+# monitoring/filters.py
+
+from datetime import datetime, time
+
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .downsampling import DOWNSAMPLE_MODES, MAX_POINTS_LIMIT
+from .models import ElectricalData
+
+
+def parse_time_param(request, name):
+    """Read an ISO 8601 date or datetime query parameter as an aware datetime, or None."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValidationError({name: 'Enter a valid ISO 8601 date or datetime.'})
+        parsed = datetime.combine(date, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_system_param(request, name='system'):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'A valid integer is required.'})
+
+
+def parse_downsample_params(request):
+    """``(max_points, mode)`` from ``?max_points=<n>&downsample=lttb|minmax``; max_points is None when absent."""
+    value = request.query_params.get('max_points')
+    if not value:
+        return None, None
+    try:
+        max_points = int(value)
+    except ValueError:
+        raise ValidationError({'max_points': 'A valid integer is required.'})
+    if not 3 <= max_points <= MAX_POINTS_LIMIT:
+        raise ValidationError({'max_points': f'Ensure this value is between 3 and {MAX_POINTS_LIMIT}.'})
+    mode = request.query_params.get('downsample', 'lttb')
+    if mode not in DOWNSAMPLE_MODES:
+        raise ValidationError({'downsample': f"Choose one of: {', '.join(DOWNSAMPLE_MODES)}."})
+    return max_points, mode
+
+
+class TimeSeriesFilter(BaseFilterBackend):
+    """
+    Restrict time-series querysets with ``?system=<id>&start=<iso>&end=<iso>``.
+
+    ``start`` is inclusive and ``end`` exclusive so consecutive windows don't
+    overlap. Models without a ``system`` field are limited to the time span of
+    that system's electrical data, which is how the analytics pair them up.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        system_id = parse_system_param(request)
+        start = parse_time_param(request, 'start')
+        end = parse_time_param(request, 'end')
+
+        if system_id is not None:
+            if any(field.name == 'system' for field in queryset.model._meta.fields):
+                queryset = queryset.filter(system_id=system_id)
+            else:
+                bounds = ElectricalData.objects.filter(system_id=system_id).aggregate(
+                    first=Min('time'), last=Max('time')
+                )
+                if bounds['first'] is None:
+                    return queryset.none()
+                queryset = queryset.filter(time__range=(bounds['first'], bounds['last']))
+        if start is not None:
+            queryset = queryset.filter(time__gte=start)
+        if end is not None:
+            queryset = queryset.filter(time__lt=end)
+        return queryset
@@ -0,0 +1,160 @@
+# monitoring/grid.py
+
+import threading
+
+import numpy as np
+import pandas as pd
+from django.db import connection
+from django.db.models import Max, Min
+
+from .models import MeteorologicalData
+
+
+class MeteorologicalGrid:
+    """
+    Process-wide cache of the meteo series binned onto the modeling grid.
+
+    The cache holds one contiguous run of bins as NumPy arrays: the number of
+    raw rows in each bin and the mean of each field (NaN when a bin has no
+    value). Bin times are implied by the first bin and the bin width, so
+    there is no per-row index. :meth:`frame` returns exactly what resampling
+    and interpolating the raw rows of a range would, and only loads the bins
+    it doesn't hold yet. New weather rows therefore extend the cache at the
+    end rather than re-reading the history. Past ``max_bytes`` the oldest
+    bins are evicted; 0 disables the cache.
+
+    Rows another process inserts are noticed through the table's highest id,
+    checked once per call. Rows rewritten or deleted in this process are
+    reported through :meth:`invalidate`. Only committed rows are cached: a
+    call made inside a transaction reads the series directly, because the
+    rows it sees could still roll back.
+    """
+
+    def __init__(self, load, fields, rule, max_bytes):
+        self.load = load
+        self.fields = fields
+        self.rule = rule
+        self.bin = pd.Timedelta(rule).value
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self.max_id = None
+        self.loads = 0
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.start = None
+            self.counts = np.zeros(0, dtype='uint32')
+            self.means = np.zeros((0, len(self.fields)))
+
+    @property
+    def end(self):
+        return self.start + len(self.counts) * self.bin
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + self.means.nbytes
+
+    def _bins(self, lo, hi):
+        """Row counts and field means of the bins in [lo, hi) (ns), from the raw rows."""
+        self.loads += 1
+        size = (hi - lo) // self.bin
+        counts = np.zeros(size, dtype='uint32')
+        means = np.full((size, len(self.fields)), np.nan)
+        frame = self.load(pd.Timestamp(lo, tz='UTC'), pd.Timestamp(hi, tz='UTC'))
+        if frame.empty:
+            return counts, means
+        resampled = frame.set_index('time')[self.fields].resample(self.rule)
+        binned = resampled.mean()
+        offset = (binned.index[0].value - lo) // self.bin
+        counts[offset:offset + len(binned)] = resampled.size().to_numpy()
+        means[offset:offset + len(binned)] = binned.to_numpy(dtype=float)
+        return counts, means
+
+    def _frame(self, lo, counts, means):
+        occupied = np.flatnonzero(counts)
+        if not len(occupied):
+            index = pd.DatetimeIndex([], tz='UTC', name='time')
+            return pd.DataFrame({field: np.array([], dtype=float) for field in self.fields}, index=index)
+        first, last = occupied[0], occupied[-1] + 1
+        index = pd.date_range(
+            pd.Timestamp(lo + first * self.bin, tz='UTC'), periods=last - first, freq=self.rule, name='time'
+        )
+        return pd.DataFrame(means[first:last].copy(), index=index, columns=self.fields).interpolate()
+
+    def _check_for_new_rows(self):
+        max_id = MeteorologicalData.objects.aggregate(id=Max('id'))['id']
+        if self.max_id is not None and max_id != self.max_id:
+            span = MeteorologicalData.objects.filter(id__gt=self.max_id).aggregate(first=Min('time'), last=Max('time'))
+            if span['first'] is None:
+                self.clear()
+            else:
+                self.invalidate(span['first'], span['last'])
+        self.max_id = max_id
+
+    def _extend(self, lo, hi):
+        """Make the cache cover [lo, hi), or replace it when the two don't touch."""
+        if self.start is None or hi < self.start or lo > self.end:
+            self.start = lo
+            self.counts, self.means = self._bins(lo, hi)
+            return
+        if lo < self.start:
+            counts, means = self._bins(lo, self.start)
+            self.counts = np.concatenate([counts, self.counts])
+            self.means = np.concatenate([means, self.means])
+            self.start = lo
+        if hi > self.end:
+            counts, means = self._bins(self.end, hi)
+            self.counts = np.concatenate([self.counts, counts])
+            self.means = np.concatenate([self.means, means])
+
+    def _evict(self):
+        capacity = self.max_bytes // (self.counts.itemsize + self.means.itemsize * len(self.fields))
+        excess = len(self.counts) - capacity
+        if excess > 0:
+            self.counts = self.counts[excess:].copy()
+            self.means = self.means[excess:].copy()
+            self.start += excess * self.bin
+
+    def frame(self, lo, hi):
+        """The resampled, interpolated meteo series of the raw rows in [lo, hi), rounded out to whole bins."""
+        lo = pd.Timestamp(lo).value // self.bin * self.bin
+        hi = -(-pd.Timestamp(hi).value // self.bin) * self.bin
+        if not self.max_bytes or connection.in_atomic_block:
+            return self._frame(lo, *self._bins(lo, hi))
+
+        with self._lock:
+            self._check_for_new_rows()
+            self._extend(lo, hi)
+            first = (lo - self.start) // self.bin
+            last = (hi - self.start) // self.bin
+            frame = self._frame(lo, self.counts[first:last], self.means[first:last])
+            self._evict()
+        return frame
+
+    def invalidate(self, start, end):
+        """Forget the cached bins from ``start`` on, after the raw rows in [start, end] changed."""
+        with self._lock:
+            if self.start is None:
+                return
+            first = (pd.Timestamp(start).value - self.start) // self.bin
+            last = (pd.Timestamp(end).value - self.start) // self.bin
+            if last < 0:
+                return
+            if first <= 0:
+                self.clear()
+                return
+            self.counts = self.counts[:first]
+            self.means = self.means[:first]
+
+    def stats(self):
+        with self._lock:
+            empty = self.start is None or not len(self.counts)
+            return {
+                'bins': len(self.counts),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'start': None if empty else pd.Timestamp(self.start, tz='UTC').isoformat(),
+                'end': None if empty else pd.Timestamp(self.end, tz='UTC').isoformat(),
+                'loads': self.loads,
+            }
@@ -0,0 +1,199 @@
+# monitoring/importers.py
+
+import io
+import time
+
+import django
+import pandas as pd
+from django.db import connection, connections, models, transaction
+from django.utils import timezone
+
+from .metrics import default_registry, rows_ingested
+from .models import ElectricalData, MeteorologicalData
+from .signals import raw_data_written
+
+METEOROLOGICAL_TIME_FORMAT = '%m/%d/%Y %H:%M'
+METEOROLOGICAL_COLUMNS = {
+    'GTI': 'gti',
+    'GHI': 'ghi',
+    'DNI': 'dni',
+    'DHI': 'dhi',
+    'Air_Temp': 'air_temp',
+    'RH': 'rh',
+    'Pressure': 'pressure',
+    'Wind_speed': 'wind_speed',
+    'wind_dir': 'wind_dir',
+    'wind_gust': 'wind_gust',
+    'Rain': 'rain',
+}
+
+ELECTRICAL_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+ELECTRICAL_COLUMNS = {
+    'Adresse': 'adresse',
+    'I1': 'i1',
+    'U_DC': 'u_dc',
+    'P_DC': 'p_dc',
+    'T1': 't1',
+    'T2': 't2',
+    'I_SUM': 'i_sum',
+}
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def read_chunks(path, columns, time_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield ``path`` as frames of at most ``chunk_size`` rows, renamed to model fields.
+
+    Times are made aware in the current timezone and empty cells become 0.0,
+    as the row-by-row importer did.
+    """
+    reader = pd.read_csv(
+        path,
+        usecols=['Time', *columns],
+        dtype={column: 'float64' for column in columns},
+        chunksize=chunk_size,
+    )
+    for chunk in reader:
+        frame = chunk[list(columns)].rename(columns=columns).fillna(0.0)
+        times = pd.to_datetime(chunk['Time'], format=time_format)
+        frame.insert(0, 'time', times.dt.tz_localize(timezone.get_current_timezone()))
+        yield frame
+
+
+def copy_available():
+    return connection.vendor == 'postgresql'
+
+
+def _copy_frame(model, frame):
+    columns = [model._meta.get_field(name).column for name in frame.columns]
+    buffer = io.StringIO()
+    frame.to_csv(buffer, header=False, index=False, date_format='%Y-%m-%d %H:%M:%S%z')
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {model._meta.db_table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+
+
+def _insert_frame(model, frame, batch_size):
+    """Batched INSERTs of ``frame``'s columns, without building a model instance per row."""
+    columns = []
+    for name in frame.columns:
+        if isinstance(model._meta.get_field(name), models.DateTimeField):
+            adapt = connection.ops.adapt_datetimefield_value
+            columns.append([adapt(value) for value in pd.DatetimeIndex(frame[name]).to_pydatetime()])
+        else:
+            # NaN becomes NULL
+            columns.append(frame[name].astype(object).where(frame[name].notna(), None).tolist())
+    fields = ', '.join(model._meta.get_field(name).column for name in frame.columns)
+    placeholders = ', '.join(['%s'] * len(frame.columns))
+    sql = f'INSERT INTO {model._meta.db_table} ({fields}) VALUES ({placeholders})'
+    rows = list(zip(*columns))
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[offset:offset + batch_size])
+
+
+def insert_frame(model, frame, use_copy=False, batch_size=5000):
+    """Insert ``frame``'s columns (model field names) into ``model``'s table with COPY or batched INSERTs."""
+    if use_copy:
+        _copy_frame(model, frame)
+    else:
+        _insert_frame(model, frame, batch_size)
+
+
+def write_frame(model, frame, use_copy=False, batch_size=5000):
+    """Insert ``frame`` into ``model``'s table inside a single transaction."""
+    with transaction.atomic():
+        insert_frame(model, frame, use_copy, batch_size)
+    rows_ingested.inc(len(frame), table=model._meta.model_name, path='import')
+
+
+def import_file(model, path, system_id=None, chunk_size=DEFAULT_CHUNK_SIZE, use_copy=None, progress=None,
+                notify=False):
+    """
+    Stream one CSV file into ``model`` chunk by chunk.
+
+    ``progress`` is called with the running row count after every chunk.
+    With ``notify``, ``raw_data_written`` is sent for the rows committed,
+    also when the import fails partway, so the derived tables never miss
+    the chunks already written.
+    Returns ``(rows, start, end)`` where ``start``/``end`` bound the imported times.
+    """
+    if use_copy is None:
+        use_copy = copy_available()
+    if model is ElectricalData:
+        columns, time_format = ELECTRICAL_COLUMNS, ELECTRICAL_TIME_FORMAT
+    else:
+        columns, time_format = METEOROLOGICAL_COLUMNS, METEOROLOGICAL_TIME_FORMAT
+
+    rows, start, end = 0, None, None
+    try:
+        for frame in read_chunks(path, columns, time_format, chunk_size):
+            if frame.empty:
+                continue
+            if system_id is not None:
+                frame.insert(0, 'system_id', system_id)
+                frame['adresse'] = frame['adresse'].astype('int64')
+            write_frame(model, frame, use_copy)
+
+            rows += len(frame)
+            chunk_start, chunk_end = frame['time'].min(), frame['time'].max()
+            start = chunk_start if start is None else min(start, chunk_start)
+            end = chunk_end if end is None else max(end, chunk_end)
+            if progress is not None:
+                progress(rows)
+    finally:
+        if notify and rows:
+            raw_data_written.send(
+                sender=model, system_ids=None if system_id is None else [system_id],
+                start=start, end=end,
+            )
+
+    return rows, start, end
+
+
+# Connections a forked worker inherited from its parent. Closing one would end
+# the parent's session too, so they are dropped but kept referenced, never
+# finalized (forked workers leave through os._exit).
+_inherited_connections = []
+
+
+def init_worker():
+    django.setup()
+    # Never share a connection inherited from the parent process
+    for connection in connections.all(initialized_only=True):
+        _inherited_connections.append(connection)
+        del connections[connection.alias]
+
+
+def import_in_worker(model_label, path, system_id, chunk_size, use_copy, queue):
+    """:func:`import_file` in a pool worker, which also refreshes the derived tables of what it wrote."""
+    model = ElectricalData if model_label == 'electrical' else MeteorologicalData
+    label = f'{model_label} {path}'
+    try:
+        return import_file(
+            model, path, system_id, chunk_size, use_copy,
+            progress=lambda rows: queue.put((label, rows)), notify=True,
+        )
+    finally:
+        # Pool workers exit without running atexit hooks
+        default_registry.flush()
+
+
+class RateReporter:
+    """Turns running row counts into rows/second progress lines."""
+
+    def __init__(self, write):
+        self.write = write
+        self.started = {}
+
+    def start(self, label):
+        self.started[label] = time.perf_counter()
+
+    def __call__(self, label, rows):
+        elapsed = time.perf_counter() - self.started[label]
+        rate = rows / elapsed if elapsed else 0
+        self.write(f'{label}: {rows} rows ({rate:,.0f} rows/s)')
@@ -0,0 +1,234 @@
+# monitoring/ingestion.py
+
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .metrics import Counter, Gauge, rows_ingested
+from .models import ElectricalData
+from .signals import notify_written
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFull(Exception):
+    """Raised when readings can't be buffered before the backpressure timeout."""
+
+
+class BatchTooLarge(Exception):
+    """Raised for a batch that exceeds the buffer size and so could never be buffered."""
+
+
+def write_readings(readings):
+    """
+    Insert validated electrical readings with one ``bulk_create`` and update the derived tables.
+
+    Only a failed insert raises: once the readings are committed, a failure
+    to refresh the derived tables is logged (``rebuild_rollups`` and
+    ``rebuild_modeled_power`` repair them) so that callers don't retry or
+    count as lost readings that were stored.
+    """
+    instances = ElectricalData.objects.bulk_create(
+        [ElectricalData(**reading) for reading in readings], batch_size=5000
+    )
+    rows_ingested.inc(len(instances), table='electricaldata', path='ingest')
+    try:
+        notify_written(ElectricalData, instances)
+    except Exception:
+        logger.exception('Derived data of %d written readings could not be refreshed', len(instances))
+    return len(instances)
+
+
+class WriteBehindBuffer:
+    """
+    Bounded in-process buffer that writes readings to the database in the background.
+
+    Requests hand validated readings to :meth:`put` and return without waiting
+    for a commit. A flusher task writes ``flush_size`` readings at a time as
+    soon as that many are waiting, and whatever is pending every
+    ``flush_interval`` seconds. At most ``max_size`` readings (pending or being
+    written) are held; :meth:`put` waits for room up to ``put_timeout``
+    seconds and then raises :class:`BufferFull`, which pushes back on clients;
+    a batch larger than ``max_size`` raises :class:`BatchTooLarge`.
+
+    Readings taken by :meth:`put` have been acknowledged, so a batch that
+    fails to write goes back to the head of the queue and is retried after
+    ``retry_delay`` seconds, doubled per attempt. It is only dropped (and
+    counted in ``failed``) after ``max_attempts`` attempts.
+
+    The buffer lives on the event loop it was started on, so it only runs
+    under an ASGI server that sends lifespan events (see ``asgi.py``). When it
+    isn't running, :meth:`put` writes straight through.
+    """
+
+    def __init__(self, write, max_size=50_000, flush_size=5000, flush_interval=1.0, put_timeout=2.0,
+                 max_attempts=5, retry_delay=0.5):
+        self.write = write
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.pending = []
+        self.size = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self._loop = None
+        self._task = None
+
+    @property
+    def running(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return self._task is not None and not self._task.done() and self._loop is loop
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._room = asyncio.Condition()
+        self._wake = asyncio.Event()
+        self._flushing = asyncio.Lock()
+        self._closing = False
+        self._task = self._loop.create_task(self._run())
+
+    async def put(self, readings):
+        """Buffer ``readings``; returns True when buffered, False when written through synchronously."""
+        if len(readings) > self.max_size:
+            raise BatchTooLarge(f'A batch of {len(readings)} readings exceeds the buffer size of {self.max_size}')
+        if not self.running:
+            await sync_to_async(self.write)(readings)
+            return False
+
+        async with self._room:
+            try:
+                await asyncio.wait_for(
+                    self._room.wait_for(lambda: self.size + len(readings) <= self.max_size),
+                    self.put_timeout,
+                )
+            except asyncio.TimeoutError:
+                raise BufferFull('The ingestion buffer is full')
+            self.pending.extend(readings)
+            self.size += len(readings)
+        if len(self.pending) >= self.flush_size:
+            self._wake.set()
+        return True
+
+    async def flush(self):
+        """Write everything pending, ``flush_size`` readings per transaction."""
+        async with self._flushing:
+            attempts = 0
+            while self.pending:
+                batch = self.pending[:self.flush_size]
+                del self.pending[:self.flush_size]
+                try:
+                    self.written += await sync_to_async(self._write)(batch)
+                except Exception:
+                    attempts += 1
+                    if attempts < self.max_attempts:
+                        logger.warning(
+                            'Writing %d buffered readings failed (attempt %d of %d), retrying',
+                            len(batch), attempts, self.max_attempts, exc_info=True,
+                        )
+                        self.pending[:0] = batch
+                        self.retries += 1
+                        await asyncio.sleep(self.retry_delay * 2 ** (attempts - 1))
+                        continue
+                    self.failed += len(batch)
+                    logger.exception(
+                        'Dropped %d buffered readings that could not be written in %d attempts',
+                        len(batch), attempts,
+                    )
+                attempts = 0
+                async with self._room:
+                    self.size -= len(batch)
+                    self._room.notify_all()
+
+    def _write(self, batch):
+        # Flushes happen outside any request, so manage the connection the way a request would
+        close_old_connections()
+        try:
+            return self.write(batch)
+        finally:
+            close_old_connections()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def close(self):
+        """Stop the flusher once everything buffered has been written."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        await self._task
+        await self.flush()
+        self._task = None
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'pending': len(self.pending),
+            'in_flight': self.size - len(self.pending),
+            'max_size': self.max_size,
+            'written': self.written,
+            'retries': self.retries,
+            'failed': self.failed,
+        }
+
+
+buffer = WriteBehindBuffer(
+    write_readings,
+    max_size=settings.INGEST_BUFFER_MAX_SIZE,
+    flush_size=settings.INGEST_BUFFER_FLUSH_SIZE,
+    flush_interval=settings.INGEST_BUFFER_FLUSH_INTERVAL,
+    put_timeout=settings.INGEST_BUFFER_PUT_TIMEOUT,
+    max_attempts=settings.INGEST_BUFFER_MAX_ATTEMPTS,
+    retry_delay=settings.INGEST_BUFFER_RETRY_DELAY,
+)
+
+Gauge(
+    'ingest_buffer_readings', 'Readings held by the write-behind buffer, by state', ['state'],
+    collect=lambda: {('pending',): len(buffer.pending), ('in_flight',): buffer.size - len(buffer.pending)},
+)
+Counter(
+    'ingest_buffer_failed_readings_total', 'Buffered readings dropped after their last write attempt failed',
+    collect=lambda: {(): buffer.failed},
+)
+
+
+class LifespanMiddleware:
+    """
+    ASGI wrapper that runs the ingestion buffer for the server's lifetime.
+
+    Django's ASGI handler doesn't handle lifespan events, so this answers them
+    itself: the buffer's flusher starts on startup and everything still
+    buffered is flushed before shutdown completes. Other scopes go to Django.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                buffer.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await buffer.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
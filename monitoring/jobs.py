@@ -0,0 +1,282 @@
+# monitoring/jobs.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .analytics import model_unmodeled_systems, modeled_power_totals, system_scores
+from .exports import write_electrical_hdf5
+from .modeling import MissingDataError, refresh_fleet_modeled_power
+from .models import ACTIVE_JOB_STATUSES, ElectricalData, Job, PVSystem
+
+logger = logging.getLogger(__name__)
+
+# Systems modeled together per recompute step; progress is reported between steps
+RECOMPUTE_BATCH = 25
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register the function that runs jobs of ``kind`` as ``func(job, progress)``, returning the job's result."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def dedup_key(kind, params):
+    payload = json.dumps([kind, params], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def submit(kind, params=None, max_attempts=None):
+    """
+    Queue a ``kind`` job, or return the queued or running job with the same kind and params.
+
+    Returns ``(job, created)``. Duplicates are caught by the partial unique
+    constraint on ``dedup_key``, so two concurrent submissions can't both
+    queue the same work.
+    """
+    params = params or {}
+    key = dedup_key(kind, params)
+    while True:
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(
+                    kind=kind, params=params, dedup_key=key, run_after=timezone.now(),
+                    max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+                )
+            return job, True
+        except IntegrityError:
+            job = Job.objects.filter(dedup_key=key, status__in=ACTIVE_JOB_STATUSES).first()
+            # The active job may have finished in between; then queue a new one
+            if job is not None:
+                return job, False
+
+
+def requeue_stale(stale_after=None):
+    """
+    Put running jobs that stopped reporting (their worker died) back in the queue.
+
+    Workers send a heartbeat every ``JOB_HEARTBEAT_INTERVAL`` seconds while a
+    job runs, however long it takes, so only jobs whose worker is gone go
+    without an update for ``JOB_STALE_AFTER`` seconds. Jobs that were on
+    their last attempt are failed instead. Returns the number requeued.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status='running', updated_at__lt=now - timedelta(seconds=stale_after or settings.JOB_STALE_AFTER),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', worker='', finished_at=now, updated_at=now,
+        error='Worker stopped responding on the last attempt',
+    )
+    if failed:
+        logger.warning('Failed %d stale jobs that had no attempts left', failed)
+    return stale.update(status='queued', worker='', message='Requeued after its worker stopped responding')
+
+
+def claim_next_job(worker=''):
+    """
+    Mark the oldest due job as running for ``worker`` and return it, or None when there is none.
+
+    A job is claimed with a conditional UPDATE, so when several workers race
+    for the same row exactly one of them gets it.
+    """
+    while True:
+        now = timezone.now()
+        candidate = (
+            Job.objects.filter(status='queued', run_after__lte=now)
+            .order_by('run_after', 'id').values_list('id', flat=True).first()
+        )
+        if candidate is None:
+            return None
+        claimed = Job.objects.filter(id=candidate, status='queued').update(
+            status='running', worker=worker, started_at=now, updated_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=candidate)
+
+
+def save_owned(job, fields):
+    """
+    Save ``fields`` of a running job, unless it no longer belongs to ``job.worker``.
+
+    A job requeued as stale and claimed by another worker is left to that
+    worker. Returns whether the job was saved.
+    """
+    job.updated_at = timezone.now()
+    return bool(Job.objects.filter(id=job.id, status='running', worker=job.worker).update(
+        updated_at=job.updated_at, **{field: getattr(job, field) for field in fields},
+    ))
+
+
+def report_progress(job):
+    """A ``progress(fraction, message='')`` callback that saves the job's progress as it runs."""
+    def progress(fraction, message=''):
+        job.progress = min(max(fraction, 0), 1)
+        job.message = message[:255]
+        save_owned(job, ['progress', 'message'])
+    return progress
+
+
+class Heartbeat(threading.Thread):
+    """Touches a running job's ``updated_at`` every ``interval`` seconds, from its own connection."""
+
+    def __init__(self, job, interval):
+        super().__init__(name=f'job-{job.id}-heartbeat', daemon=True)
+        self.job = job
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    Job.objects.filter(id=self.job.id, status='running', worker=self.job.worker).update(
+                        updated_at=timezone.now(),
+                    )
+                except DatabaseError:
+                    logger.warning('Heartbeat of job %s failed', self.job.id, exc_info=True)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_job(job):
+    """Run a claimed job and record its result, or its error and when it will be retried."""
+    heartbeat = Heartbeat(job, settings.JOB_HEARTBEAT_INTERVAL)
+    heartbeat.start()
+    try:
+        result = HANDLERS[job.kind](job, report_progress(job))
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed on attempt %d', job.id, job.kind, job.attempts)
+        job.error = f'{type(exc).__name__}: {exc}'
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+            job.message = f'Retrying after attempt {job.attempts} of {job.max_attempts} failed'
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+        _finish(job, ['status', 'error', 'run_after', 'message', 'finished_at'])
+        return job
+    finally:
+        heartbeat.stop()
+
+    job.status = 'succeeded'
+    job.result = result
+    job.progress = 1
+    job.finished_at = timezone.now()
+    _finish(job, ['status', 'result', 'progress', 'finished_at'])
+    return job
+
+
+def _finish(job, fields):
+    if not save_owned(job, fields):
+        logger.warning('Job %s was taken over by another worker; its outcome here is discarded', job.id)
+
+
+def run_next_job(worker=''):
+    """Claim and run one due job; returns it, or None when the queue is empty."""
+    close_old_connections()
+    try:
+        job = claim_next_job(worker)
+        return run_job(job) if job is not None else None
+    finally:
+        close_old_connections()
+
+
+def _time_param(params, name):
+    return parse_datetime(params[name]) if params.get(name) else None
+
+
+def _system_ids(params):
+    systems = PVSystem.objects.order_by('id')
+    if params.get('system_ids'):
+        systems = systems.filter(id__in=params['system_ids'])
+    return list(systems.values_list('id', flat=True))
+
+
+@handler('recompute')
+def recompute(job, progress):
+    """Rebuild the modeled power of ``system_ids`` (default: all) over ``start``..``end``."""
+    system_ids = _system_ids(job.params)
+    start, end = _time_param(job.params, 'start'), _time_param(job.params, 'end')
+    rows = {}
+    for offset in range(0, len(system_ids), RECOMPUTE_BATCH):
+        batch = system_ids[offset:offset + RECOMPUTE_BATCH]
+        for system_id, written in refresh_fleet_modeled_power(batch, start, end).items():
+            rows[str(system_id)] = str(written) if isinstance(written, MissingDataError) else written
+        done = offset + len(batch)
+        progress(done / len(system_ids), f'Modeled {done} of {len(system_ids)} systems')
+    return {'rows': rows}
+
+
+@handler('score')
+def score(job, progress):
+    """Score ``system_ids`` (default: all), modeling any system that has no modeled series yet."""
+    progress(0, 'Modeling systems without a modeled series')
+    model_unmodeled_systems()
+    progress(0.5, 'Scoring systems')
+    return system_scores(PVSystem.objects.filter(id__in=_system_ids(job.params)), modeled_power_totals())
+
+
+def result_path(job):
+    return os.path.join(settings.JOB_RESULTS_DIR, f'job-{job.id}.h5')
+
+
+@handler('export')
+def export(job, progress):
+    """Write the electrical data of ``system_ids`` in [start, end) to an HDF5 file under ``JOB_RESULTS_DIR``."""
+    queryset = ElectricalData.objects.all()
+    if job.params.get('system_ids'):
+        queryset = queryset.filter(system_id__in=job.params['system_ids'])
+    if job.params.get('start'):
+        queryset = queryset.filter(time__gte=_time_param(job.params, 'start'))
+    if job.params.get('end'):
+        queryset = queryset.filter(time__lt=_time_param(job.params, 'end'))
+
+    os.makedirs(settings.JOB_RESULTS_DIR, exist_ok=True)
+    path = result_path(job)
+    progress(0, 'Writing HDF5 file')
+    # Written under a temporary name so a half-written file is never served
+    with open(f'{path}.partial', 'wb') as target:
+        rows = write_electrical_hdf5(target, queryset)
+    os.replace(f'{path}.partial', path)
+    return {'file': os.path.basename(path), 'rows': rows}
+
+
+def purge_results(retain_hours=None):
+    """
+    Delete export files (and leftover partial files) not modified for ``JOB_RESULTS_RETAIN_HOURS``.
+
+    Their jobs then answer that the file is no longer available. Returns the
+    number of files deleted.
+    """
+    directory = settings.JOB_RESULTS_DIR
+    if not os.path.isdir(directory):
+        return 0
+    retain_hours = settings.JOB_RESULTS_RETAIN_HOURS if retain_hours is None else retain_hours
+    cutoff = time.time() - retain_hours * 3600
+    deleted = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith('job-') and name.endswith(('.h5', '.h5.partial')) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            deleted += 1
+    return deleted
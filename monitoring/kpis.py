@@ -0,0 +1,205 @@
+# monitoring/kpis.py
+
+from datetime import datetime, timezone as dt_timezone
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+
+from . import archive
+from .loaders import load_frame
+from .models import ElectricalData, MeteorologicalData, PVSystem
+
+# Bucket widths in seconds; buckets are aligned to the epoch, so daily ones are UTC days
+KPI_RESOLUTIONS = {
+    '5min': 300,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# Energy KPIs integrate power (p_dc, W) and irradiance (gti, W/m2) with the
+# trapezoidal rule between consecutive readings of a series. An interval
+# belongs to the bucket of the reading that ends it, and only counts when
+# both readings have a value and are at most KPI_MAX_GAP seconds apart;
+# longer gaps are outages and count neither as energy nor as available time.
+# Per series and bucket the integration yields three additive components:
+# ``samples`` (readings in the bucket), ``integral_wh`` (Wh, or Wh/m2 for
+# irradiance) and ``covered_s`` (seconds covered by counted intervals).
+# Series are keyed by system id, or None for the meteo series.
+
+_EPOCH = {
+    'postgresql': 'EXTRACT(EPOCH FROM time)::double precision',
+    'sqlite': "(julianday(time) - 2440587.5) * 86400.0",
+}
+_SECONDS = {
+    'postgresql': 'FLOOR(EXTRACT(EPOCH FROM time))::bigint',
+    'sqlite': "CAST(strftime('%%s', time) AS INTEGER)",
+}
+
+
+def _steps_sql(table, value, partition, where):
+    epoch, seconds = _EPOCH[connection.vendor], _SECONDS[connection.vendor]
+    window = f"OVER ({f'PARTITION BY {partition} ' if partition else ''}ORDER BY time, id)"
+    return (
+        f'SELECT {partition or "NULL"} AS series, {seconds} / %s AS bucket, {value} AS value, '
+        f'{epoch} - LAG({epoch}) {window} AS dt, LAG({value}) {window} AS previous '
+        f'FROM {table} WHERE {where}'
+    )
+
+
+def _where(lo, hi):
+    conditions, params = [], []
+    if lo is not None:
+        conditions.append('time >= %s')
+        params.append(connection.ops.adapt_datetimefield_value(lo))
+    if hi is not None:
+        conditions.append('time < %s')
+        params.append(connection.ops.adapt_datetimefield_value(hi))
+    return ' AND '.join(conditions) or '1 = 1', params
+
+
+def bucket_integrals(size, lo=None, hi=None, system_ids=None, max_gap=None):
+    """
+    ``{(series, bucket): (samples, integral_wh, covered_s)}`` of the database rows in [lo, hi).
+
+    One query: both series are stepped with LAG() window functions and
+    aggregated per series and bucket, where ``bucket`` is the epoch second of
+    the bucket start divided by ``size``.
+    """
+    max_gap = settings.KPI_MAX_GAP if max_gap is None else max_gap
+    where, time_params = _where(lo, hi)
+    electrical_where, electrical_params = where, list(time_params)
+    if system_ids is not None:
+        electrical_where += f" AND system_id IN ({', '.join(['%s'] * len(system_ids))})"
+        electrical_params += list(system_ids)
+    sql = (
+        f'WITH steps AS ('
+        f'{_steps_sql(ElectricalData._meta.db_table, "p_dc", "system_id", electrical_where)} UNION ALL '
+        f'{_steps_sql(MeteorologicalData._meta.db_table, "gti", None, where)}) '
+        'SELECT series, bucket, COUNT(*), '
+        'SUM(CASE WHEN dt <= %s THEN (value + previous) / 2 * dt END) / 3600, '
+        'SUM(CASE WHEN dt <= %s AND value IS NOT NULL AND previous IS NOT NULL THEN dt END) '
+        'FROM steps GROUP BY series, bucket'
+    )
+    params = [size, *electrical_params, size, *time_params, max_gap, max_gap]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {
+            (series, bucket): (samples, integral or 0.0, covered or 0.0)
+            for series, bucket, samples, integral, covered in cursor.fetchall()
+        }
+
+
+def reference_integrals(frame, value, size, max_gap=None):
+    """
+    :func:`bucket_integrals` of raw rows in pandas.
+
+    ``frame`` holds ``time`` and ``value`` columns, plus ``system_id`` for
+    electrical rows; rows are taken in time order (stable, so database rows
+    loaded in ``id`` order keep it).
+    """
+    max_gap = settings.KPI_MAX_GAP if max_gap is None else max_gap
+    if frame.empty:
+        return {}
+    frame = frame.assign(series=frame['system_id'] if 'system_id' in frame else -1)
+    frame = frame.sort_values(['series', 'time'], kind='stable', ignore_index=True)
+    ns = pd.DatetimeIndex(frame['time']).asi8
+    frame['bucket'] = ns // 10**9 // size
+    dt = pd.Series(ns / 1e9).groupby(frame['series'], sort=False).diff()
+    previous = frame.groupby('series', sort=False)[value].shift()
+    counted = dt <= max_gap
+    frame['integral'] = ((frame[value] + previous) / 2 * dt).where(counted) / 3600
+    frame['covered'] = dt.where(counted & frame[value].notna() & previous.notna())
+    grouped = frame.groupby(['series', 'bucket']).agg(
+        samples=('bucket', 'size'), integral=('integral', 'sum'), covered=('covered', 'sum'),
+    )
+    return {
+        (None if series == -1 else int(series), int(bucket)): (int(row.samples), float(row.integral), float(row.covered))
+        for (series, bucket), row in zip(grouped.index, grouped.itertuples())
+    }
+
+
+def _archived_integrals(size, lo, hi, system_ids, max_gap):
+    """:func:`reference_integrals` over the rows of both tiers, for ranges that reach into the archive."""
+    electrical = ElectricalData.objects.all()
+    meteorological = MeteorologicalData.objects.all()
+    if lo is not None:
+        electrical, meteorological = electrical.filter(time__gte=lo), meteorological.filter(time__gte=lo)
+    if hi is not None:
+        electrical, meteorological = electrical.filter(time__lt=hi), meteorological.filter(time__lt=hi)
+    if system_ids is not None:
+        electrical = electrical.filter(system_id__in=system_ids)
+    else:
+        system_ids = list(PVSystem.objects.values_list('id', flat=True))
+
+    fields = ['system_id', 'time', 'p_dc']
+    electrical = archive.with_archived(
+        load_frame(electrical.order_by('id'), fields), archive.ELECTRICAL, fields,
+        {system_id: (lo, hi) for system_id in system_ids},
+    )
+    fields = ['time', 'gti']
+    meteorological = archive.with_archived(
+        load_frame(meteorological.order_by('id'), fields), archive.METEOROLOGICAL, fields, {None: (lo, hi)},
+    )
+    return {
+        **reference_integrals(electrical, 'p_dc', size, max_gap),
+        **reference_integrals(meteorological, 'gti', size, max_gap),
+    }
+
+
+def _bucket_bounds(size, start, end):
+    lo = None if start is None else pd.Timestamp(start).floor(f'{size}s').to_pydatetime()
+    hi = None if end is None else pd.Timestamp(end).ceil(f'{size}s').to_pydatetime()
+    return lo, hi
+
+
+def energy_kpis(resolution='1d', start=None, end=None, system_ids=None):
+    """
+    Per-bucket energy KPIs of each system over [start, end), widened to whole buckets.
+
+    Returns one entry per system with data, holding parallel lists per
+    bucket: ``time`` (bucket start), ``energy_kwh``, ``specific_yield``
+    (kWh per kWp of capacity), ``performance_ratio`` (specific yield over the
+    plane-of-array insolation in kWh/m2, i.e. against GTI at 1 kW/m2) and
+    ``availability`` (share of the bucket covered by readings). Ratios are
+    None where undefined.
+
+    The database rows are aggregated by :func:`bucket_integrals`; a range
+    reaching into archived months is integrated over both tiers by
+    :func:`reference_integrals` instead, as the window functions can't see
+    archived rows.
+    """
+    size = KPI_RESOLUTIONS[resolution]
+    lo, hi = _bucket_bounds(size, start, end)
+    if archive.overlaps(lo, hi, system_ids):
+        integrals = _archived_integrals(size, lo, hi, system_ids, settings.KPI_MAX_GAP)
+    else:
+        integrals = bucket_integrals(size, lo, hi, system_ids)
+
+    systems = PVSystem.objects.order_by('id')
+    if system_ids is not None:
+        systems = systems.filter(id__in=system_ids)
+    capacities = dict(systems.values_list('id', 'capacity'))
+    insolation = {bucket: integral / 1000 for (series, bucket), (_, integral, _) in integrals.items() if series is None}
+
+    results = {}
+    for (series, bucket), (_, integral, covered) in sorted(
+        ((key, components) for key, components in integrals.items() if key[0] is not None),
+    ):
+        if series not in capacities:
+            continue
+        result = results.setdefault(series, {
+            'system_id': series, 'time': [], 'energy_kwh': [], 'specific_yield': [],
+            'performance_ratio': [], 'availability': [],
+        })
+        energy = integral / 1000
+        specific_yield = energy / capacities[series] if capacities[series] else None
+        irradiation = insolation.get(bucket)
+        result['time'].append(datetime.fromtimestamp(bucket * size, dt_timezone.utc))
+        result['energy_kwh'].append(energy)
+        result['specific_yield'].append(specific_yield)
+        result['performance_ratio'].append(
+            specific_yield / irradiation if specific_yield is not None and irradiation else None
+        )
+        result['availability'].append(covered / size)
+    return list(results.values())
@@ -0,0 +1,161 @@
+# monitoring/loaders.py
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Non-null keys that keep their integer type; every other field except ``time`` is a float64 measurement
+INTEGER_FIELDS = {'id', 'system_id'}
+
+
+def _column_dtype(field):
+    if field == 'time':
+        return 'datetime64[ns]'
+    if field in INTEGER_FIELDS:
+        return 'int64'
+    return 'float64'
+
+
+def _utc_datetime64(values):
+    """Naive datetime64[ns] in UTC, whatever the driver returned (aware datetimes or ISO strings)."""
+    # An Index, so a Series from the COPY path converts its values rather than its index
+    return pd.to_datetime(pd.Index(values), utc=True).tz_convert(None).to_numpy()
+
+
+def _convert(field, values):
+    if field == 'time':
+        return _utc_datetime64(values)
+    if field in INTEGER_FIELDS:
+        return np.asarray(values, dtype='int64')
+    # None becomes NaN when building a float array
+    return np.asarray(values, dtype='float64')
+
+
+def empty_columns(fields):
+    return {field: np.array([], dtype=_column_dtype(field)) for field in fields}
+
+
+def _compile(queryset, fields):
+    """SQL and params selecting ``fields``, or None when the queryset can't match anything."""
+    try:
+        return queryset.values_list(*fields).query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return None
+
+
+def _copy_chunks(cursor, sql, fields, chunk_size):
+    """
+    Parse the CSV of ``COPY (sql) TO STDOUT`` ``chunk_size`` rows at a time, as it arrives.
+
+    The driver writes the output into a pipe from another thread while
+    pandas reads the other end, so at most a pipe's worth of text is in
+    memory rather than the whole result.
+    """
+    read_fd, write_fd = os.pipe()
+    failed = []
+
+    def copy():
+        try:
+            # Closing the write end is what ends the reader's input
+            with open(write_fd, 'w', encoding='utf-8', newline='') as writer:
+                cursor.copy_expert(f'COPY ({sql}) TO STDOUT WITH (FORMAT csv)', writer)
+        except Exception as exc:
+            failed.append(exc)
+
+    thread = threading.Thread(target=copy, name='copy-out', daemon=True)
+    thread.start()
+    chunks = []
+    try:
+        # Closed before the join, so a reader that gives up unblocks the writer
+        with open(read_fd, encoding='utf-8', newline='') as reader:
+            for frame in pd.read_csv(
+                reader,
+                header=None,
+                names=fields,
+                dtype={field: 'float64' for field in fields if _column_dtype(field) == 'float64'},
+                chunksize=chunk_size,
+            ):
+                # No output at all still reads as one (untyped) empty chunk
+                if frame.empty:
+                    continue
+                chunks.append({
+                    field: _utc_datetime64(frame[field]) if field == 'time' else frame[field].to_numpy()
+                    for field in fields
+                })
+    finally:
+        thread.join()
+    if failed:
+        raise failed[0]
+    return chunks
+
+
+def _copy_columns(queryset, fields, connection, chunk_size):
+    compiled = _compile(queryset, fields)
+    if compiled is None:
+        return empty_columns(fields)
+    sql, params = compiled
+    with connection.cursor() as cursor:
+        chunks = _copy_chunks(cursor, cursor.mogrify(sql, params).decode(), fields, chunk_size)
+    return _concatenate(chunks, fields)
+
+
+def iter_columns(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield ``fields`` of ``queryset`` as dicts of typed arrays, ``chunk_size`` rows at a time.
+
+    Rows are read through a server-side cursor on PostgreSQL, so neither the
+    driver nor the caller ever holds the whole result.
+    """
+    compiled = _compile(queryset, fields)
+    if compiled is None:
+        return
+    sql, params = compiled
+    connection = connections[queryset.db]
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(chunk_size):
+            yield {field: _convert(field, values) for field, values in zip(fields, zip(*rows))}
+
+
+def _concatenate(chunks, fields):
+    if not chunks:
+        return empty_columns(fields)
+    return {field: np.concatenate([chunk[field] for chunk in chunks]) for field in fields}
+
+
+def _cursor_columns(queryset, fields, chunk_size):
+    return _concatenate(list(iter_columns(queryset, fields, chunk_size)), fields)
+
+
+def load_columns(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE, use_copy=None):
+    """
+    Fetch ``fields`` of ``queryset`` straight into typed NumPy arrays.
+
+    ``time`` becomes datetime64 in UTC, ids stay int64 and every other field is
+    float64 with NaN for NULL. On PostgreSQL the rows are streamed with
+    ``COPY ... TO STDOUT`` and parsed by pandas' C reader as they arrive, so
+    no per-row Python objects are built; elsewhere a chunked cursor fills the
+    arrays. Either way rows are converted ``chunk_size`` at a time.
+    """
+    connection = connections[queryset.db]
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    if use_copy:
+        return _copy_columns(queryset, fields, connection, chunk_size)
+    return _cursor_columns(queryset, fields, chunk_size)
+
+
+def load_frame(queryset, fields, index=None, **kwargs):
+    """:func:`load_columns` as a DataFrame with an aware UTC ``time``, optionally indexed by one of the fields."""
+    frame = pd.DataFrame(load_columns(queryset, fields, **kwargs), columns=fields)
+    if 'time' in frame:
+        frame['time'] = frame['time'].dt.tz_localize('UTC')
+    if index is not None:
+        frame = frame.set_index(index)
+    return frame
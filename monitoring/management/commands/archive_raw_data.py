@@ -0,0 +1,36 @@
+# monitoring/management/commands/archive_raw_data.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from monitoring.archive import ELECTRICAL, METEOROLOGICAL, archive_before
+from monitoring.cache import invalidate_watermarks
+from monitoring.models import PVSystem
+from monitoring.partitions import add_months, month_floor
+
+
+class Command(BaseCommand):
+    help = 'Move raw data older than the archive threshold into HDF5 files under ARCHIVE_DIR'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int,
+                            help='Archive whole months older than this many months (default: ARCHIVE_AFTER_MONTHS)')
+        parser.add_argument('--kind', choices=[ELECTRICAL, METEOROLOGICAL], action='append',
+                            help='Only archive this kind of data (repeatable; default: both)')
+
+    def handle(self, *args, **options):
+        months = options['older_than'] if options['older_than'] is not None else settings.ARCHIVE_AFTER_MONTHS
+        if months < 1:
+            raise CommandError('Archiving is disabled; pass --older-than or set ARCHIVE_AFTER_MONTHS')
+
+        cutoff = add_months(month_floor(timezone.now()), -months)
+        archived = archive_before(cutoff, options['kind'] or (ELECTRICAL, METEOROLOGICAL))
+        for (kind, month), rows in archived.items():
+            self.stdout.write(f'{kind} {month:%Y-%m}: {rows} rows archived')
+        if archived:
+            # Row counts changed under the cached analytics
+            invalidate_watermarks(list(PVSystem.objects.values_list('id', flat=True)))
+            invalidate_watermarks()
+
+        self.stdout.write(self.style.SUCCESS(f'Raw data before {cutoff:%Y-%m} is archived'))
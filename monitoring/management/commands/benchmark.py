@@ -0,0 +1,141 @@
+# monitoring/management/commands/benchmark.py
+
+import json
+from datetime import datetime
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from monitoring import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Run performance benchmarks for the analytics hot paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=['modeling', 'loader', 'export', 'ingest', 'parallel', 'suite'])
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                            help='Data sizes to benchmark (loader, export and ingest use the largest)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Readings per batch for the ingest benchmark')
+        parser.add_argument('--systems', type=int, default=8, help='Fleet size for the parallel modeling benchmark')
+        parser.add_argument('--days', type=int, default=365, help='Days of 1-minute history per system')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                            help='Process pool sizes for the parallel modeling benchmark')
+        parser.add_argument('--legacy-limit', type=int, default=100_000,
+                            help='Largest size the legacy loop is actually run at; larger sizes are extrapolated')
+        parser.add_argument('--fleet', nargs='+', default=['small'],
+                            help=f"Fleets the suite seeds, each a preset ({', '.join(benchmarks.FLEETS)}) "
+                                 f"or <systems>x<days>")
+        parser.add_argument('--repeat', type=int, default=3, help='Timed calls per suite case')
+        parser.add_argument('--import-rows', type=int, default=100_000, help='Rows of the suite\'s CSV import case')
+        parser.add_argument('--output', help='Where the suite saves its JSON results (default: benchmark-<time>.json)')
+        parser.add_argument('--compare', metavar='FILE', help='Earlier suite results to compare medians against')
+
+    def handle(self, *args, **options):
+        if options['target'] == 'modeling':
+            self.report_modeling(options)
+        elif options['target'] == 'loader':
+            self.report_loader(options)
+        elif options['target'] == 'export':
+            self.report_export(options)
+        elif options['target'] == 'ingest':
+            self.report_ingest(options)
+        elif options['target'] == 'parallel':
+            self.report_parallel(options)
+        elif options['target'] == 'suite':
+            self.report_suite(options)
+
+    def report_modeling(self, options):
+        results = benchmarks.bench_modeling(options['rows'], legacy_limit=options['legacy_limit'])
+        self.stdout.write(f"{'rows':>10} {'vectorized (s)':>15} {'legacy (s)':>12} {'speedup':>10}")
+        for result in results:
+            legacy = f"{result['legacy_s']:.3f}" + ('*' if result['legacy_estimated'] else '')
+            self.stdout.write(
+                f"{result['rows']:>10} {result['vectorized_s']:>15.4f} {legacy:>12} {result['speedup']:>9.0f}x"
+            )
+        if any(result['legacy_estimated'] for result in results):
+            self.stdout.write('* extrapolated from the largest measured legacy run')
+
+    def report_loader(self, options):
+        results = benchmarks.bench_loader(max(options['rows']))
+        self.stdout.write(f"{'loader':<26} {'rows':>10} {'seconds':>9} {'peak MiB':>9}")
+        for result in results:
+            self.stdout.write(
+                f"{result['loader']:<26} {result['rows']:>10} {result['seconds']:>9.3f} "
+                f"{result['peak_bytes'] / 2**20:>9.1f}"
+            )
+
+    def report_export(self, options):
+        results = benchmarks.bench_export(max(options['rows']))
+        self.stdout.write(f"{'format':<26} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'MiB':>9}")
+        for result in results:
+            self.stdout.write(
+                f"{result['format']:<26} {result['rows']:>10} {result['seconds']:>9.3f} "
+                f"{result['rows_per_s']:>12,.0f} {result['bytes'] / 2**20:>9.1f}"
+            )
+
+    def report_ingest(self, options):
+        results = benchmarks.bench_ingest(max(options['rows']), options['batch_size'])
+        self.stdout.write(f"{'mode':<26} {'rows':>10} {'seconds':>9} {'rows/s':>12}")
+        for result in results:
+            self.stdout.write(
+                f"{result['mode']:<26} {result['rows']:>10} {result['seconds']:>9.3f} {result['rows_per_s']:>12,.0f}"
+            )
+
+    def report_parallel(self, options):
+        results = benchmarks.bench_parallel_modeling(options['systems'], options['days'], options['workers'])
+        self.stdout.write(f"{'workers':>10} {'rows':>12} {'seconds':>9} {'speedup':>9}")
+        for result in results:
+            self.stdout.write(
+                f"{result['workers']:>10} {result['rows']:>12} {result['seconds']:>9.2f} {result['speedup']:>8.2f}x"
+            )
+
+    def report_suite(self, options):
+        try:
+            fleets = [benchmarks.parse_fleet(value) for value in options['fleet']]
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as source:
+                baseline = json.load(source)
+
+        # Like the test runner: a throwaway database next to the configured one, never the real data
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            runs = []
+            for systems, days in fleets:
+                call_command('flush', interactive=False, verbosity=0)
+                self.stdout.write(f'Seeding {systems} systems x {days} days...')
+                runs.append(benchmarks.bench_suite(systems, days, options['repeat'], options['import_rows']))
+                self.write_fleet(runs[-1])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        results = {'environment': benchmarks.environment(), 'fleets': runs}
+        path = options['output'] or f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(path, 'w') as target:
+            json.dump(results, target, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {path}'))
+
+        if baseline is not None:
+            self.stdout.write(f"{'fleet':<10} {'case':<56} {'before ms':>10} {'after ms':>10} {'ratio':>7}")
+            for (systems, days), case, before, after, ratio in benchmarks.compare(results, baseline):
+                self.stdout.write(
+                    f"{f'{systems}x{days}':<10} {case:<56} {before * 1000:>10.1f} {after * 1000:>10.1f} {ratio:>6.2f}x"
+                )
+
+    def write_fleet(self, run):
+        self.stdout.write(
+            f"{run['systems']} systems x {run['days']} days: {run['electrical_rows']:,} electrical and "
+            f"{run['meteorological_rows']:,} meteo rows, seeded in {run['seed_s']:.1f}s"
+        )
+        self.stdout.write(f"{'case':<56} {'median ms':>10} {'min ms':>9} {'peak MiB':>9} {'queries':>8}")
+        for case in run['cases']:
+            latency = case['latency_s']
+            self.stdout.write(
+                f"{case['case']:<56} {latency['median'] * 1000:>10.1f} {latency['min'] * 1000:>9.1f} "
+                f"{case['peak_bytes'] / 2**20:>9.1f} {case['queries']:>8}"
+            )
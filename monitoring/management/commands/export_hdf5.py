@@ -0,0 +1,37 @@
+# monitoring/management/commands/export_hdf5.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from monitoring.exports import DEFAULT_CHUNK_SIZE, write_electrical_hdf5
+from monitoring.management.commands.rebuild_modeled_power import parse_time
+from monitoring.models import ElectricalData
+
+
+class Command(BaseCommand):
+    help = 'Export electrical data to a compressed HDF5 file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the HDF5 file to write')
+        parser.add_argument('--system', type=int, action='append', help='Only export this system id (repeatable)')
+        parser.add_argument('--start', type=parse_time, help='Start of the time range, inclusive (ISO 8601)')
+        parser.add_argument('--end', type=parse_time, help='End of the time range, exclusive (ISO 8601)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows fetched per cursor read')
+
+    def handle(self, *args, **options):
+        queryset = ElectricalData.objects.all()
+        if options['system']:
+            queryset = queryset.filter(system_id__in=options['system'])
+        if options['start'] is not None:
+            queryset = queryset.filter(time__gte=options['start'])
+        if options['end'] is not None:
+            queryset = queryset.filter(time__lt=options['end'])
+
+        started = time.perf_counter()
+        rows = write_electrical_hdf5(options['output'], queryset, options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {rows} rows to {options['output']} in {elapsed:.1f}s ({rate:,.0f} rows/s)"
+        ))
@@ -0,0 +1,83 @@
+# monitoring/management/commands/generate_fleet.py
+
+import time
+
+import pandas as pd
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from monitoring.cache import invalidate_watermarks
+from monitoring.importers import RateReporter, copy_available
+from monitoring.management.commands.rebuild_modeled_power import parse_time
+from monitoring.management.commands.rebuild_rollups import month_windows
+from monitoring.models import MeteorologicalData, PVSystem
+from monitoring.rollups import update_meteorological_rollups
+from monitoring.synthetic import create_systems, generate_fleet
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic PV systems with 1-minute electrical and meteorological data for load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--systems', type=int, default=10, help='PV systems to create')
+        parser.add_argument('--days', type=int, default=365, help='Days of 1-minute history to generate')
+        parser.add_argument('--start', type=parse_time,
+                            help='First day of the history (ISO 8601; default: January 1st of last year)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same arguments give the same data')
+        parser.add_argument('--prefix', default='Synthetic', help='Name prefix of the created systems')
+        parser.add_argument('--chunk-days', type=int, default=7, help='Days generated and written per transaction')
+        parser.add_argument('--skip-meteo', action='store_true',
+                            help='Keep the existing meteorological series instead of generating one')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Use batched INSERTs even when PostgreSQL COPY is available')
+        parser.add_argument('--derive', action='store_true',
+                            help='Also build the rollups and modeled power of the generated data')
+
+    def handle(self, *args, **options):
+        if options['systems'] < 1 or options['days'] < 1:
+            raise CommandError('--systems and --days must be positive')
+        if options['start'] is None:
+            start = pd.Timestamp(timezone.now().year - 1, 1, 1, tz='UTC')
+        else:
+            start = pd.Timestamp(options['start']).tz_convert('UTC').floor('1D')
+        end = start + pd.Timedelta(days=options['days'])
+        if PVSystem.objects.filter(name__startswith=f"{options['prefix']} ").exists():
+            raise CommandError(f"Systems named '{options['prefix']} <n>' already exist; pass another --prefix")
+        if not options['skip_meteo'] and MeteorologicalData.objects.filter(time__gte=start, time__lt=end).exists():
+            raise CommandError('Meteorological data already covers this range; pass --skip-meteo to keep it')
+
+        systems = create_systems(options['systems'], options['seed'], options['prefix'])
+        self.stdout.write(f"Created {len(systems)} systems ({systems[0].name} to {systems[-1].name})")
+
+        report = RateReporter(self.stdout.write)
+        report.start('synthetic fleet')
+        started = time.perf_counter()
+        electrical_rows, meteorological_rows = generate_fleet(
+            systems, start, options['days'], options['seed'], options['chunk_days'],
+            meteorological=not options['skip_meteo'],
+            use_copy=copy_available() and not options['no_copy'],
+            progress=lambda rows: report('synthetic fleet', rows),
+        )
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'{electrical_rows:,} electrical and {meteorological_rows:,} meteorological rows '
+            f'in {seconds:.1f}s ({(electrical_rows + meteorological_rows) / seconds:,.0f} rows/s)'
+        )
+        invalidate_watermarks([system.id for system in systems])
+        invalidate_watermarks()
+
+        if options['derive']:
+            for system in systems:
+                call_command('rebuild_rollups', system=system.id, stdout=self.stdout)
+            if not options['skip_meteo']:
+                for lo, hi in month_windows(start, end - pd.Timedelta(microseconds=1)):
+                    update_meteorological_rollups(lo, hi)
+            for system in systems:
+                call_command('rebuild_modeled_power', system=system.id, stdout=self.stdout)
+        else:
+            self.stdout.write(
+                'Rollups and modeled power were not built; run rebuild_rollups and rebuild_modeled_power '
+                '(or pass --derive)'
+            )
+        self.stdout.write(self.style.SUCCESS('Synthetic fleet generated'))
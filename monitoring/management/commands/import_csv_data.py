@@ -1,24 +1,63 @@
 # monitoring/management/commands/import_csv_data.py
 
-import csv
-from datetime import datetime
-from django.core.management.base import BaseCommand
-from django.utils import timezone
+import queue
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import Manager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from monitoring.importers import (
+    DEFAULT_CHUNK_SIZE, RateReporter, import_in_worker, init_worker, copy_available, import_file,
+)
 from monitoring.models import MeteorologicalData, ElectricalData, PVSystem
 
 class Command(BaseCommand):
     help = 'Import CSV data into the database'
 
-    def handle(self, *args, **kwargs):
-        # Ensure PVSystem objects exist
-        self.create_pv_systems()
+    def add_arguments(self, parser):
+        parser.add_argument('--meteo', action='append', default=[], metavar='FILE',
+                            help='Meteorological CSV file (repeatable)')
+        parser.add_argument('--electrical', nargs=2, action='append', default=[], metavar=('SYSTEM_ID', 'FILE'),
+                            help='Electrical CSV file for a system (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows parsed and committed per transaction')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes used to load electrical files in parallel')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Use batched INSERTs even when PostgreSQL COPY is available')
+        parser.add_argument('--create-default-systems', action='store_true',
+                            help='Ensure the three original PV systems exist before importing')
+
+    def handle(self, *args, **options):
+        if not options['meteo'] and not options['electrical']:
+            raise CommandError('Nothing to import: pass --meteo and/or --electrical')
+
+        if options['create_default_systems']:
+            self.create_pv_systems()
+
+        electrical_files = []
+        for system_id, path in options['electrical']:
+            try:
+                system_id = int(system_id)
+            except ValueError:
+                raise CommandError(f'Invalid system id: {system_id}')
+            if not PVSystem.objects.filter(id=system_id).exists():
+                raise CommandError(f'System {system_id} does not exist')
+            electrical_files.append((system_id, path))
+
+        self.chunk_size = options['chunk_size']
+        self.use_copy = copy_available() and not options['no_copy']
+        self.report = RateReporter(self.stdout.write)
+
+        for path in options['meteo']:
+            self.import_meteorological_data(path)
+
+        if options['workers'] > 1 and len(electrical_files) > 1:
+            self.import_electrical_data_parallel(electrical_files, options['workers'])
+        else:
+            for system_id, path in electrical_files:
+                self.import_electrical_data(path, system_id)
 
-        # Import data
-        self.import_meteorological_data('/Users/youssef.elassaoui/downloads/meteo_data_cdc_scada.csv')
-        self.import_electrical_data('/Users/youssef.elassaoui/downloads/data_prod_system1.csv', 1)
-        self.import_electrical_data('/Users/youssef.elassaoui/downloads/data_prod_system2.csv', 2)
-        self.import_electrical_data('/Users/youssef.elassaoui/downloads/data_prod_system3.csv', 3)
-        
         self.stdout.write(self.style.SUCCESS('Successfully imported data'))
 
     def create_pv_systems(self):
@@ -57,39 +96,46 @@ class Command(BaseCommand):
         )
 
     def import_meteorological_data(self, file_path):
-        with open(file_path, 'r') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                timestamp = timezone.make_aware(datetime.strptime(row['Time'], '%m/%d/%Y %H:%M'))
-                MeteorologicalData.objects.create(
-                    time=timestamp,
-                    gti=float(row['GTI']) if row['GTI'] else 0.0,
-                    ghi=float(row['GHI']) if row['GHI'] else 0.0,
-                    dni=float(row['DNI']) if row['DNI'] else 0.0,
-                    dhi=float(row['DHI']) if row['DHI'] else 0.0,
-                    air_temp=float(row['Air_Temp']) if row['Air_Temp'] else 0.0,
-                    rh=float(row['RH']) if row['RH'] else 0.0,
-                    pressure=float(row['Pressure']) if row['Pressure'] else 0.0,
-                    wind_speed=float(row['Wind_speed']) if row['Wind_speed'] else 0.0,
-                    wind_dir=float(row['wind_dir']) if row['wind_dir'] else 0.0,
-                    wind_gust=float(row['wind_gust']) if row['wind_gust'] else 0.0,
-                    rain=float(row['Rain']) if row['Rain'] else 0.0
-                )
+        label = f'meteorological {file_path}'
+        self.report.start(label)
+        import_file(
+            MeteorologicalData, file_path, chunk_size=self.chunk_size, use_copy=self.use_copy,
+            progress=lambda rows: self.report(label, rows), notify=True,
+        )
 
     def import_electrical_data(self, file_path, system_id):
-        with open(file_path, 'r') as file:
-            reader = csv.DictReader(file)
-            system = PVSystem.objects.get(id=system_id)
-            for row in reader:
-                timestamp = timezone.make_aware(datetime.strptime(row['Time'], '%Y-%m-%d %H:%M:%S'))
-                ElectricalData.objects.create(
-                    system=system,
-                    time=timestamp,
-                    adresse=int(float(row['Adresse'])) if row['Adresse'] else 0,
-                    i1=float(row['I1']) if row['I1'] else 0.0,
-                    u_dc=float(row['U_DC']) if row['U_DC'] else 0.0,
-                    p_dc=float(row['P_DC']) if row['P_DC'] else 0.0,
-                    t1=float(row['T1']) if row['T1'] else 0.0,
-                    t2=float(row['T2']) if row['T2'] else 0.0,
-                    i_sum=float(row['I_SUM']) if row['I_SUM'] else 0.0
-                )
+        label = f'electrical {file_path}'
+        self.report.start(label)
+        import_file(
+            ElectricalData, file_path, system_id, chunk_size=self.chunk_size, use_copy=self.use_copy,
+            progress=lambda rows: self.report(label, rows), notify=True,
+        )
+
+    def import_electrical_data_parallel(self, electrical_files, workers):
+        # Workers open their own connections; don't let them inherit ours
+        connections.close_all()
+        with Manager() as manager, ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            progress = manager.Queue()
+            pending = set()
+            # Each worker also refreshes the derived tables of the rows it committed
+            for system_id, path in electrical_files:
+                self.report.start(f'electrical {path}')
+                pending.add(pool.submit(
+                    import_in_worker, 'electrical', path, system_id, self.chunk_size, self.use_copy, progress
+                ))
+
+            while pending:
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                self.drain_progress(progress)
+                for future in done:
+                    pending.discard(future)
+                    future.result()
+            self.drain_progress(progress)
+
+    def drain_progress(self, progress):
+        while True:
+            try:
+                label, rows = progress.get_nowait()
+            except queue.Empty:
+                return
+            self.report(label, rows)
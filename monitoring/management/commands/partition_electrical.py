@@ -0,0 +1,37 @@
+# monitoring/management/commands/partition_electrical.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.cache import invalidate_watermarks
+from monitoring.management.commands.rebuild_modeled_power import parse_time
+from monitoring.models import PVSystem
+from monitoring.partitions import apply_retention, ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions of the electrical table and apply the retention policy (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int,
+                            help='Months to create past the current one (default: PARTITION_MONTHS_AHEAD)')
+        parser.add_argument('--start', type=parse_time, help='Also create partitions from this month on (ISO 8601)')
+        parser.add_argument('--retain', type=int,
+                            help='Detach partitions older than this many months; 0 keeps everything '
+                                 '(default: PARTITION_RETAIN_MONTHS)')
+        parser.add_argument('--drop', action='store_true', help='Drop expired partitions instead of detaching them')
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError('The electrical table is only partitioned on PostgreSQL (migration 0008)')
+
+        for name in ensure_partitions(options['ahead'], options['start']):
+            self.stdout.write(f'Created {name}')
+
+        removed = apply_retention(options['retain'], drop=options['drop'])
+        for name in removed:
+            self.stdout.write(f"{'Dropped' if options['drop'] else 'Detached'} {name}")
+        if removed:
+            # Row counts changed under the cached analytics
+            invalidate_watermarks(list(PVSystem.objects.values_list('id', flat=True)))
+
+        self.stdout.write(self.style.SUCCESS('Electrical partitions are up to date'))
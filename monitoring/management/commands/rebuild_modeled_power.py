@@ -0,0 +1,48 @@
+# monitoring/management/commands/rebuild_modeled_power.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from monitoring.modeling import MissingDataError, refresh_fleet_modeled_power
+from monitoring.models import PVSystem
+
+
+def parse_time(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f'Invalid datetime: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored modeled power series'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--system', type=int, help='Only rebuild this system id')
+        parser.add_argument('--start', type=parse_time, help='Start of the time range (ISO 8601)')
+        parser.add_argument('--end', type=parse_time, help='End of the time range (ISO 8601)')
+        parser.add_argument('--workers', type=int,
+                            help='Model on this many processes (default: the MODELING_WORKERS setting)')
+
+    def handle(self, *args, **options):
+        systems = PVSystem.objects.all()
+        if options['system'] is not None:
+            systems = systems.filter(id=options['system'])
+            if not systems.exists():
+                raise CommandError(f"System {options['system']} does not exist")
+
+        # All selected systems are modeled together in one grouped pass
+        results = refresh_fleet_modeled_power(
+            list(systems.values_list('id', flat=True)), options['start'], options['end'], options['workers']
+        )
+        for system in systems:
+            rows = results[system.id]
+            if isinstance(rows, MissingDataError):
+                self.stdout.write(self.style.WARNING(f'{system.name}: {rows}'))
+                continue
+            self.stdout.write(f'{system.name}: {rows} modeled rows written')
+
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt modeled power'))
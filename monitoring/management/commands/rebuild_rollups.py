@@ -0,0 +1,66 @@
+# monitoring/management/commands/rebuild_rollups.py
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from monitoring.archive import ELECTRICAL, METEOROLOGICAL, bounds as archived_bounds
+from monitoring.management.commands.rebuild_modeled_power import parse_time
+from monitoring.models import ElectricalData, MeteorologicalData, PVSystem
+from monitoring.rollups import update_electrical_rollups, update_meteorological_rollups
+
+
+def month_windows(start, end):
+    """Split [start, end] into consecutive day-aligned windows of at most a month to bound memory."""
+    lo = pd.Timestamp(start).floor('1D')
+    end = pd.Timestamp(end)
+    while lo <= end:
+        hi = min(lo + pd.DateOffset(months=1) - pd.Timedelta(microseconds=1), end)
+        yield lo, hi
+        lo = hi + pd.Timedelta(microseconds=1)
+
+
+class Command(BaseCommand):
+    help = 'Backfill the hourly/daily/5-minute rollup tables from raw data, archived months included'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--system', type=int, help='Only rebuild electrical rollups of this system id')
+        parser.add_argument('--start', type=parse_time, help='Start of the time range (ISO 8601)')
+        parser.add_argument('--end', type=parse_time, help='End of the time range (ISO 8601)')
+        parser.add_argument('--skip-meteo', action='store_true', help='Leave meteorological rollups untouched')
+
+    def handle(self, *args, **options):
+        systems = PVSystem.objects.all()
+        if options['system'] is not None:
+            systems = systems.filter(id=options['system'])
+            if not systems.exists():
+                raise CommandError(f"System {options['system']} does not exist")
+
+        for system in systems:
+            rows = self.rebuild(
+                ElectricalData.objects.filter(system=system),
+                archived_bounds(ELECTRICAL, [system.id]).get(system.id), options,
+                lambda start, end: update_electrical_rollups(system.id, start, end),
+            )
+            self.stdout.write(f'{system.name}: {rows} electrical rollups written')
+
+        if not options['skip_meteo'] and options['system'] is None:
+            rows = self.rebuild(
+                MeteorologicalData.objects.all(), archived_bounds(METEOROLOGICAL).get(None), options,
+                update_meteorological_rollups,
+            )
+            self.stdout.write(f'{rows} meteorological rollups written')
+
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt rollups'))
+
+    def rebuild(self, queryset, archived, options, update):
+        """Run ``update`` over the span of ``queryset``'s rows and of the ``archived`` (first, last) bounds."""
+        bounds = queryset.aggregate(first=Min('time'), last=Max('time'))
+        spans = [span for span in [(bounds['first'], bounds['last']), archived] if span and span[0] is not None]
+        if not spans:
+            return 0
+        first = min(first for first, _ in spans)
+        last = max(last for _, last in spans)
+        start = max(options['start'], first) if options['start'] else first
+        end = min(options['end'], last) if options['end'] else last
+        return sum(update(lo, hi) for lo, hi in month_windows(start, end))
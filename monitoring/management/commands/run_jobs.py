@@ -0,0 +1,79 @@
+# monitoring/management/commands/run_jobs.py
+
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from monitoring.jobs import purge_results, requeue_stale, run_next_job
+
+# Seconds between sweeps for expired export files
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Jobs to run at the same time (threads)')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait before checking an empty queue again')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        # Finish the running jobs, then exit
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stopping.set())
+
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        self.requeue()
+        next_requeue = time.monotonic() + settings.JOB_STALE_AFTER
+        self.purge()
+        next_purge = time.monotonic() + PURGE_INTERVAL
+
+        def work(worker):
+            while not stopping.is_set():
+                job = run_next_job(worker)
+                if job is None:
+                    if options['burst']:
+                        return
+                    stopping.wait(options['poll_interval'])
+                    continue
+                self.stdout.write(f'Job {job.id} ({job.kind}): {job.status}')
+
+        threads = [
+            threading.Thread(target=work, args=(f'{name}:{index}',), daemon=True)
+            for index in range(max(options['concurrency'], 1))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            # Joined with a timeout so the main thread keeps handling signals
+            while thread.is_alive():
+                thread.join(0.5)
+                # Another worker may die while this one runs, leaving its job running forever
+                if time.monotonic() >= next_requeue:
+                    self.requeue()
+                    next_requeue = time.monotonic() + settings.JOB_STALE_AFTER
+                if time.monotonic() >= next_purge:
+                    self.purge()
+                    next_purge = time.monotonic() + PURGE_INTERVAL
+        self.stdout.write(self.style.SUCCESS('Job worker stopped'))
+
+    def requeue(self):
+        # The main thread's connection sits idle between sweeps
+        close_old_connections()
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+
+    def purge(self):
+        purged = purge_results()
+        if purged:
+            self.stdout.write(f'Deleted {purged} expired export files')
@@ -0,0 +1,442 @@
+# monitoring/metrics.py
+
+import atexit
+import fcntl
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+
+# Each process counts into its own registry. With METRICS_DIR set, every
+# process also writes a JSON snapshot of its registry to
+# METRICS_DIR/<pid>-<random id>.json every METRICS_FLUSH_INTERVAL seconds and
+# on exit, and /metrics serves the sum of all snapshots, so any worker answers
+# for all of them. The random part keeps a process that is given a reused pid
+# from overwriting the snapshot of the one that had it. Scrapes fold the
+# snapshots of processes that have exited into METRICS_DIR/exited.json, so
+# their counters and histograms are kept (their rates stay right) without
+# their files piling up; gauges only count live processes. Values of other
+# workers lag by up to the flush interval. Clear METRICS_DIR when deploying,
+# as a Prometheus multiprocess directory would be.
+
+EXITED = 'exited.json'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Metric:
+    """
+    A named family of series, one per combination of label values.
+
+    With ``collect``, values are not counted but read when the registry is
+    scraped: ``collect()`` returns ``{label values tuple: value}``.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=(), collect=None, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.collect = collect
+        self._lock = threading.Lock()
+        self._values = {}
+        (registry if registry is not None else default_registry).register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def samples(self):
+        if self.collect is not None:
+            return {tuple(str(value) for value in key): value for key, value in self.collect().items()}
+        with self._lock:
+            return dict(self._values)
+
+    def snapshot(self):
+        return {
+            'kind': self.kind,
+            'help': self.documentation,
+            'labels': list(self.labels),
+            'samples': [[list(key), value] for key, value in self.samples().items()],
+        }
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Observations counted per bucket; each sample is ``[per-bucket counts (last: +Inf), sum, count]``."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(float(bound) for bound in buckets)
+        super().__init__(name, documentation, labels, registry=registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            sample = self._values.get(key)
+            if sample is None:
+                sample = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            sample[0][index] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def samples(self):
+        with self._lock:
+            return {key: [list(counts), total, count] for key, (counts, total, count) in self._values.items()}
+
+    def snapshot(self):
+        return {**super().snapshot(), 'buckets': list(self.buckets)}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._flusher = None
+        self._owner = None
+        self._file_name = None
+
+    @property
+    def file_name(self):
+        """This process's snapshot file name, new in every process (forked children included)."""
+        if self._owner != os.getpid():
+            self._owner = os.getpid()
+            self._file_name = f'{self._owner}-{uuid.uuid4().hex}.json'
+        return self._file_name
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+    def flush(self, directory=None):
+        """Write this process's snapshot to ``directory`` (default: METRICS_DIR), if any."""
+        directory = directory or settings.METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, os.path.join(directory, self.file_name))
+
+    def collect(self, directory=None):
+        """The snapshots of every process, this one's first, as ``(live, snapshot)`` pairs."""
+        directory = directory or settings.METRICS_DIR
+        snapshots = [(True, self.snapshot())]
+        if not directory or not os.path.isdir(directory):
+            return snapshots
+        fold_exited(directory)
+        for name in sorted(os.listdir(directory)):
+            pid = _snapshot_pid(name)
+            if name == EXITED:
+                live = False
+            elif pid is None or name == self.file_name:
+                continue
+            else:
+                live = _alive(pid)
+            try:
+                with open(os.path.join(directory, name)) as file:
+                    snapshots.append((live, json.load(file)))
+            except (OSError, ValueError):
+                # Removed or half-written by a process exiting meanwhile
+                continue
+        return snapshots
+
+    def start_flusher(self, interval):
+        """Flush every ``interval`` seconds and at exit, in this process and in forked children."""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        self._flusher = threading.Thread(target=self._flush_every, args=(interval,), name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def _flush_every(self, interval):
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def _after_fork(self):
+        # The parent keeps reporting what it counted before the fork
+        self.reset()
+        if self._flusher is not None:
+            self._flusher = None
+            self.start_flusher(settings.METRICS_FLUSH_INTERVAL)
+
+
+def _snapshot_pid(name):
+    """The pid a process snapshot file ``name`` belongs to, or None for other files."""
+    stem, extension = os.path.splitext(name)
+    pid, _, _ = stem.partition('-')
+    return int(pid) if extension == '.json' and pid.isdigit() else None
+
+
+def fold_exited(directory):
+    """
+    Add the snapshots of exited processes in ``directory`` to its ``exited.json`` and remove them.
+
+    Runs under an exclusive lock on ``exited.lock``, so that concurrent
+    scrapes fold every snapshot exactly once.
+    """
+    with open(os.path.join(directory, 'exited.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        dead = [
+            name for name in sorted(os.listdir(directory))
+            if (pid := _snapshot_pid(name)) is not None and not _alive(pid)
+        ]
+        if not dead:
+            return
+        path = os.path.join(directory, EXITED)
+        snapshots = []
+        if os.path.exists(path):
+            with open(path) as file:
+                snapshots.append((False, json.load(file)))
+        for name in dead:
+            try:
+                with open(os.path.join(directory, name)) as file:
+                    snapshots.append((False, json.load(file)))
+            except ValueError:
+                # Half-written by a process killed meanwhile; its last counts are lost
+                pass
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(as_snapshot(merge(snapshots)), file)
+        os.replace(temporary, path)
+        for name in dead:
+            os.remove(os.path.join(directory, name))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge(snapshots):
+    """One snapshot summing ``(live, snapshot)`` pairs; gauges only come from live ones."""
+    merged = {}
+    for live, snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, 'samples': {}})
+            if metric['kind'] == 'gauge' and not live:
+                continue
+            samples = target['samples']
+            for key, value in metric['samples']:
+                key = tuple(key)
+                if metric['kind'] != 'histogram':
+                    samples[key] = samples.get(key, 0) + value
+                elif key not in samples:
+                    samples[key] = [list(value[0]), value[1], value[2]]
+                else:
+                    counts, total, count = samples[key]
+                    samples[key] = [[a + b for a, b in zip(counts, value[0])], total + value[1], count + value[2]]
+    return merged
+
+
+def as_snapshot(merged):
+    """A :func:`merge` result in the snapshot format again."""
+    return {
+        name: {**metric, 'samples': [[list(key), value] for key, value in metric['samples'].items()]}
+        for name, metric in merged.items()
+    }
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if value.is_integer():
+            return str(int(value))
+    return repr(value)
+
+
+def exposition(merged):
+    """``merged`` in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for key, value in sorted(metric['samples'].items()):
+            if metric['kind'] != 'histogram':
+                lines.append(f"{name}{_labels(metric['labels'], key)} {_number(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip([*metric['buckets'], math.inf], counts):
+                cumulative += bucket_count
+                le = (('le', _number(float(bound))),)
+                lines.append(f"{name}_bucket{_labels(metric['labels'], key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric['labels'], key)} {_number(float(total))}")
+            lines.append(f"{name}_count{_labels(metric['labels'], key)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def render(registry=None, directory=None):
+    """The metrics of every worker as Prometheus text."""
+    registry = registry if registry is not None else default_registry
+    return exposition(merge(registry.collect(directory)))
+
+
+default_registry = Registry()
+
+requests_total = Counter(
+    'http_requests_total', 'HTTP requests answered, by view, method and status', ['endpoint', 'method', 'status'],
+)
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Time to build HTTP responses, by view and method', ['endpoint', 'method'],
+)
+rows_ingested = Counter(
+    'ingested_rows_total', 'Raw rows written, by table and ingestion path', ['table', 'path'],
+)
+analytics_cache_requests = Counter(
+    'analytics_cache_requests_total', 'Analytics cache lookups, by endpoint and outcome', ['endpoint', 'outcome'],
+)
+db_queries = Counter('db_queries_total', 'SQL queries executed, by database alias', ['alias'])
+db_query_duration = Histogram(
+    'db_query_duration_seconds', 'SQL query execution time, by database alias', ['alias'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+db_queries_in_flight = Gauge('db_queries_in_flight', 'SQL queries executing, by database alias', ['alias'])
+db_connections_opened = Counter(
+    'db_connections_opened_total', 'Database connections opened, by database alias', ['alias'],
+)
+
+# Connections (one per thread and alias) this process has opened, whether open or not any more
+_connections = weakref.WeakSet()
+
+
+def _open_connections():
+    counts = {}
+    for wrapper in list(_connections):
+        if wrapper.connection is not None:
+            counts[(wrapper.alias,)] = counts.get((wrapper.alias,), 0) + 1
+    return counts
+
+
+db_connections_open = Gauge(
+    'db_connections_open', 'Open database connections, by database alias', ['alias'], collect=_open_connections,
+)
+
+
+def observe_query(execute, sql, params, many, context):
+    alias = context['connection'].alias
+    db_queries_in_flight.inc(alias=alias)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        db_query_duration.observe(time.perf_counter() - started, alias=alias)
+        db_queries.inc(alias=alias)
+        db_queries_in_flight.dec(alias=alias)
+
+
+def _instrument_connection(connection, **kwargs):
+    db_connections_opened.inc(alias=connection.alias)
+    _connections.add(connection)
+    if observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(observe_query)
+
+
+def install():
+    """Instrument database connections and start sharing this process's metrics through METRICS_DIR."""
+    connection_created.connect(_instrument_connection, dispatch_uid='monitoring.metrics')
+    if settings.METRICS_DIR:
+        default_registry.start_flusher(settings.METRICS_FLUSH_INTERVAL)
+        atexit.register(default_registry.flush)
+        os.register_at_fork(after_in_child=default_registry._after_fork)
+
+
+class MetricsMiddleware:
+    """
+    Count requests and time them per view (``METRICS_ENABLED``).
+
+    Views are labeled by URL name (``electricaldata-list``, ``energy_kpis``),
+    requests no URL matched as ``unmatched``. Streaming responses are timed
+    until their first byte is ready.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _observe(self, request, response, started):
+        match = request.resolver_match
+        endpoint = (match.view_name or match.route) if match is not None else 'unmatched'
+        request_duration.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+        requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        return self._observe(request, self.get_response(request), started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        return self._observe(request, await self.get_response(request), started)
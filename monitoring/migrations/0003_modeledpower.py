@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_alter_electricaldata_adresse_alter_electricaldata_i1_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModeledPower',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time', models.DateTimeField()),
+                ('t1', models.FloatField(blank=True, null=True)),
+                ('t2', models.FloatField(blank=True, null=True)),
+                ('u_dc', models.FloatField(blank=True, null=True)),
+                ('gti', models.FloatField(blank=True, null=True)),
+                ('air_temp', models.FloatField(blank=True, null=True)),
+                ('wind_speed', models.FloatField(blank=True, null=True)),
+                ('temp_cell', models.FloatField(blank=True, null=True)),
+                ('calculated_power', models.FloatField()),
+                ('system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitoring.pvsystem')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='modeledpower',
+            constraint=models.UniqueConstraint(fields=('system', 'time'), name='unique_modeled_power_system_time'),
+        ),
+    ]
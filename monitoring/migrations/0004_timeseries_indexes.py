@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_brin_index(apps, schema_editor):
+    # BRIN is PostgreSQL-only; it keeps time-range scans across all systems
+    # cheap on the append-only electrical table for a fraction of a B-tree's size
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS electrical_time_brin '
+            'ON monitoring_electricaldata USING brin (time)'
+        )
+
+
+def drop_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS electrical_time_brin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0003_modeledpower'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='electricaldata',
+            index=models.Index(fields=['system', 'time'], name='electrical_system_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meteorologicaldata',
+            index=models.Index(fields=['time'], name='meteorological_time_idx'),
+        ),
+        migrations.AlterField(
+            model_name='electricaldata',
+            name='system',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='monitoring.pvsystem'),
+        ),
+        migrations.RunPython(create_brin_index, drop_brin_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0004_timeseries_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='meteorologicaldata',
+            name='meteorological_time_idx',
+        ),
+        migrations.AddIndex(
+            model_name='electricaldata',
+            index=models.Index(fields=['time', 'id'], name='electrical_time_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meteorologicaldata',
+            index=models.Index(fields=['time', 'id'], name='meteorological_time_id_idx'),
+        ),
+    ]
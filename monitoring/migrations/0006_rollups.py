@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeteorologicalRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('5min', '5 minutes'), ('1h', 'Hourly'), ('1d', 'Daily')], max_length=4)),
+                ('time', models.DateTimeField()),
+                ('samples', models.IntegerField()),
+                ('gti_sum', models.FloatField()),
+                ('ghi_sum', models.FloatField()),
+                ('gti_wh_m2', models.FloatField()),
+                ('ghi_wh_m2', models.FloatField()),
+                ('mean_air_temp', models.FloatField(blank=True, null=True)),
+                ('mean_wind_speed', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ElectricalRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('5min', '5 minutes'), ('1h', 'Hourly'), ('1d', 'Daily')], max_length=4)),
+                ('time', models.DateTimeField()),
+                ('samples', models.IntegerField()),
+                ('energy_wh', models.FloatField()),
+                ('mean_p_dc', models.FloatField(blank=True, null=True)),
+                ('mean_u_dc', models.FloatField(blank=True, null=True)),
+                ('mean_i1', models.FloatField(blank=True, null=True)),
+                ('mean_t1', models.FloatField(blank=True, null=True)),
+                ('mean_t2', models.FloatField(blank=True, null=True)),
+                ('system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitoring.pvsystem')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='meteorologicalrollup',
+            constraint=models.UniqueConstraint(fields=('resolution', 'time'), name='unique_meteorological_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='electricalrollup',
+            constraint=models.UniqueConstraint(fields=('system', 'resolution', 'time'), name='unique_electrical_rollup'),
+        ),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:40
+
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+TABLE = 'monitoring_electricaldata'
+OLD_TABLE = f'{TABLE}_unpartitioned'
+SEQUENCE = f'{TABLE}_id_seq'
+# Monthly partitions created ahead of the current month; `manage.py partition_electrical` keeps this topped up
+MONTHS_AHEAD = 3
+
+INDEXES = [
+    'CREATE INDEX electrical_system_time_idx ON {table} (system_id, time)',
+    'CREATE INDEX electrical_time_id_idx ON {table} (time, id)',
+    'CREATE INDEX electrical_time_brin ON {table} USING brin (time)',
+]
+
+
+def next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def rename_indexes(cursor, table):
+    # Index names are schema-wide, so the copy being replaced gives them up first
+    cursor.execute('SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass', [table])
+    for name, in cursor.fetchall():
+        cursor.execute(f'ALTER INDEX {name} RENAME TO {name[:55]}_old')
+
+
+def move_foreign_keys(cursor, source, target):
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [source],
+    )
+    for name, definition in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {source} DROP CONSTRAINT {name}')
+        cursor.execute(f'ALTER TABLE {target} ADD CONSTRAINT {name} {definition}')
+
+
+def take_over_sequence(cursor, source, target):
+    """Give ``target.id`` a sequence named SEQUENCE that continues where ``source.id`` left off."""
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [source])
+    sequence, = cursor.fetchone()
+    cursor.execute(f"SELECT GREATEST(nextval('{sequence}'), (SELECT COALESCE(MAX(id), 0) + 1 FROM {source}))")
+    next_id, = cursor.fetchone()
+    cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'", [source])
+    if cursor.fetchone()[0]:
+        cursor.execute(f'ALTER TABLE {source} ALTER COLUMN id DROP IDENTITY')
+    else:
+        cursor.execute(f'ALTER TABLE {source} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'DROP SEQUENCE {sequence}')
+    cursor.execute(f'CREATE SEQUENCE {SEQUENCE} START WITH {next_id}')
+    cursor.execute(f"ALTER TABLE {target} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+    cursor.execute(f'ALTER SEQUENCE {SEQUENCE} OWNED BY {target}.id')
+
+
+def partition_table(apps, schema_editor):
+    """
+    Rebuild the electrical table as a parent range-partitioned by month on ``time``.
+
+    PostgreSQL requires the partition key in every unique constraint, so the
+    primary key becomes ``(id, time)``; ids still come from one sequence and
+    stay unique, which is all the ORM relies on. Existing rows are copied in
+    this migration's transaction, so on a large table run it in a maintenance
+    window.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}')
+        rename_indexes(cursor, OLD_TABLE)
+        cursor.execute(f'CREATE TABLE {TABLE} (LIKE {OLD_TABLE}) PARTITION BY RANGE (time)')
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, time)')
+        move_foreign_keys(cursor, OLD_TABLE, TABLE)
+        take_over_sequence(cursor, OLD_TABLE, TABLE)
+        for index in INDEXES:
+            cursor.execute(index.format(table=TABLE))
+
+        cursor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+        cursor.execute(f"SELECT date_trunc('month', MIN(time) AT TIME ZONE 'UTC') FROM {OLD_TABLE}")
+        first, = cursor.fetchone()
+        now = datetime.now(timezone.utc)
+        month = first.replace(tzinfo=timezone.utc) if first else datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+        last = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+        for _ in range(MONTHS_AHEAD):
+            last = next_month(last)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+            )
+            month = next_month(month)
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}')
+        cursor.execute(f'DROP TABLE {OLD_TABLE}')
+        cursor.execute(f'ANALYZE {TABLE}')
+
+
+def unpartition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}')
+        rename_indexes(cursor, OLD_TABLE)
+        cursor.execute(f'CREATE TABLE {TABLE} (LIKE {OLD_TABLE})')
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}')
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id)')
+        move_foreign_keys(cursor, OLD_TABLE, TABLE)
+        take_over_sequence(cursor, OLD_TABLE, TABLE)
+        for index in INDEXES:
+            cursor.execute(index.format(table=TABLE))
+        # Drops every partition with it
+        cursor.execute(f'DROP TABLE {OLD_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0007_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0008_partition_electrical'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('electrical', 'Electrical'), ('meteorological', 'Meteorological')], max_length=20)),
+                ('month', models.DateTimeField()),
+                ('path', models.CharField(max_length=255)),
+                ('rows', models.IntegerField()),
+                ('first_time', models.DateTimeField()),
+                ('last_time', models.DateTimeField()),
+                ('sums', models.JSONField(default=dict)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('system', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='monitoring.pvsystem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'system', 'first_time'], name='archived_month_range_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='archivedmonth',
+            constraint=models.UniqueConstraint(fields=('kind', 'system', 'month'), name='unique_archived_month'),
+        ),
+        migrations.AddConstraint(
+            model_name='archivedmonth',
+            constraint=models.UniqueConstraint(condition=models.Q(('system__isnull', True)), fields=('kind', 'month'), name='unique_archived_shared_month'),
+        ),
+    ]
@@ -0,0 +1,342 @@
+# monitoring/modeling.py
+
+from functools import reduce
+from operator import or_
+
+import numpy as np
+import pandas as pd
+import pvlib
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef, Q, Subquery
+
+from . import archive
+from .grid import MeteorologicalGrid
+from .loaders import load_frame
+from .metrics import Counter, Gauge
+from .models import ArchivedMonth, ElectricalData, MeteorologicalData, ModeledPower, PVSystem
+from .profiling import phase
+
+RESAMPLE_RULE = '5min'
+BIN = pd.Timedelta(RESAMPLE_RULE)
+TEMP_COEFF = -0.005  # Assuming a typical temperature coefficient
+
+ELECTRICAL_FIELDS = ['t1', 't2', 'u_dc']
+METEOROLOGICAL_FIELDS = ['gti', 'air_temp', 'wind_speed']
+
+
+class MissingDataError(Exception):
+    """Raised when a system has no electrical or meteorological data to model."""
+
+
+def _column(df, name):
+    if name not in df:
+        return np.full(len(df), np.nan)
+    return df[name].to_numpy(dtype=float)
+
+
+def model_power(merged_df, capacity):
+    """
+    Run the PVWatts model over every row of ``merged_df`` at once.
+
+    ``capacity`` (kW) is a scalar or an array aligned with the rows, so a
+    whole fleet can be modeled in one pass. Returns a frame indexed like
+    ``merged_df`` with ``temp_cell`` and ``calculated_power`` (W). Rows with
+    ``gti <= 0`` and rows whose result is NaN or infinite get zero power,
+    matching the historical per-row loop.
+    """
+    gti = _column(merged_df, 'gti')
+    air_temp = _column(merged_df, 'air_temp')
+    wind_speed = _column(merged_df, 'wind_speed')
+    p_stc = np.asarray(capacity, dtype=float) * 1000  # Convert kW to W
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        temp_cell = pvlib.temperature.pvsyst_cell(
+            poa_global=gti,
+            temp_air=air_temp,
+            wind_speed=wind_speed
+        )
+        p_dc = pvlib.pvsystem.pvwatts_dc(gti, temp_cell, p_stc, gamma_pdc=TEMP_COEFF)
+        p_dc = np.where(gti > 0, p_dc, 0.0)
+    p_dc[~np.isfinite(p_dc)] = 0.0
+
+    return pd.DataFrame(
+        {'temp_cell': temp_cell, 'calculated_power': p_dc},
+        index=merged_df.index,
+    )
+
+
+def _bin_floor(timestamp):
+    return pd.Timestamp(timestamp).floor(RESAMPLE_RULE)
+
+
+def _any_of(filters):
+    return reduce(or_, filters, Q(pk__in=[]))
+
+
+def _earliest(*times):
+    return min((time for time in times if time is not None), default=None)
+
+
+def _latest(*times):
+    return max((time for time in times if time is not None), default=None)
+
+
+def has_meteorological_data(first, last):
+    """Whether any meteo row, in the database or archived, falls in [first, last]."""
+    return (
+        MeteorologicalData.objects.filter(time__gte=first, time__lte=last).exists()
+        or archive.has_rows(archive.METEOROLOGICAL, first, last)
+    )
+
+
+def meteorological_neighbours(lo, hi):
+    """Times of the last meteo row before ``lo`` and the first at or after ``hi``, across both tiers."""
+    meteorological_data = MeteorologicalData.objects.all()
+    before = _latest(
+        meteorological_data.filter(time__lt=lo).aggregate(time=Max('time'))['time'],
+        archive.last_before(archive.METEOROLOGICAL, lo).get(None),
+    )
+    after = _earliest(
+        meteorological_data.filter(time__gte=hi).aggregate(time=Min('time'))['time'],
+        archive.first_after(archive.METEOROLOGICAL, hi, inclusive=True).get(None),
+    )
+    return before, after
+
+
+def resample_meteorological(frame):
+    """Resample raw meteo rows onto the 5-minute grid, interpolating gaps."""
+    return frame.set_index('time')[METEOROLOGICAL_FIELDS].resample(RESAMPLE_RULE).mean().interpolate()
+
+
+def load_meteorological(lo, hi):
+    """Raw meteo rows in [lo, hi) from both the database and the archive."""
+    fields = ['time', *METEOROLOGICAL_FIELDS]
+    return archive.with_archived(
+        load_frame(MeteorologicalData.objects.filter(time__gte=lo, time__lt=hi), fields),
+        archive.METEOROLOGICAL, fields, {None: (lo, hi)},
+    )
+
+
+# Every modeling path reads the meteo series through this process-wide grid
+meteorological_grid = MeteorologicalGrid(
+    load_meteorological, METEOROLOGICAL_FIELDS, RESAMPLE_RULE, settings.METEO_GRID_MAX_BYTES,
+)
+Gauge('meteo_grid_bytes', 'Bytes held by the meteo grid cache', collect=lambda: {(): meteorological_grid.nbytes})
+Counter(
+    'meteo_grid_loads_total', 'Ranges of raw meteo rows the grid cache had to load',
+    collect=lambda: {(): meteorological_grid.loads},
+)
+
+
+def resample_electrical(frame):
+    """Resample raw electrical rows of any number of systems onto each system's 5-minute grid."""
+    resampled = frame.set_index('time').groupby('system_id')[ELECTRICAL_FIELDS].resample(RESAMPLE_RULE).mean()
+    # Interpolate within a system only, never across two systems' series
+    return resampled.groupby(level='system_id', group_keys=False).apply(lambda series: series.interpolate())
+
+
+def align(electrical, meteorological):
+    """Attach the latest meteo bin at or before each electrical bin, as ``merge_asof`` does."""
+    electrical = electrical.reset_index().sort_values(['time', 'system_id'], kind='stable')
+    return pd.merge_asof(electrical, meteorological, left_on='time', right_index=True)
+
+
+def model_frame(electrical, meteorological, capacities):
+    """
+    Resample, align and model raw electrical rows of any number of systems.
+
+    ``meteorological`` is the resampled meteo series and ``capacities`` maps
+    system ids to kW. Returns the aligned bins with ``temp_cell`` and
+    ``calculated_power`` attached, ordered by time then system.
+    """
+    with phase('resample'):
+        merged = align(resample_electrical(electrical), meteorological)
+    with phase('pvlib'):
+        modeled = model_power(merged, merged['system_id'].map(capacities))
+    return pd.concat([merged, modeled], axis=1)
+
+
+def with_electrical_bounds(systems):
+    """Annotate systems with ``first_time``/``last_time`` of their electrical data via index lookups."""
+    electrical_data = ElectricalData.objects.filter(system=OuterRef('pk'))
+    return systems.annotate(
+        first_time=Subquery(electrical_data.order_by('time').values('time')[:1]),
+        last_time=Subquery(electrical_data.order_by('-time').values('time')[:1]),
+    )
+
+
+def _system_windows(bounds, start, end):
+    """
+    Per-system [lo, hi) windows of 5-minute bins to recompute for raw data in [start, end].
+
+    Each window is widened to the neighbouring raw rows on either side so the
+    resampling and interpolation see the same inputs as a full rebuild.
+    """
+    electrical_data = ElectricalData.objects.filter(system_id__in=list(bounds))
+    before, after = {}, {}
+    if start is not None:
+        before = dict(electrical_data.filter(time__lt=start).values_list('system').annotate(Max('time')).order_by())
+        for system_id, time in archive.last_before(archive.ELECTRICAL, start, list(bounds)).items():
+            before[system_id] = _latest(before.get(system_id), time)
+    if end is not None:
+        after = dict(electrical_data.filter(time__gt=end).values_list('system').annotate(Min('time')).order_by())
+        for system_id, time in archive.first_after(archive.ELECTRICAL, end, list(bounds)).items():
+            after[system_id] = _earliest(after.get(system_id), time)
+
+    windows = {}
+    for system_id, (first, last) in bounds.items():
+        lo = first if start is None else max(start, first)
+        hi = last if end is None else min(end, last)
+        windows[system_id] = (
+            _bin_floor(before.get(system_id) or lo),
+            _bin_floor(after.get(system_id) or hi) + BIN,
+        )
+    return windows
+
+
+def refresh_fleet_modeled_power(system_ids=None, start=None, end=None, workers=None):
+    """
+    Recompute the stored :class:`ModeledPower` rows affected by raw data in [start, end].
+
+    All systems (or ``system_ids``) are handled in one pass: one grouped query
+    loads every system's electrical rows, the shared meteo series is loaded
+    and resampled once, and the model runs once over the combined frame, so
+    the query count does not grow with the fleet. With no bounds each
+    system's whole history is rebuilt. With ``workers`` (default
+    ``settings.MODELING_WORKERS``) above 1 and at least
+    ``settings.MODELING_PARALLEL_MIN_ROWS`` raw rows, the CPU-bound part runs
+    on a process pool, per system and per ``settings.MODELING_CHUNK`` of time
+    (see :mod:`monitoring.parallel`). Returns ``{system_id: rows written}``,
+    holding a :class:`MissingDataError` for systems that cannot be modeled.
+    Stored rows are only cleared in the refreshed windows and in [start, end].
+    """
+    systems = PVSystem.objects.all()
+    if system_ids is not None:
+        systems = systems.filter(id__in=system_ids)
+    systems = with_electrical_bounds(systems).annotate(
+        has_meteo=Exists(MeteorologicalData.objects.filter(
+            time__gte=OuterRef('first_time'), time__lte=OuterRef('last_time')
+        )),
+    )
+
+    archived_bounds = archive.bounds(archive.ELECTRICAL, system_ids)
+
+    results, capacities, bounds = {}, {}, {}
+    for system_id, capacity, first, last, has_meteo in systems.values_list(
+        'id', 'capacity', 'first_time', 'last_time', 'has_meteo'
+    ):
+        capacities[system_id] = capacity
+        if system_id in archived_bounds:
+            first = _earliest(first, archived_bounds[system_id][0])
+            last = _latest(last, archived_bounds[system_id][1])
+        if first is not None and not has_meteo:
+            # The meteo may be archived, or lie in the archived part of the span
+            has_meteo = has_meteorological_data(first, last)
+        if first is None:
+            results[system_id] = MissingDataError('No electrical data found for this system')
+        elif not has_meteo:
+            results[system_id] = MissingDataError('No meteorological data found for the given time range')
+        else:
+            bounds[system_id] = (first, last)
+
+    windows = _system_windows(bounds, start, end)
+    merged = pd.DataFrame()
+    if windows:
+        fields = ['system_id', 'time', *ELECTRICAL_FIELDS]
+        with phase('load'):
+            electrical = archive.with_archived(
+                load_frame(
+                    ElectricalData.objects.filter(_any_of(
+                        Q(system_id=system_id, time__gte=lo, time__lt=hi) for system_id, (lo, hi) in windows.items()
+                    )),
+                    fields,
+                ),
+                archive.ELECTRICAL, fields, windows,
+            )
+
+        lo = min(lo for lo, _ in windows.values())
+        hi = max(hi for _, hi in windows.values())
+        meteo_before, meteo_after = meteorological_neighbours(lo, hi)
+        meteo_lo = _bin_floor(meteo_before) if meteo_before else lo
+        meteo_hi = _bin_floor(meteo_after) + BIN if meteo_after else hi
+        with phase('meteo'):
+            meteorological = meteorological_grid.frame(meteo_lo, meteo_hi)
+        workers = settings.MODELING_WORKERS if workers is None else workers
+        if workers > 1 and len(electrical) >= settings.MODELING_PARALLEL_MIN_ROWS:
+            from .parallel import model_frame_parallel
+            with phase('parallel'):
+                merged = model_frame_parallel(electrical, meteorological, capacities, workers, settings.MODELING_CHUNK)
+        else:
+            merged = model_frame(electrical, meteorological, capacities)
+
+    with phase('store'), transaction.atomic():
+        # Only what was refreshed is cleared: the modeled rows of raw data that
+        # retention detached (or that is otherwise gone unannounced) are kept
+        stale = [Q(system_id=system_id, time__gte=lo, time__lt=hi) for system_id, (lo, hi) in windows.items()]
+        if start is not None and end is not None:
+            stale.append(Q(
+                system_id__in=list(capacities), time__gte=_bin_floor(start), time__lt=_bin_floor(end) + BIN,
+            ))
+        ModeledPower.objects.filter(_any_of(stale)).delete()
+        _store_modeled_power(merged)
+
+    if not merged.empty:
+        results.update(merged.groupby('system_id').size().to_dict())
+    return results
+
+
+def _store_modeled_power(merged):
+    """Insert the modeled bins with COPY or batched INSERTs, like the importer, rather than an instance per row."""
+    # Imported here: the importer sends raw_data_written, whose receivers import this module
+    from .importers import copy_available, insert_frame
+
+    if merged.empty:
+        return
+    frame = pd.DataFrame({
+        'system_id': merged['system_id'].to_numpy(),
+        'time': pd.DatetimeIndex(merged['time']),
+        'calculated_power': merged['calculated_power'].to_numpy(dtype=float),
+        **{name: _column(merged, name) for name in [*ELECTRICAL_FIELDS, *METEOROLOGICAL_FIELDS, 'temp_cell']},
+    })
+    insert_frame(ModeledPower, frame, copy_available())
+
+
+def refresh_modeled_power(system, start=None, end=None):
+    """
+    Recompute the stored :class:`ModeledPower` rows of one system for raw data in [start, end].
+
+    Returns the number of rows written, or raises :class:`MissingDataError`
+    (after clearing its rows in [start, end]) when the system cannot be modeled at all.
+    """
+    result = refresh_fleet_modeled_power([system.id], start, end)[system.id]
+    if isinstance(result, MissingDataError):
+        raise result
+    return result
+
+
+def unmodeled_system_ids():
+    """Ids of systems that have electrical data but no stored modeled series yet."""
+    return list(
+        PVSystem.objects.filter(
+            Exists(ElectricalData.objects.filter(system=OuterRef('pk')))
+            | Exists(ArchivedMonth.objects.filter(kind=archive.ELECTRICAL, system=OuterRef('pk')))
+        )
+        .exclude(Exists(ModeledPower.objects.filter(system=OuterRef('pk'))))
+        .values_list('id', flat=True)
+    )
+
+
+def refresh_after_meteorological_change(start, end):
+    """Recompute every system's modeled power affected by meteo rows written in [start, end]."""
+    meteorological_grid.invalidate(start, end)
+    meteorological_data = MeteorologicalData.objects.all()
+    before = _latest(
+        meteorological_data.filter(time__lt=start).aggregate(time=Max('time'))['time'],
+        archive.last_before(archive.METEOROLOGICAL, start).get(None),
+    )
+    after = _earliest(
+        meteorological_data.filter(time__gt=end).aggregate(time=Min('time'))['time'],
+        archive.first_after(archive.METEOROLOGICAL, end).get(None),
+    )
+    return refresh_fleet_modeled_power(start=before or start, end=after or end)
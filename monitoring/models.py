@@ -11,7 +11,10 @@ class PVSystem(models.Model):
     year_of_installation = models.IntegerField()
 
 class ElectricalData(models.Model):
-    system = models.ForeignKey(PVSystem, on_delete=models.CASCADE)
+    # On PostgreSQL the table is range-partitioned by month on ``time`` with a
+    # primary key of (id, time); see migration 0008 and monitoring/partitions.py
+    # Covered by the (system, time) index below
+    system = models.ForeignKey(PVSystem, on_delete=models.CASCADE, db_index=False)
     time = models.DateTimeField()
     adresse = models.IntegerField(null=True, blank=True)
     i1 = models.FloatField(null=True, blank=True)
@@ -21,6 +24,12 @@ class ElectricalData(models.Model):
     t2 = models.FloatField(null=True, blank=True)
     i_sum = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['system', 'time'], name='electrical_system_time_idx'),
+            models.Index(fields=['time', 'id'], name='electrical_time_id_idx'),
+        ]
+
 class MeteorologicalData(models.Model):
     time = models.DateTimeField()
     gti = models.FloatField(null=True, blank=True)
@@ -34,3 +43,143 @@ class MeteorologicalData(models.Model):
     wind_dir = models.FloatField(null=True, blank=True)
     wind_gust = models.FloatField(null=True, blank=True)
     rain = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['time', 'id'], name='meteorological_time_id_idx'),
+        ]
+
+class ModeledPower(models.Model):
+    """PVWatts output on the 5-minute grid, kept in sync with the raw data it is derived from."""
+    system = models.ForeignKey(PVSystem, on_delete=models.CASCADE)
+    time = models.DateTimeField()
+    t1 = models.FloatField(null=True, blank=True)
+    t2 = models.FloatField(null=True, blank=True)
+    u_dc = models.FloatField(null=True, blank=True)
+    gti = models.FloatField(null=True, blank=True)
+    air_temp = models.FloatField(null=True, blank=True)
+    wind_speed = models.FloatField(null=True, blank=True)
+    temp_cell = models.FloatField(null=True, blank=True)
+    calculated_power = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['system', 'time'], name='unique_modeled_power_system_time'),
+        ]
+
+ROLLUP_RESOLUTIONS = [
+    ('5min', '5 minutes'),
+    ('1h', 'Hourly'),
+    ('1d', 'Daily'),
+]
+
+class ElectricalRollup(models.Model):
+    """Electrical aggregates per system over a 5-minute, hourly or daily bucket starting at ``time``."""
+    system = models.ForeignKey(PVSystem, on_delete=models.CASCADE)
+    resolution = models.CharField(max_length=4, choices=ROLLUP_RESOLUTIONS)
+    time = models.DateTimeField()
+    samples = models.IntegerField()
+    energy_wh = models.FloatField()
+    mean_p_dc = models.FloatField(null=True, blank=True)
+    mean_u_dc = models.FloatField(null=True, blank=True)
+    mean_i1 = models.FloatField(null=True, blank=True)
+    mean_t1 = models.FloatField(null=True, blank=True)
+    mean_t2 = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['system', 'resolution', 'time'], name='unique_electrical_rollup'),
+        ]
+
+class MeteorologicalRollup(models.Model):
+    """Meteorological aggregates over a 5-minute, hourly or daily bucket starting at ``time``."""
+    resolution = models.CharField(max_length=4, choices=ROLLUP_RESOLUTIONS)
+    time = models.DateTimeField()
+    samples = models.IntegerField()
+    gti_sum = models.FloatField()
+    ghi_sum = models.FloatField()
+    gti_wh_m2 = models.FloatField()
+    ghi_wh_m2 = models.FloatField()
+    mean_air_temp = models.FloatField(null=True, blank=True)
+    mean_wind_speed = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['resolution', 'time'], name='unique_meteorological_rollup'),
+        ]
+
+JOB_KINDS = [
+    ('recompute', 'Recompute modeled power'),
+    ('score', 'Score systems'),
+    ('export', 'Export electrical data'),
+]
+
+JOB_STATUSES = [
+    ('queued', 'Queued'),
+    ('running', 'Running'),
+    ('succeeded', 'Succeeded'),
+    ('failed', 'Failed'),
+]
+
+ACTIVE_JOB_STATUSES = ['queued', 'running']
+
+class Job(models.Model):
+    """A long-running computation queued in the database and run by ``manage.py run_jobs``."""
+    kind = models.CharField(max_length=20, choices=JOB_KINDS)
+    params = models.JSONField(default=dict, blank=True)
+    # Hash of kind and params, unique among queued and running jobs
+    dedup_key = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=JOB_STATUSES, default='queued')
+    progress = models.FloatField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField()
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'], condition=models.Q(status__in=ACTIVE_JOB_STATUSES),
+                name='unique_active_job',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+ARCHIVE_KINDS = [
+    ('electrical', 'Electrical'),
+    ('meteorological', 'Meteorological'),
+]
+
+class ArchivedMonth(models.Model):
+    """Raw rows of one month (of one system, for electrical data) moved out of the database into an HDF5 file."""
+    kind = models.CharField(max_length=20, choices=ARCHIVE_KINDS)
+    system = models.ForeignKey(PVSystem, null=True, blank=True, on_delete=models.CASCADE)
+    month = models.DateTimeField()
+    # Relative to settings.ARCHIVE_DIR
+    path = models.CharField(max_length=255)
+    rows = models.IntegerField()
+    first_time = models.DateTimeField()
+    last_time = models.DateTimeField()
+    # Sum of each field over the month, NULLs skipped as SQL SUM does
+    sums = models.JSONField(default=dict)
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'system', 'month'], name='unique_archived_month'),
+            models.UniqueConstraint(
+                fields=['kind', 'month'], condition=models.Q(system__isnull=True), name='unique_archived_shared_month',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'system', 'first_time'], name='archived_month_range_idx'),
+        ]
@@ -0,0 +1,214 @@
+# monitoring/parallel.py
+
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from .importers import init_worker
+from .modeling import (
+    BIN, ELECTRICAL_FIELDS, METEOROLOGICAL_FIELDS, align, model_frame, model_power, resample_electrical,
+)
+
+
+class SharedArrays:
+    """
+    NumPy arrays packed into one shared-memory block.
+
+    Worker processes map the block by name (:func:`attach`) instead of
+    receiving pickled copies, so handing a multi-year fleet to every worker
+    costs nothing per task.
+    """
+
+    def __init__(self, arrays):
+        arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+        self.shm = SharedMemory(create=True, size=max(sum(array.nbytes for array in arrays.values()), 1))
+        self.layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            np.ndarray(array.shape, array.dtype, buffer=self.shm.buf, offset=offset)[...] = array
+            self.layout[name] = (offset, array.shape, array.dtype.str)
+            offset += array.nbytes
+
+    @property
+    def handle(self):
+        return self.shm.name, self.layout
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Pool:
+    """
+    One :class:`ProcessPoolExecutor` kept for the life of the process.
+
+    Starting worker processes costs far more than modeling a few bins, so
+    every refresh submits to the same pool; it is only replaced when a
+    refresh asks for another size or a worker died and broke it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._workers = None
+
+    def get(self, workers):
+        with self._lock:
+            if self._executor is None or self._workers != workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ProcessPoolExecutor(workers, initializer=init_worker)
+                self._workers = workers
+            return self._executor
+
+    def discard(self, executor):
+        """Drop ``executor`` (broken) so the next :meth:`get` starts a new one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor, self._workers = None, None
+        executor.shutdown(wait=False)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor, self._workers = self._executor, None, None
+        if executor is not None:
+            executor.shutdown()
+
+    def _after_fork(self):
+        # The parent's worker processes are not the child's to use
+        self._lock = threading.Lock()
+        self._executor = None
+        self._workers = None
+
+
+pool = Pool()
+atexit.register(pool.shutdown)
+os.register_at_fork(after_in_child=pool._after_fork)
+
+
+def attach(handle, slices=None):
+    """Copy ``slices`` (``{name: slice}``, default everything) of a :class:`SharedArrays` block out of shared memory."""
+    name, layout = handle
+    shm = SharedMemory(name=name)
+    try:
+        return {
+            field: np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)[(slices or {}).get(field, slice(None))].copy()
+            for field, (offset, shape, dtype) in layout.items()
+        }
+    finally:
+        shm.close()
+
+
+def _meteorological_frame(columns):
+    index = pd.DatetimeIndex(columns.pop('time').view('datetime64[ns]'), name='time').tz_localize('UTC')
+    return pd.DataFrame(columns, index=index)
+
+
+def model_chunk(electrical_handle, meteorological_handle, rows, meteorological_rows, keep, capacity):
+    """
+    Model one system's bins in ``keep`` (``[lo, hi)`` in ns) from slices of the shared blocks.
+
+    ``rows`` reaches one bin past ``keep`` on both sides so resampling and
+    interpolation see exactly what a whole-history pass would, and
+    ``meteorological_rows`` starts at the last meteo bin at or before ``keep``.
+    """
+    electrical = pd.DataFrame(attach(
+        electrical_handle, {field: slice(*rows) for field in ['system_id', 'time', *ELECTRICAL_FIELDS]}
+    ))
+    electrical['time'] = pd.to_datetime(electrical['time'], utc=True)
+    meteorological = _meteorological_frame(attach(
+        meteorological_handle, {field: slice(*meteorological_rows) for field in ['time', *METEOROLOGICAL_FIELDS]}
+    ))
+
+    resampled = resample_electrical(electrical)
+    bins = resampled.index.get_level_values('time').asi8
+    resampled = resampled[(bins >= keep[0]) & (bins < keep[1])]
+    merged = align(resampled, meteorological)
+    return pd.concat([merged, model_power(merged, capacity)], axis=1)
+
+
+def chunk_plan(system_ids, times, chunk):
+    """
+    Split raw rows sorted by ``(system_id, time)`` into work units of at most ``chunk`` per system.
+
+    Returns ``(system_id, (first row, last row + 1), (keep lo, keep hi))``
+    tuples in system then time order; times are int64 nanoseconds.
+    """
+    bin_ns, chunk_ns = BIN.value, max(pd.Timedelta(chunk).value // BIN.value, 1) * BIN.value
+    plan = []
+    system_starts = np.flatnonzero(np.r_[True, system_ids[1:] != system_ids[:-1]])
+    for start, stop in zip(system_starts, [*system_starts[1:], len(system_ids)]):
+        system_times = times[start:stop]
+        bins = system_times - system_times % bin_ns
+        lo, hi = int(bins[0]), int(bins[-1]) + bin_ns
+        for keep_lo in range(lo, hi, chunk_ns):
+            keep_hi = min(keep_lo + chunk_ns, hi)
+            first = np.searchsorted(system_times, keep_lo)
+            last = np.searchsorted(system_times, keep_hi)
+            # Widen to every row of the neighbouring bins on each side
+            if first > 0:
+                first = np.searchsorted(bins, bins[first - 1])
+            if last < len(system_times):
+                last = np.searchsorted(bins, bins[last], side='right')
+            plan.append((int(system_ids[start]), (int(start + first), int(start + last)), (keep_lo, keep_hi)))
+    return plan
+
+
+def model_frame_parallel(electrical, meteorological, capacities, workers, chunk='30D'):
+    """
+    :func:`~monitoring.modeling.model_frame` spread over a pool of ``workers`` processes.
+
+    The processes are those of the shared :data:`pool`, started on first
+    use. Raw rows and the resampled meteo series go to the workers through
+    shared memory; each task models one system over at most ``chunk`` of
+    time.
+    Partial frames are combined in plan order, never completion order, so
+    the output is identical to the single-process result.
+    """
+    if electrical.empty:
+        return model_frame(electrical, meteorological, capacities)
+    electrical = electrical.sort_values(['system_id', 'time'], kind='stable')
+    system_ids = electrical['system_id'].to_numpy(dtype='int64')
+    times = electrical['time'].to_numpy(dtype='datetime64[ns]').view('int64')
+    plan = chunk_plan(system_ids, times, chunk)
+
+    electrical_arrays = {'system_id': system_ids, 'time': times}
+    electrical_arrays.update({field: electrical[field].to_numpy(dtype=float) for field in ELECTRICAL_FIELDS})
+    meteorological_times = meteorological.index.to_numpy(dtype='datetime64[ns]').view('int64')
+    meteorological_arrays = {'time': meteorological_times}
+    meteorological_arrays.update({field: meteorological[field].to_numpy(dtype=float) for field in METEOROLOGICAL_FIELDS})
+
+    with SharedArrays(electrical_arrays) as shared_electrical, SharedArrays(meteorological_arrays) as shared_meteo:
+        executor = pool.get(workers)
+        futures = []
+        try:
+            for system_id, rows, keep in plan:
+                futures.append(executor.submit(
+                    model_chunk, shared_electrical.handle, shared_meteo.handle, rows,
+                    (max(np.searchsorted(meteorological_times, keep[0], side='right') - 1, 0),
+                     np.searchsorted(meteorological_times, keep[1])),
+                    keep, capacities[system_id],
+                ))
+            parts = [future.result() for future in futures]
+        except BrokenProcessPool:
+            pool.discard(executor)
+            raise
+        finally:
+            # The shared blocks go away with this block; tasks not started yet must not run
+            for future in futures:
+                future.cancel()
+
+    merged = pd.concat(parts, ignore_index=True)
+    return merged.sort_values(['time', 'system_id'], kind='stable', ignore_index=True)
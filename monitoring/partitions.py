@@ -0,0 +1,138 @@
+# monitoring/partitions.py
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ElectricalData
+
+# On PostgreSQL, migration 0008 turns the electrical table into a parent
+# range-partitioned by month on ``time``, with one partition per UTC month
+# plus a default partition that catches rows no monthly partition covers yet.
+PARENT = ElectricalData._meta.db_table
+DEFAULT_PARTITION = f'{PARENT}_default'
+PARTITION_NAME = re.compile(rf'^{PARENT}_p(\d{{4}})_(\d{{2}})$')
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass)', [PARENT])
+        return cursor.fetchone()[0]
+
+
+def month_floor(value):
+    value = timezone.localtime(value, dt_timezone.utc) if timezone.is_aware(value) else value
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{PARENT}_p{month:%Y_%m}'
+
+
+def partitions():
+    """The monthly partitions attached to the electrical table, as ``[(name, month)]`` oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = inhrelid '
+            'WHERE inhparent = %s::regclass',
+            [PARENT],
+        )
+        names = [name for name, in cursor.fetchall()]
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append((name, datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)))
+    return sorted(months, key=lambda partition: partition[1])
+
+
+def create_partition(month):
+    """
+    Create the partition for ``month``, moving any of its rows out of the default partition.
+
+    PostgreSQL refuses a new partition while the default one holds rows that
+    belong to it, so those rows are copied into a standalone table which is
+    then attached; the indexes, primary key and foreign key of the parent are
+    added to it on attach.
+    """
+    name, lo, hi = partition_name(month), month, add_months(month, 1)
+    bounds = f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE time >= %s AND time < %s)', [lo, hi]
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(f'CREATE TABLE {name} PARTITION OF {PARENT} {bounds}')
+            return name
+        cursor.execute(f'CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE time >= %s AND time < %s RETURNING *) '
+            f'INSERT INTO {name} SELECT * FROM moved',
+            [lo, hi],
+        )
+        cursor.execute(f'ALTER TABLE {PARENT} ATTACH PARTITION {name} {bounds}')
+    return name
+
+
+def ensure_partitions(months_ahead=None, start=None):
+    """
+    Create the missing monthly partitions up to ``months_ahead`` months past the current one.
+
+    Partitions start from ``start`` (default: the current month) and are also
+    created for every month with rows waiting in the default partition, so
+    backfills of old data end up partitioned too. Months whose partition was
+    detached by :func:`apply_retention` are skipped. Returns the names created.
+    """
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+    current = month_floor(timezone.now())
+    month = month_floor(start) if start is not None else current
+    wanted = set()
+    while month <= add_months(current, months_ahead):
+        wanted.add(month)
+        month = add_months(month, 1)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', time AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION}")
+        wanted.update(month.replace(tzinfo=dt_timezone.utc) for month, in cursor.fetchall())
+
+    existing = {month for _, month in partitions()}
+    # Detached partitions keep their name; their months are not recreated
+    tables = set(connection.introspection.table_names())
+    return [
+        create_partition(month) for month in sorted(wanted - existing) if partition_name(month) not in tables
+    ]
+
+
+def apply_retention(keep_months=None, drop=False):
+    """
+    Detach (or with ``drop``, drop) the partitions of months older than the last ``keep_months``.
+
+    Detached partitions stay in the database as standalone tables that can be
+    dumped and dropped at leisure; either way the rows leave the hot table in
+    a catalog operation instead of a bulk DELETE. Returns the names removed.
+    """
+    if keep_months is None:
+        keep_months = settings.PARTITION_RETAIN_MONTHS
+    if not keep_months:
+        return []
+    cutoff = add_months(month_floor(timezone.now()), -keep_months)
+    removed = []
+    for name, month in partitions():
+        if month >= cutoff:
+            break
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {PARENT} DETACH PARTITION {name}')
+            if drop:
+                cursor.execute(f'DROP TABLE {name}')
+        removed.append(name)
+    return removed
@@ -0,0 +1,261 @@
+# monitoring/profiling.py
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# The profile of the request being handled; None outside profiled requests,
+# so the hooks below cost one context variable lookup when profiling is off
+current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Timings of one request: SQL queries, named phases and the threads that worked on it."""
+
+    def __init__(self, thread_id):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.phases = {}
+        self.threads = {thread_id}
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.queries += 1
+            self.sql += seconds
+
+    def add_phase(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self, total):
+        """The ``Server-Timing`` header value, durations in milliseconds."""
+        metrics = [f'sql;dur={self.sql * 1000:.1f};desc="{self.queries} queries"']
+        metrics += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.phases.items()]
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def phase(name):
+    """Time the enclosed block as phase ``name`` of the current request, if it is profiled."""
+    profile = current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_phase(name, time.perf_counter() - started)
+
+
+def bind(func):
+    """
+    ``func`` run in a copy of the caller's context, for handing to another thread.
+
+    The thread running it is sampled along with the request's own while it runs.
+    """
+    context = copy_context()
+
+    def call(*args, **kwargs):
+        profile = context.get(current)
+        if profile is None:
+            return context.run(func, *args, **kwargs)
+        thread_id = threading.get_ident()
+        profile.threads.add(thread_id)
+        # Connections are per thread, and this one's may predate install_query_recorder
+        for connection in connections.all(initialized_only=True):
+            _install_query_recorder(connection)
+        try:
+            return context.run(func, *args, **kwargs)
+        finally:
+            profile.threads.discard(thread_id)
+    return call
+
+
+def record_query(execute, sql, params, many, context):
+    profile = current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(time.perf_counter() - started)
+
+
+def _install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_recorder():
+    """Time the queries of every database connection, open or to come."""
+    connection_created.connect(_install_query_recorder, dispatch_uid='monitoring.profiling')
+    for connection in connections.all(initialized_only=True):
+        _install_query_recorder(connection)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class Sampler(threading.Thread):
+    """
+    Sampling profiler of a request's threads.
+
+    Every ``interval`` seconds the stacks of the threads in ``profile`` are
+    read with :func:`sys._current_frames` and counted as folded stacks
+    (``outer;...;inner count`` per line), the input format of flamegraph.pl
+    and speedscope.
+    """
+
+    def __init__(self, profile, interval):
+        super().__init__(name='profiling-sampler', daemon=True)
+        self.profile = profile
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.profile.threads):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in per-request profiling (``PROFILING_ENABLED``).
+
+    Every response gets a ``Server-Timing`` header with the SQL time and
+    query count, the time of each :func:`phase` the request went through
+    (``render`` being the serialization of the response) and the total, and
+    the same figures are logged as one JSON line on the
+    ``monitoring.profiling`` logger. With ``PROFILING_SAMPLE_THRESHOLD`` (ms)
+    set, the request's threads (under ASGI, the event loop's and the one a
+    sync view runs on) are also sampled every
+    ``PROFILING_SAMPLE_INTERVAL`` ms, and requests slower than the threshold
+    have their folded stacks written under ``PROFILING_DIR``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_query_recorder()
+
+    def _start(self):
+        profile = RequestProfile(threading.get_ident())
+        sampler = None
+        if settings.PROFILING_SAMPLE_THRESHOLD > 0:
+            sampler = Sampler(profile, settings.PROFILING_SAMPLE_INTERVAL / 1000)
+            sampler.start()
+        return profile, current.set(profile), sampler
+
+    def _finish(self, request, response, profile, token, sampler):
+        current.reset(token)
+        total = time.perf_counter() - profile.started
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'sql_ms': round(profile.sql * 1000, 1),
+            'queries': profile.queries,
+            'phases': {name: round(seconds * 1000, 1) for name, seconds in profile.phases.items()},
+        }
+        if sampler is not None:
+            sampler.stop()
+            if total * 1000 >= settings.PROFILING_SAMPLE_THRESHOLD and sampler.stacks:
+                record['profile'] = self._dump(request, total, sampler)
+        response['Server-Timing'] = profile.server_timing(total)
+        logger.info(json.dumps(record))
+        return response
+
+    def _dump(self, request, total, sampler):
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        name = f'{time.strftime("%Y%m%dT%H%M%S")}-{request.method}-{slug}-{total * 1000:.0f}ms.folded'
+        path = os.path.join(settings.PROFILING_DIR, name)
+        sampler.dump(path)
+        return path
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token, sampler = self._start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            current.reset(token)
+            if sampler is not None:
+                sampler.stop()
+            raise
+        return self._finish(request, response, profile, token, sampler)
+
+    async def __acall__(self, request):
+        profile, token, sampler = self._start()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            current.reset(token)
+            if sampler is not None:
+                sampler.stop()
+            raise
+        return self._finish(request, response, profile, token, sampler)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Under ASGI this sync hook runs where a sync view will, on the request's
+        # sync_to_async thread rather than the event loop's, so sample that thread too
+        profile = current.get()
+        if profile is not None:
+            profile.threads.add(threading.get_ident())
+
+    def process_template_response(self, request, response):
+        # Called right before a DRF response is rendered, in the request's own thread
+        profile = current.get()
+        if profile is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: profile.add_phase('render', time.perf_counter() - started)
+            )
+        return response
@@ -0,0 +1,98 @@
+# monitoring/renderers.py
+
+import csv
+import io
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_CHUNK_SIZE = 2000
+
+_encoder = JSONEncoder()
+
+
+def _plain(value):
+    """Scalars as-is; datetimes and the like as the JSON renderer would write them."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return _encoder.default(value)
+
+
+def _batches(records, size):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    A renderer for flat records that can also stream them.
+
+    ``render`` handles ordinary responses (errors, cached data); views that
+    produce large series call :meth:`streaming_response` with a lazy iterable
+    of records instead, so rows are encoded and sent ``chunk_size`` at a time.
+    Under ASGI, Django reads a sync iterator to the end before sending
+    anything, so those views ask for an async one (``asynchronous=True``).
+    """
+    charset = 'utf-8'
+
+    def encode(self, records, fields, header):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        records = data if isinstance(data, list) else [data]
+        fields = list(records[0]) if records else []
+        return self.encode(records, fields, header=True).encode(self.charset)
+
+    def stream(self, records, fields, chunk_size=STREAM_CHUNK_SIZE):
+        header = True
+        for batch in _batches(records, chunk_size):
+            yield self.encode(batch, fields, header)
+            header = False
+        if header:
+            # Still emit the header for an empty series
+            yield self.encode([], fields, header)
+
+    async def astream(self, records, fields, chunk_size=STREAM_CHUNK_SIZE):
+        """:meth:`stream` as an async iterator; chunks are read and encoded on the thread that opened ``records``."""
+        chunks = self.stream(records, fields, chunk_size)
+        while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+            yield chunk
+
+    def streaming_response(self, records, fields, chunk_size=STREAM_CHUNK_SIZE, asynchronous=False):
+        return StreamingHttpResponse(
+            (self.astream if asynchronous else self.stream)(records, fields, chunk_size),
+            content_type=f'{self.media_type}; charset={self.charset}',
+        )
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """One JSON object per line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def encode(self, records, fields, header):
+        return ''.join(json.dumps(record, cls=JSONEncoder) + '\n' for record in records)
+
+
+class CSVRenderer(StreamingRenderer):
+    """Comma separated values with a header row."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def encode(self, records, fields, header):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+        if header and fields:
+            writer.writeheader()
+        writer.writerows(
+            {field: _plain(value) for field, value in record.items()}
+            for record in records
+        )
+        return buffer.getvalue()
@@ -0,0 +1,210 @@
+# monitoring/rollups.py
+
+from datetime import timezone
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Avg, Count, Sum
+from django.db.models.functions import TruncDay
+
+from . import archive
+from .loaders import load_frame
+from .models import ElectricalData, ElectricalRollup, MeteorologicalData, MeteorologicalRollup
+
+# Rollup resolution -> pandas resample rule
+RESOLUTION_RULES = {
+    '5min': '5min',
+    '1h': '1h',
+    '1d': '1D',
+}
+# Resolutions rebuilt from raw rows; daily buckets are aggregated by the database
+SUB_DAILY = ('5min', '1h')
+
+ELECTRICAL_MEANS = {'p_dc': 'mean_p_dc', 'u_dc': 'mean_u_dc', 'i1': 'mean_i1', 't1': 'mean_t1', 't2': 'mean_t2'}
+METEOROLOGICAL_MEANS = {'air_temp': 'mean_air_temp', 'wind_speed': 'mean_wind_speed'}
+
+
+def day_window(start, end):
+    """Whole UTC days covering [start, end], the unit daily rollups are recomputed in."""
+    lo = pd.Timestamp(start).floor('1D')
+    hi = pd.Timestamp(end).floor('1D') + pd.Timedelta(days=1)
+    return lo, hi
+
+
+def hour_window(start, end):
+    """Whole UTC hours covering [start, end], the unit 5-minute and hourly rollups are recomputed in."""
+    lo = pd.Timestamp(start).floor('1h')
+    hi = pd.Timestamp(end).floor('1h') + pd.Timedelta(hours=1)
+    return lo, hi
+
+
+def _load(queryset, fields, archived=None):
+    """Rows of ``queryset`` indexed by time, plus the archived rows of ``archived``, a ``(kind, windows)`` pair."""
+    if archived is None:
+        return load_frame(queryset.order_by('time'), ['time', *fields], index='time')
+    kind, windows = archived
+    frame = archive.with_archived(load_frame(queryset, ['time', *fields]), kind, ['time', *fields], windows)
+    return frame.sort_values('time').set_index('time')
+
+
+def _minute_integral(series):
+    """Integrate a power-like series to per-minute energy (value x 1/60 h), missing minutes counting as zero."""
+    return series.resample('1min').mean().fillna(0.0) / 60
+
+
+def _nullable(value):
+    return None if np.isnan(value) else float(value)
+
+
+def electrical_buckets(frame, rule):
+    """Aggregate raw electrical rows into ``rule`` buckets; empty buckets are dropped."""
+    resampled = frame.resample(rule)
+    buckets = resampled[list(ELECTRICAL_MEANS)].mean().rename(columns=ELECTRICAL_MEANS)
+    buckets['samples'] = resampled.size()
+    buckets['energy_wh'] = _minute_integral(frame['p_dc']).resample(rule).sum()
+    return buckets[buckets['samples'] > 0]
+
+
+def meteorological_buckets(frame, rule):
+    """Aggregate raw meteorological rows into ``rule`` buckets; empty buckets are dropped."""
+    resampled = frame.resample(rule)
+    buckets = resampled[list(METEOROLOGICAL_MEANS)].mean().rename(columns=METEOROLOGICAL_MEANS)
+    buckets['samples'] = resampled.size()
+    buckets['gti_sum'] = resampled['gti'].sum()
+    buckets['ghi_sum'] = resampled['ghi'].sum()
+    buckets['gti_wh_m2'] = _minute_integral(frame['gti']).resample(rule).sum()
+    buckets['ghi_wh_m2'] = _minute_integral(frame['ghi']).resample(rule).sum()
+    return buckets[buckets['samples'] > 0]
+
+
+def _buckets(frame, buckets, resolutions):
+    """``(resolution, time, bucket)`` of the buckets of ``frame`` at each of ``resolutions``."""
+    if frame.empty:
+        return
+    for resolution in resolutions:
+        for time, bucket in buckets(frame, RESOLUTION_RULES[resolution]).to_dict('index').items():
+            yield resolution, time, bucket
+
+
+def _by_day(queryset, lo, hi, **aggregates):
+    """``{day: aggregates}`` of the rows of ``queryset`` in [lo, hi), computed by the database per UTC day."""
+    rows = queryset.filter(time__gte=lo, time__lt=hi).annotate(
+        day=TruncDay('time', tzinfo=timezone.utc),
+    ).values('day').annotate(**aggregates).order_by()
+    return {row.pop('day'): row for row in rows}
+
+
+def update_electrical_rollups(system_id, start, end):
+    """
+    Recompute the electrical rollups of ``system_id`` touching [start, end].
+
+    The 5-minute and hourly buckets are rebuilt from the raw rows of the
+    hours touching the span, the daily ones from per-day SQL aggregates of
+    the raw rows plus the energy of their (just updated) hourly buckets, so a
+    single new reading costs a few buckets rather than its whole day. Days
+    reaching into the HDF5 archive are rebuilt whole, at every resolution,
+    from the rows of both tiers.
+    """
+    first_day, last_day = day_window(start, end)
+    tiered = archive.covers(archive.ELECTRICAL, first_day, last_day, system_id)
+    lo, hi = (first_day, last_day) if tiered else hour_window(start, end)
+    resolutions = list(RESOLUTION_RULES) if tiered else SUB_DAILY
+    frame = _load(
+        ElectricalData.objects.filter(system_id=system_id, time__gte=lo, time__lt=hi),
+        list(ELECTRICAL_MEANS),
+        (archive.ELECTRICAL, {system_id: (lo, hi)}) if tiered else None,
+    )
+    rollups = [
+        ElectricalRollup(
+            system_id=system_id,
+            resolution=resolution,
+            time=time,
+            samples=int(bucket['samples']),
+            energy_wh=float(bucket['energy_wh']),
+            **{field: _nullable(bucket[field]) for field in ELECTRICAL_MEANS.values()}
+        )
+        for resolution, time, bucket in _buckets(frame, electrical_buckets, resolutions)
+    ]
+
+    existing = ElectricalRollup.objects.filter(system_id=system_id)
+    with transaction.atomic():
+        existing.filter(resolution__in=resolutions, time__gte=lo, time__lt=hi).delete()
+        ElectricalRollup.objects.bulk_create(rollups, batch_size=5000)
+        if tiered:
+            return len(rollups)
+
+        energy = _by_day(existing.filter(resolution='1h'), first_day, last_day, energy_wh=Sum('energy_wh'))
+        days = [
+            ElectricalRollup(
+                system_id=system_id,
+                resolution='1d',
+                time=day,
+                energy_wh=energy.get(day, {}).get('energy_wh') or 0.0,
+                **row
+            )
+            for day, row in _by_day(
+                ElectricalData.objects.filter(system_id=system_id), first_day, last_day, samples=Count('pk'),
+                **{mean: Avg(field) for field, mean in ELECTRICAL_MEANS.items()}
+            ).items()
+        ]
+        existing.filter(resolution='1d', time__gte=first_day, time__lt=last_day).delete()
+        ElectricalRollup.objects.bulk_create(days)
+    return len(rollups) + len(days)
+
+
+def update_meteorological_rollups(start, end):
+    """Recompute the meteorological rollups touching [start, end], as :func:`update_electrical_rollups` does."""
+    first_day, last_day = day_window(start, end)
+    tiered = archive.covers(archive.METEOROLOGICAL, first_day, last_day)
+    lo, hi = (first_day, last_day) if tiered else hour_window(start, end)
+    resolutions = list(RESOLUTION_RULES) if tiered else SUB_DAILY
+    frame = _load(
+        MeteorologicalData.objects.filter(time__gte=lo, time__lt=hi),
+        ['gti', 'ghi', *METEOROLOGICAL_MEANS],
+        (archive.METEOROLOGICAL, {None: (lo, hi)}) if tiered else None,
+    )
+    rollups = [
+        MeteorologicalRollup(
+            resolution=resolution,
+            time=time,
+            samples=int(bucket['samples']),
+            gti_sum=float(bucket['gti_sum']),
+            ghi_sum=float(bucket['ghi_sum']),
+            gti_wh_m2=float(bucket['gti_wh_m2']),
+            ghi_wh_m2=float(bucket['ghi_wh_m2']),
+            **{field: _nullable(bucket[field]) for field in METEOROLOGICAL_MEANS.values()}
+        )
+        for resolution, time, bucket in _buckets(frame, meteorological_buckets, resolutions)
+    ]
+
+    with transaction.atomic():
+        MeteorologicalRollup.objects.filter(resolution__in=resolutions, time__gte=lo, time__lt=hi).delete()
+        MeteorologicalRollup.objects.bulk_create(rollups, batch_size=5000)
+        if tiered:
+            return len(rollups)
+
+        energy = _by_day(
+            MeteorologicalRollup.objects.filter(resolution='1h'), first_day, last_day,
+            gti_wh_m2=Sum('gti_wh_m2'), ghi_wh_m2=Sum('ghi_wh_m2'),
+        )
+        days = []
+        for day, row in _by_day(
+            MeteorologicalData.objects.all(), first_day, last_day, samples=Count('pk'),
+            gti_sum=Sum('gti'), ghi_sum=Sum('ghi'),
+            **{mean: Avg(field) for field, mean in METEOROLOGICAL_MEANS.items()}
+        ).items():
+            integrals = energy.get(day, {})
+            days.append(MeteorologicalRollup(
+                resolution='1d',
+                time=day,
+                samples=row.pop('samples'),
+                gti_sum=row.pop('gti_sum') or 0.0,
+                ghi_sum=row.pop('ghi_sum') or 0.0,
+                gti_wh_m2=integrals.get('gti_wh_m2') or 0.0,
+                ghi_wh_m2=integrals.get('ghi_wh_m2') or 0.0,
+                **row
+            ))
+        MeteorologicalRollup.objects.filter(resolution='1d', time__gte=first_day, time__lt=last_day).delete()
+        MeteorologicalRollup.objects.bulk_create(days)
+    return len(rollups) + len(days)
@@ -2,7 +2,7 @@
 
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import PVSystem, ElectricalData, MeteorologicalData
+from .models import PVSystem, ElectricalData, MeteorologicalData, ElectricalRollup, MeteorologicalRollup, Job
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -40,7 +40,115 @@ class ElectricalDataSerializer(serializers.ModelSerializer):
         model = ElectricalData
         fields = '__all__'
 
+MAX_BATCH_SIZE = 10_000
+
+class BatchSystemField(serializers.PrimaryKeyRelatedField):
+    """Resolves system ids against the systems a batch loaded up front instead of one query per row."""
+
+    def to_internal_value(self, data):
+        systems = getattr(self.root, 'systems', None)
+        if systems is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            system = systems.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if system is None:
+            self.fail('does_not_exist', pk_value=data)
+        return system
+
+class ElectricalDataBatchSerializer(serializers.ListSerializer):
+    """
+    Validates every reading of a batch but keeps going past invalid ones.
+
+    Valid readings become ``validated_data`` and are written with a single
+    ``bulk_create``; the rest are reported in ``row_errors`` as
+    ``{'row': <index>, 'errors': {...}}``.
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', MAX_BATCH_SIZE)
+        kwargs.setdefault('allow_empty', False)
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        self.row_errors = []
+        self._row = 0
+        if isinstance(data, list):
+            system_ids = set()
+            for item in data:
+                try:
+                    system_ids.add(int(item['system']))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            self.systems = PVSystem.objects.in_bulk(system_ids)
+        return [item for item in super().to_internal_value(data) if item is not None]
+
+    def run_child_validation(self, data):
+        row, self._row = self._row, self._row + 1
+        try:
+            return super().run_child_validation(data)
+        except serializers.ValidationError as exc:
+            self.row_errors.append({'row': row, 'errors': exc.detail})
+            return None
+
+    def create(self, validated_data):
+        return ElectricalData.objects.bulk_create(
+            [ElectricalData(**reading) for reading in validated_data], batch_size=5000
+        )
+
+class ElectricalReadingSerializer(ElectricalDataSerializer):
+    """:class:`ElectricalDataSerializer` for batch ingestion (``many=True``)."""
+    system = BatchSystemField(queryset=PVSystem.objects.all())
+
+    class Meta(ElectricalDataSerializer.Meta):
+        list_serializer_class = ElectricalDataBatchSerializer
+
 class MeteorologicalDataSerializer(serializers.ModelSerializer):
     class Meta:
         model = MeteorologicalData
         fields = '__all__'
+
+class ElectricalRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ElectricalRollup
+        fields = '__all__'
+
+class MeteorologicalRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MeteorologicalRollup
+        fields = '__all__'
+
+class JobParamsSerializer(serializers.Serializer):
+    """Parameters shared by every job kind; all optional, defaulting to every system over all time."""
+    system_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+    def validate_system_ids(self, value):
+        missing = set(value) - set(PVSystem.objects.filter(id__in=value).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(f'Unknown systems: {sorted(missing)}')
+        # Sorted and without duplicates, so equivalent requests deduplicate
+        return sorted(set(value))
+
+    def validate(self, attrs):
+        if 'start' in attrs and 'end' in attrs and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('start must not be after end')
+        return attrs
+
+class JobSerializer(serializers.ModelSerializer):
+    params = JobParamsSerializer(required=False)
+
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'kind', 'params', 'status', 'progress', 'message', 'result', 'error', 'attempts',
+            'max_attempts', 'run_after', 'created_at', 'started_at', 'finished_at',
+        )
+        read_only_fields = [field for field in fields if field not in ('kind', 'params')]
+
+    def validate_params(self, value):
+        # Stored as JSON: datetimes as ISO 8601 strings
+        return JobParamsSerializer(value).data if value else {}
@@ -0,0 +1,144 @@
+# monitoring/signals.py
+
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.dispatch import Signal, receiver
+
+from .cache import invalidate_watermarks
+from .modeling import refresh_after_meteorological_change, refresh_fleet_modeled_power
+from .models import ElectricalData, MeteorologicalData
+from .rollups import update_electrical_rollups, update_meteorological_rollups
+
+# Sent after raw rows are written by the importer or through the API, with
+# ``sender`` set to the model class and ``start``/``end`` bounding the times
+# written. ``system_ids`` lists the affected systems for electrical data.
+raw_data_written = Signal()
+
+logger = logging.getLogger(__name__)
+
+
+def _spans(instances, key=lambda instance: getattr(instance, 'system_id', None)):
+    spans = {}
+    for instance in instances:
+        first, last = spans.get(key(instance), (instance.time, instance.time))
+        spans[key(instance)] = (min(first, instance.time), max(last, instance.time))
+    return spans
+
+
+def _send(model, system_id, start, end):
+    raw_data_written.send(
+        sender=model,
+        system_ids=[system_id] if system_id is not None else None,
+        start=start,
+        end=end,
+    )
+
+
+def notify_written(model, instances):
+    """Send ``raw_data_written`` once per system for the span of ``instances`` written together."""
+    for system_id, (start, end) in _spans(instances).items():
+        _send(model, system_id, start, end)
+
+
+class DeferredNotifier:
+    """
+    Coalesce ``raw_data_written`` spans and send them from a background thread.
+
+    Writes of single rows would otherwise pay for refreshing the derived
+    tables one row at a time. Spans are merged per model, system and UTC day
+    (so an edit of an old row does not stretch a span over months) and sent
+    every ``delay`` seconds (default: ``RAW_DATA_NOTIFY_DELAY``), and at
+    exit. Spans pending in a process that is killed are lost;
+    ``rebuild_rollups`` and ``rebuild_modeled_power`` repair what they would
+    have refreshed.
+    """
+
+    def __init__(self, delay=None):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+
+    def add(self, model, instances):
+        spans = _spans(instances, lambda instance: (
+            getattr(instance, 'system_id', None), instance.time.astimezone(timezone.utc).date(),
+        ))
+        with self._lock:
+            for (system_id, day), (start, end) in spans.items():
+                first, last = self._pending.get((model, system_id, day), (start, end))
+                self._pending[(model, system_id, day)] = (min(first, start), max(last, end))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='raw-data-notifier', daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """Send the pending spans now."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for (model, system_id, _), (start, end) in sorted(pending.items(), key=lambda item: item[1]):
+            try:
+                _send(model, system_id, start, end)
+            except Exception:
+                logger.exception(
+                    'Derived data of %s rows in [%s, %s] could not be refreshed', model.__name__, start, end,
+                )
+        return len(pending)
+
+    def _run(self):
+        while True:
+            time.sleep(self.delay if self.delay is not None else settings.RAW_DATA_NOTIFY_DELAY)
+            self.flush()
+            close_old_connections()
+
+    def _after_fork(self):
+        # The parent sends what was pending before the fork
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+
+
+deferred = DeferredNotifier()
+atexit.register(deferred.flush)
+os.register_at_fork(after_in_child=deferred._after_fork)
+
+
+def notify_written_soon(model, instances):
+    """:func:`notify_written`, deferred by up to ``RAW_DATA_NOTIFY_DELAY`` seconds (0: right away)."""
+    if settings.RAW_DATA_NOTIFY_DELAY > 0:
+        deferred.add(model, instances)
+    else:
+        notify_written(model, instances)
+
+
+@receiver(raw_data_written, sender=ElectricalData)
+def update_modeled_power_for_electrical(sender, system_ids, start, end, **kwargs):
+    refresh_fleet_modeled_power(system_ids, start, end)
+
+
+@receiver(raw_data_written, sender=MeteorologicalData)
+def update_modeled_power_for_meteorological(sender, start, end, **kwargs):
+    refresh_after_meteorological_change(start, end)
+
+
+@receiver(raw_data_written, sender=ElectricalData)
+def update_rollups_for_electrical(sender, system_ids, start, end, **kwargs):
+    for system_id in system_ids:
+        update_electrical_rollups(system_id, start, end)
+
+
+@receiver(raw_data_written, sender=MeteorologicalData)
+def update_rollups_for_meteorological(sender, start, end, **kwargs):
+    update_meteorological_rollups(start, end)
+
+
+# Connected last so cached results are only invalidated once the derived tables are up to date
+@receiver(raw_data_written)
+def invalidate_cached_analytics(sender, system_ids=None, **kwargs):
+    invalidate_watermarks(system_ids if sender is ElectricalData else None)
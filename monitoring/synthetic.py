@@ -0,0 +1,183 @@
+# monitoring/synthetic.py
+
+import numpy as np
+import pandas as pd
+import pvlib
+
+from .importers import copy_available, write_frame
+from .models import ElectricalData, MeteorologicalData, PVSystem
+
+# Synthetic plants share one weather station, like the real ones: clear-sky
+# irradiance from pvlib at SITE, dimmed by a random clearness index with
+# day-to-day regimes and minute-scale cloud variability, transposed onto
+# the plane of array to give GTI. Each system turns that GTI into DC power
+# with the PVsyst cell temperature model and PVWatts (the same models the
+# modeling pipeline uses), scaled by its own performance factor, and loses
+# readings to scattered gaps, logger outages (rows missing) and inverter
+# trips (rows present, zero power).
+SITE = {'latitude': 32.22, 'longitude': -7.94, 'altitude': 450, 'tz': 'UTC'}
+TILT = 30
+AZIMUTH = 180
+
+# Technology -> power temperature coefficient (1/K)
+TECHNOLOGIES = {
+    'Mono-Si': -0.0040,
+    'Half-cut Mono-Si': -0.0035,
+    'Poly-Si': -0.0045,
+}
+INVERTER_TYPES = ['String 3 kW', 'String 10 kW', 'String 25 kW', 'Central 100 kW']
+
+GAP_RATE = 0.005            # share of single readings lost
+LOGGER_OUTAGES_PER_DAY = 0.01
+INVERTER_TRIPS_PER_DAY = 0.01
+MEAN_OUTAGE_MINUTES = 180
+
+
+def _rng(seed, *keys):
+    return np.random.default_rng([seed, *keys])
+
+
+def create_systems(count, seed=0, prefix='Synthetic'):
+    """Create ``count`` PV systems of plausible sizes and technologies."""
+    rng = _rng(seed)
+    systems = []
+    for number in range(1, count + 1):
+        panels = int(rng.integers(6, 400))
+        technology = str(rng.choice(list(TECHNOLOGIES)))
+        systems.append(PVSystem(
+            name=f'{prefix} {number}',
+            capacity=round(panels * float(rng.uniform(0.25, 0.45)), 2),
+            inverter_type=str(rng.choice(INVERTER_TYPES)),
+            number_of_panels=panels,
+            technology=technology,
+            year_of_installation=int(rng.integers(2012, 2025)),
+        ))
+    PVSystem.objects.bulk_create(systems)
+    # Not every backend returns primary keys from bulk_create
+    return list(PVSystem.objects.filter(name__in=[system.name for system in systems]).order_by('id'))
+
+
+def _smoothed_noise(rng, size, window):
+    noise = rng.normal(0, 1, size + window)
+    smoothed = np.convolve(noise, np.ones(window) / np.sqrt(window), mode='valid')
+    return smoothed[:size]
+
+
+def clearness_index(times, rng):
+    """A clearness index per time: a clear, mixed or overcast regime per day, with clouds passing in mixed ones."""
+    day = (times.asi8 // (86400 * 10**9)).astype('int64')
+    day -= day[0]
+    days = day[-1] + 1
+    base = rng.beta(5, 1.8, days)
+    # Clear and overcast days are steady; mixed days swing the most
+    variability = 0.9 * base * (1 - base)
+    clouds = _smoothed_noise(rng, len(times), 20)
+    return np.clip(base[day] + variability[day] * clouds * 1.5, 0.03, 1.0)
+
+
+def weather(times, rng, site=None):
+    """The meteo station's readings at ``times``, one column per :class:`MeteorologicalData` field."""
+    location = pvlib.location.Location(**(site or SITE))
+    solar = location.get_solarposition(times)
+    clear = location.get_clearsky(times, model='ineichen', solar_position=solar)
+    kt = clearness_index(times, rng)
+    ghi = clear['ghi'].to_numpy() * kt
+    dni = clear['dni'].to_numpy() * kt ** 2
+    zenith = solar['apparent_zenith'].to_numpy()
+    dhi = np.clip(ghi - dni * np.cos(np.radians(zenith)), 0, None)
+    poa = pvlib.irradiance.get_total_irradiance(
+        TILT, AZIMUTH, zenith, solar['azimuth'].to_numpy(), dni, ghi, dhi,
+    )
+    gti = np.nan_to_num(np.asarray(poa['poa_global'], dtype=float))
+
+    size = len(times)
+    day_of_year = times.dayofyear.to_numpy()
+    hour = times.hour.to_numpy() + times.minute.to_numpy() / 60
+    seasonal = 19 - 7 * np.cos((day_of_year - 15) / 365.25 * 2 * np.pi)
+    diurnal = 6 * np.sin((hour - 9) / 24 * 2 * np.pi)
+    air_temp = seasonal + diurnal * (0.5 + kt / 2) + _smoothed_noise(rng, size, 60) * 0.4
+    wind_speed = np.clip(3 + _smoothed_noise(rng, size, 30) * 0.5 + rng.normal(0, 0.6, size), 0, None)
+    rain = np.where(kt < 0.15, rng.exponential(0.05, size), 0.0)
+    return pd.DataFrame({
+        'time': times,
+        'gti': gti,
+        'ghi': ghi,
+        'dni': dni,
+        'dhi': dhi,
+        'air_temp': air_temp,
+        'rh': np.clip(70 - 1.5 * (air_temp - 15) + 20 * (1 - kt) + rng.normal(0, 3, size), 5, 100),
+        'pressure': 960 + _smoothed_noise(rng, size, 240) * 0.2,
+        'wind_speed': wind_speed,
+        'wind_dir': (250 + _smoothed_noise(rng, size, 60) * 8) % 360,
+        'wind_gust': wind_speed * rng.uniform(1.2, 1.8, size),
+        'rain': rain,
+    })
+
+
+def _outages(rng, size, per_day):
+    """Mask of the minutes covered by outages starting ``per_day`` times a day on average."""
+    mask = np.zeros(size, dtype=bool)
+    for start in np.flatnonzero(rng.random(size) < per_day / 1440):
+        mask[start:start + int(rng.exponential(MEAN_OUTAGE_MINUTES)) + 1] = True
+    return mask
+
+
+def electrical(system, meteo, rng, performance):
+    """The system's readings under ``meteo``, without the rows its logger lost."""
+    size = len(meteo)
+    gti, air_temp = meteo['gti'].to_numpy(), meteo['air_temp'].to_numpy()
+    temp_cell = pvlib.temperature.pvsyst_cell(gti, air_temp, meteo['wind_speed'].to_numpy())
+    p_dc = pvlib.pvsystem.pvwatts_dc(gti, temp_cell, system.capacity * 1000, TECHNOLOGIES.get(system.technology, -0.004))
+    p_dc = np.clip(p_dc * performance * rng.normal(1, 0.01, size), 0, None)
+    p_dc[_outages(rng, size, INVERTER_TRIPS_PER_DAY)] = 0.0
+
+    # Strings of up to 20 modules of about 31 V at maximum power
+    v_mp = 31 * min(system.number_of_panels, 20)
+    u_dc = np.where(p_dc > 0, v_mp * (1 - 0.0032 * (temp_cell - 25)) * rng.normal(1, 0.005, size), 0.0)
+    current = np.divide(p_dc, u_dc, out=np.zeros(size), where=u_dc > 0)
+    frame = pd.DataFrame({
+        'system_id': system.id,
+        'time': pd.DatetimeIndex(meteo['time']),
+        'adresse': 1,
+        'i1': current,
+        'u_dc': u_dc,
+        'p_dc': p_dc,
+        't1': temp_cell,
+        't2': air_temp + 8 + 20 * p_dc / (system.capacity * 1000),
+        'i_sum': current,
+    })
+    kept = ~(_outages(rng, size, LOGGER_OUTAGES_PER_DAY) | (rng.random(size) < GAP_RATE))
+    return frame[kept]
+
+
+def generate_fleet(systems, start, days, seed=0, chunk_days=7, meteorological=True, use_copy=None, progress=None):
+    """
+    Write ``days`` of 1-minute data from ``start`` for ``systems`` (and the meteo station unless not ``meteorological``).
+
+    Data is generated and written ``chunk_days`` at a time, so memory stays
+    flat however long the history; every chunk is one COPY (PostgreSQL) or
+    batched INSERT per table and system. The output only depends on the
+    arguments. ``progress`` is called with the running row count after every
+    chunk. Returns ``(electrical rows, meteo rows)`` written.
+    """
+    if use_copy is None:
+        use_copy = copy_available()
+    start = pd.Timestamp(start).tz_localize('UTC') if pd.Timestamp(start).tzinfo is None else pd.Timestamp(start)
+    performance = {system.id: _rng(seed, system.id).uniform(0.78, 0.92) for system in systems}
+    electrical_rows = meteorological_rows = 0
+    for chunk, offset in enumerate(range(0, days, chunk_days)):
+        times = pd.date_range(
+            start + pd.Timedelta(days=offset), periods=min(chunk_days, days - offset) * 1440, freq='1min',
+        )
+        meteo = weather(times, _rng(seed, chunk))
+        if meteorological:
+            kept = meteo[_rng(seed, chunk, 0).random(len(meteo)) >= GAP_RATE]
+            write_frame(MeteorologicalData, kept, use_copy)
+            meteorological_rows += len(kept)
+        for system in systems:
+            frame = electrical(system, meteo, _rng(seed, chunk, system.id), performance[system.id])
+            write_frame(ElectricalData, frame, use_copy)
+            electrical_rows += len(frame)
+        if progress is not None:
+            progress(electrical_rows + meteorological_rows)
+    return electrical_rows, meteorological_rows
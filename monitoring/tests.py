@@ -1,3 +1,1620 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import h5py
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .archive import ELECTRICAL, METEOROLOGICAL, archive_month, read_month
+from .cache import get_cache, invalidate_watermarks
+from .ingestion import BatchTooLarge, BufferFull, WriteBehindBuffer
+from . import ingestion
+from . import jobs
+from .jobs import run_next_job, submit
+from .grid import MeteorologicalGrid
+from .downsampling import lttb_indices, minmax_indices
+from .benchmarks import (
+    bench_suite, compare, legacy_load, legacy_model_power, synthetic_fleet_frames, synthetic_merged_frame,
+)
+from .kpis import KPI_RESOLUTIONS, bucket_integrals, energy_kpis, reference_integrals
+from .importers import ELECTRICAL_COLUMNS, METEOROLOGICAL_COLUMNS, import_file
+from .loaders import load_frame
+from . import metrics
+from .synthetic import weather
+from .modeling import (
+    METEOROLOGICAL_FIELDS, RESAMPLE_RULE, load_meteorological, meteorological_grid, model_frame, model_power,
+    refresh_fleet_modeled_power, refresh_modeled_power, resample_meteorological,
+)
+from . import parallel
+from .parallel import model_frame_parallel
+from .partitions import DEFAULT_PARTITION, add_months, apply_retention, ensure_partitions, partitions
+from .models import (
+    ArchivedMonth, ElectricalData, ElectricalRollup, Job, MeteorologicalData, ModeledPower, PVSystem,
+)
+from .rollups import update_electrical_rollups
+from .signals import DeferredNotifier
+
+
+def create_system(**kwargs):
+    defaults = {
+        'name': 'System 1',
+        'capacity': 16.56,
+        'inverter_type': 'Inverter Type 1',
+        'number_of_panels': 69,
+        'technology': 'Mono-Si',
+        'year_of_installation': 2015,
+    }
+    defaults.update(kwargs)
+    return PVSystem.objects.create(**defaults)
+
+
+def seed_data(system, start='2024-06-01 06:00', periods=600, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=periods, freq='1min', tz='UTC')
+    MeteorologicalData.objects.bulk_create([
+        MeteorologicalData(time=time, gti=gti, air_temp=air_temp, wind_speed=wind_speed)
+        for time, gti, air_temp, wind_speed in zip(
+            times, rng.normal(400, 300, periods), rng.normal(25, 3, periods), rng.uniform(0, 5, periods)
+        )
+    ])
+    ElectricalData.objects.bulk_create([
+        ElectricalData(system=system, time=time, u_dc=u_dc, t1=u_dc / 50, t2=u_dc / 60, p_dc=u_dc * 5)
+        for time, u_dc in zip(times[3::2], rng.normal(500, 20, periods))
+    ])
+    return times
+
+
+def modeled_series(system):
+    return list(ModeledPower.objects.filter(system=system).order_by('time').values_list(
+        'time', 'calculated_power', 'gti', 'u_dc'
+    ))
+
+
+class ModelPowerTests(TestCase):
+    def test_matches_legacy_loop(self):
+        merged_df = synthetic_merged_frame(2000)
+        merged_df.iloc[5, merged_df.columns.get_loc('gti')] = np.nan
+        merged_df.iloc[6, merged_df.columns.get_loc('wind_speed')] = np.nan
+        merged_df.iloc[7, merged_df.columns.get_loc('gti')] = np.inf
+
+        expected = legacy_model_power(merged_df, 16.56)
+        modeled = model_power(merged_df, 16.56)
+
+        np.testing.assert_allclose(modeled['calculated_power'].to_numpy(), expected)
+        self.assertTrue(np.isfinite(modeled['calculated_power']).all())
+
+
+class ModeledPowerRefreshTests(TestCase):
+    def test_incremental_refresh_matches_full_rebuild(self):
+        system = create_system()
+        times = seed_data(system)
+        refresh_modeled_power(system)
+
+        new_time = times[-1] + pd.Timedelta(minutes=17)
+        MeteorologicalData.objects.create(time=new_time, gti=650.0, air_temp=30.0, wind_speed=2.0)
+        ElectricalData.objects.create(system=system, time=new_time, u_dc=480.0, t1=9.0, t2=8.0)
+        ElectricalData.objects.filter(system=system, time=times[101]).delete()
+        refresh_modeled_power(system, new_time, new_time)
+        refresh_modeled_power(system, times[101], times[101])
+        incremental = modeled_series(system)
+
+        refresh_modeled_power(system)
+        self.assertEqual(incremental, modeled_series(system))
+
+    def test_rows_of_detached_raw_data_are_kept(self):
+        system = create_system()
+        times = seed_data(system)
+        refresh_modeled_power(system)
+        expected = modeled_series(system)
+
+        # Raw rows leaving unannounced, as a partition detached by retention does
+        ElectricalData.objects.filter(system=system, time__lt=times[300]).delete()
+        refresh_modeled_power(system, times[-1], times[-1])
+        refresh_modeled_power(system)
+        self.assertEqual(modeled_series(system)[:10], expected[:10])
+
+
+class FleetModelingTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def add_systems(self, count):
+        for _ in range(count):
+            system = create_system(name=f'System {PVSystem.objects.count() + 1}')
+            seed_data(system, periods=120, seed=system.id)
+
+    def count_queries(self, func):
+        # Inserts are batched by row count, so only reads are compared
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len([query for query in context.captured_queries if not query['sql'].startswith('INSERT')])
+
+    def test_query_count_does_not_grow_with_fleet(self):
+        paths = [
+            refresh_fleet_modeled_power,
+            lambda: self.client.get('/api/pvsystems/scores/'),
+            lambda: self.client.get('/api/system-totals/'),
+        ]
+        self.add_systems(2)
+        small = [self.count_queries(path) for path in paths]
+        get_cache().clear()
+        self.add_systems(4)
+        self.assertEqual([self.count_queries(path) for path in paths], small)
+
+    def test_fleet_pass_matches_single_system_refresh(self):
+        self.add_systems(3)
+        refresh_fleet_modeled_power()
+        fleet = {system.id: modeled_series(system) for system in PVSystem.objects.all()}
+        for system in PVSystem.objects.all():
+            refresh_modeled_power(system)
+            self.assertEqual(modeled_series(system), fleet[system.id])
+
+
+class CSVImportTests(TestCase):
+    def test_chunks_committed_before_a_failure_reach_the_derived_tables(self):
+        system = create_system()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'electrical.csv')
+            pd.DataFrame({
+                'Time': ['2024-06-01 06:00:00', '2024-06-01 06:01:00', 'not a time'],
+                **{column: [1.0, 2.0, 3.0] for column in ELECTRICAL_COLUMNS},
+            }).to_csv(path, index=False)
+            with self.assertRaises(ValueError):
+                call_command(
+                    'import_csv_data', '--electrical', str(system.id), path, '--chunk-size', '2',
+                    stdout=io.StringIO(),
+                )
+        self.assertEqual(ElectricalData.objects.count(), 2)
+        self.assertTrue(ElectricalRollup.objects.filter(system=system).exists())
+
+
+class LoaderTests(TestCase):
+    def setUp(self):
+        self.system = create_system()
+        seed_data(self.system, periods=100)
+        ElectricalData.objects.filter(id=ElectricalData.objects.order_by('time').first().id).update(t1=None)
+
+    def test_matches_values_path(self):
+        queryset = ElectricalData.objects.order_by('time')
+        fields = ['time', 'system_id', 'u_dc', 't1']
+        frame = load_frame(queryset, fields, index='time')
+        expected = legacy_load(queryset)[fields[1:]]
+
+        self.assertEqual(frame['system_id'].dtype, np.int64)
+        self.assertEqual(frame['t1'].dtype, np.float64)
+        self.assertTrue(np.isnan(frame['t1'].iloc[0]))
+        pd.testing.assert_frame_equal(frame, expected, check_dtype=False, check_index_type=False)
+
+    def test_empty_queryset(self):
+        frame = load_frame(ElectricalData.objects.none(), ['time', 'u_dc'])
+        self.assertTrue(frame.empty)
+        self.assertEqual(str(frame['time'].dtype), 'datetime64[ns, UTC]')
+
+    def test_chunked_load_matches_single_chunk(self):
+        queryset = ElectricalData.objects.order_by('time')
+        fields = ['time', 'system_id', 'u_dc', 't1']
+        # 100 rows in chunks of 7: the last one is partial
+        pd.testing.assert_frame_equal(load_frame(queryset, fields, chunk_size=7), load_frame(queryset, fields))
+
+    def test_no_matching_rows(self):
+        frame = load_frame(ElectricalData.objects.filter(system_id=-1), ['time', 'system_id', 'u_dc'])
+        self.assertTrue(frame.empty)
+        self.assertEqual(frame['system_id'].dtype, np.int64)
+
+
+class ParallelModelingTests(TestCase):
+    def test_chunked_pool_matches_single_process(self):
+        electrical, meteorological, capacities = synthetic_fleet_frames(systems=3, days=2)
+        expected = model_frame(electrical, meteorological, capacities).reset_index(drop=True)
+        # Chunks far smaller than the history, so most units are cut mid-series
+        parallel = model_frame_parallel(electrical, meteorological, capacities, workers=2, chunk='3h')
+        pd.testing.assert_frame_equal(parallel, expected)
+
+    @override_settings(MODELING_PARALLEL_MIN_ROWS=0)
+    def test_refresh_with_workers(self):
+        systems = [create_system(), create_system(name='System 2', capacity=8.0)]
+        seed_data(systems[0])
+        seed_data(systems[1], start='2024-06-01 07:00', periods=300, seed=1)
+        refresh_fleet_modeled_power()
+        expected = [modeled_series(system) for system in systems]
+        ModeledPower.objects.all().delete()
+        refresh_fleet_modeled_power(workers=2)
+        self.assertEqual([modeled_series(system) for system in systems], expected)
+
+        # Later refreshes reuse the processes of the first
+        executor = parallel.pool.get(2)
+        refresh_fleet_modeled_power(workers=2)
+        self.assertIs(parallel.pool.get(2), executor)
+        self.assertEqual([modeled_series(system) for system in systems], expected)
+
+    def test_small_refresh_stays_in_process(self):
+        seed_data(create_system(), periods=60)
+        with mock.patch('monitoring.parallel.model_frame_parallel') as model_frame_parallel:
+            refresh_fleet_modeled_power(workers=2)
+        model_frame_parallel.assert_not_called()
+        self.assertEqual(ModeledPower.objects.count(), 12)
+
+
+class TimeSeriesFilterTests(TestCase):
+    def setUp(self):
+        self.system = create_system()
+        self.other = create_system(name='System 2')
+        self.times = seed_data(self.system, periods=60)
+        ElectricalData.objects.create(system=self.other, time=self.times[0], u_dc=1.0)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_system_and_range(self):
+        response = self.client.get('/api/electricaldata/', {
+            'system': self.system.id,
+            'start': self.times[10].isoformat(),
+            'end': self.times[20].isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        expected = ElectricalData.objects.filter(
+            system=self.system, time__gte=self.times[10], time__lt=self.times[20]
+        ).count()
+        self.assertEqual(len(response.data['results']), expected)
+        self.assertTrue(all(row['system'] == self.system.id for row in response.data['results']))
+
+    def test_meteorological_system_uses_electrical_span(self):
+        response = self.client.get('/api/meteorologicaldata/', {'system': self.other.id})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/electricaldata/', {'start': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/electricaldata/', {'system': 'one'}).status_code, 400)
+
+
+class TimeKeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.system = create_system()
+        self.times = seed_data(self.system, periods=50)
+        # Duplicate timestamps must still page deterministically on id
+        ElectricalData.objects.create(system=self.system, time=self.times[11], u_dc=1.0)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def collect(self, url, params=None, on_page=None):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            if on_page is not None:
+                on_page()
+            if response.data['next'] is None:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_pages_cover_table_in_order(self):
+        ids = self.collect('/api/electricaldata/', {'page_size': 7})
+        expected = list(ElectricalData.objects.order_by('time', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_inserts_while_paging_are_stable(self):
+        before = list(ElectricalData.objects.order_by('time', 'id').values_list('id', flat=True))
+        late = iter(range(100))
+
+        def insert_rows():
+            offset = next(late)
+            ElectricalData.objects.create(system=self.system, time=self.times[0], u_dc=0.0)
+            ElectricalData.objects.create(
+                system=self.system, time=self.times[-1] + pd.Timedelta(minutes=offset + 1), u_dc=0.0
+            )
+
+        ids = self.collect('/api/electricaldata/', {'page_size': 5}, on_page=insert_rows)
+        self.assertEqual(ids[:len(before)], before)
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/electricaldata/', {'cursor': 'bogus'}).status_code, 404)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.system = create_system()
+        self.times = seed_data(self.system, periods=300)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def rollups(self):
+        return list(ElectricalRollup.objects.order_by('resolution', 'time').values_list(
+            'resolution', 'time', 'samples', 'energy_wh', 'mean_u_dc'
+        ))
+
+    def test_hourly_energy(self):
+        update_electrical_rollups(self.system.id, self.times[0], self.times[-1])
+        first_hour = ElectricalRollup.objects.get(resolution='1h', time=self.times[0])
+        rows = ElectricalData.objects.filter(time__lt=self.times[60])
+        self.assertEqual(first_hour.samples, rows.count())
+        self.assertAlmostEqual(first_hour.energy_wh, sum(row.p_dc for row in rows) / 60)
+
+    def test_daily_bucket(self):
+        update_electrical_rollups(self.system.id, self.times[0], self.times[-1])
+        day = ElectricalRollup.objects.get(resolution='1d')
+        hours = ElectricalRollup.objects.filter(resolution='1h')
+        rows = ElectricalData.objects.all()
+        self.assertEqual(day.samples, rows.count())
+        self.assertAlmostEqual(day.energy_wh, sum(hour.energy_wh for hour in hours))
+        self.assertAlmostEqual(day.mean_u_dc, sum(row.u_dc for row in rows) / rows.count())
+
+    def test_api_writes_update_rollups(self):
+        update_electrical_rollups(self.system.id, self.times[0], self.times[-1])
+        before = self.rollups()
+        with mock.patch('monitoring.signals.deferred', DeferredNotifier(delay=3600)) as deferred:
+            for time, p_dc in [(self.times[-1], 2000.0), (self.times[-2], 1500.0)]:
+                response = self.client.post('/api/electricaldata/', {
+                    'system': self.system.id, 'time': time.isoformat(), 'u_dc': 400.0, 'p_dc': p_dc,
+                })
+                self.assertEqual(response.status_code, 201)
+            self.assertEqual(self.rollups(), before)
+            # Refreshed shortly after the requests, coalesced as they fall on the same day
+            self.assertEqual(deferred.flush(), 1)
+        incremental = self.rollups()
+        self.assertNotEqual(incremental, before)
+
+        update_electrical_rollups(self.system.id, self.times[0], self.times[-1])
+        self.assertEqual(incremental, self.rollups())
+
+    def test_endpoint(self):
+        update_electrical_rollups(self.system.id, self.times[0], self.times[-1])
+        response = self.client.get('/api/rollups/', {
+            'resolution': '1h', 'system': self.system.id, 'start': self.times[60].isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['time'] for row in response.data['results']], [
+            time.isoformat().replace('+00:00', 'Z') for time in self.times[60::60]
+        ])
+        self.assertEqual(self.client.get('/api/rollups/', {'resolution': '2h'}).status_code, 400)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_suite_measures_every_case_against_a_seeded_fleet(self):
+        run = bench_suite(systems=2, days=1, repeat=1, import_rows=100)
+        self.assertEqual((run['systems'], run['days']), (2, 1))
+        self.assertTrue(0.98 * 24 * 60 < run['meteorological_rows'] <= 24 * 60)
+        self.assertEqual(PVSystem.objects.exclude(name='Import target').count(), 2)
+        self.assertTrue(all(case['queries'] > 0 for case in run['cases'] if case['case'].startswith('GET')))
+        self.assertTrue(all(case['latency_s']['min'] > 0 for case in run['cases']))
+
+        # Only the cached hit skips the work
+        queries = {case['case']: case['queries'] for case in run['cases']}
+        self.assertLess(queries['GET /api/system-totals/ (cached)'], queries['GET /api/system-totals/'])
+
+        results = {'fleets': [run]}
+        self.assertEqual({ratio for *_, ratio in compare(results, results)}, {1.0})
+
+
+class SyntheticFleetTests(TestCase):
+    def generate(self, **options):
+        call_command(
+            'generate_fleet', systems=2, days=2, start=datetime(2023, 6, 1, tzinfo=dt_timezone.utc),
+            stdout=io.StringIO(), **options
+        )
+
+    def test_generates_systems_with_plausible_minute_data(self):
+        self.generate()
+        systems = list(PVSystem.objects.filter(name__startswith='Synthetic ').order_by('name'))
+        self.assertEqual([system.name for system in systems], ['Synthetic 1', 'Synthetic 2'])
+
+        minutes = 2 * 24 * 60
+        meteo = load_frame(MeteorologicalData.objects.order_by('time'), ['time', 'gti', 'air_temp'], index='time')
+        self.assertTrue(0.98 * minutes < len(meteo) < minutes)
+        self.assertEqual(meteo.loc['2023-06-01 00:00':'2023-06-01 04:00', 'gti'].max(), 0)
+        self.assertGreater(meteo.loc['2023-06-01 11:00':'2023-06-01 14:00', 'gti'].mean(), 200)
+        for system in systems:
+            electrical = load_frame(ElectricalData.objects.filter(system=system), ['time', 'p_dc', 'u_dc'])
+            self.assertTrue(0.8 * minutes < len(electrical) < minutes)
+            self.assertLessEqual(electrical['p_dc'].max(), system.capacity * 1000 * 1.1)
+            self.assertGreater(electrical['p_dc'].max(), 0)
+
+        # Same seed, same weather
+        times = pd.date_range('2023-06-01', periods=60, freq='1min', tz='UTC')
+        pd.testing.assert_frame_equal(
+            weather(times, np.random.default_rng(1)), weather(times, np.random.default_rng(1))
+        )
+
+    def test_refuses_to_duplicate_meteo_or_names(self):
+        self.generate()
+        with self.assertRaisesMessage(CommandError, 'another --prefix'):
+            self.generate()
+        with self.assertRaisesMessage(CommandError, '--skip-meteo'):
+            self.generate(prefix='More')
+        self.generate(prefix='More', skip_meteo=True)
+        self.assertEqual(PVSystem.objects.filter(name__startswith='More ').count(), 2)
+
+
+class EnergyKPITests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.systems = [create_system(), create_system(name='System 2', capacity=8.0)]
+        self.times = seed_data(self.systems[0])
+        seed_data(self.systems[1], start='2024-06-01 07:00', seed=1)
+        # An outage longer than KPI_MAX_GAP, and readings without a value
+        ElectricalData.objects.filter(system=self.systems[0], time__range=(self.times[100], self.times[140])).delete()
+        ElectricalData.objects.filter(system=self.systems[1], time__in=self.times[201:211]).update(p_dc=None)
+        MeteorologicalData.objects.filter(time__in=self.times[300:305]).update(gti=None)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def reference(self, size, lo=None, hi=None):
+        electrical, meteorological = ElectricalData.objects.order_by('id'), MeteorologicalData.objects.order_by('id')
+        if lo is not None:
+            electrical, meteorological = electrical.filter(time__gte=lo), meteorological.filter(time__gte=lo)
+        if hi is not None:
+            electrical, meteorological = electrical.filter(time__lt=hi), meteorological.filter(time__lt=hi)
+        return {
+            **reference_integrals(load_frame(electrical, ['system_id', 'time', 'p_dc']), 'p_dc', size),
+            **reference_integrals(load_frame(meteorological, ['time', 'gti']), 'gti', size),
+        }
+
+    def test_sql_aggregation_matches_pandas_reference(self):
+        for size in KPI_RESOLUTIONS.values():
+            for lo, hi in [(None, None), (self.times[90], self.times[400])]:
+                with self.assertNumQueries(1):
+                    integrals = bucket_integrals(size, lo, hi)
+                expected = self.reference(size, lo, hi)
+                self.assertEqual(integrals.keys(), expected.keys())
+                for key, (samples, integral, covered) in expected.items():
+                    self.assertEqual(integrals[key][0], samples)
+                    np.testing.assert_allclose(integrals[key][1:], (integral, covered), rtol=1e-6, atol=1e-6)
+
+    def test_endpoint_returns_kpis_per_bucket(self):
+        response = self.client.get('/api/kpis/', {
+            'resolution': '1h', 'system': self.systems[0].id, 'start': '2024-06-01T06:30:00Z',
+        })
+        self.assertEqual(response.status_code, 200)
+        [kpis] = response.json()
+        self.assertEqual(kpis['system_id'], self.systems[0].id)
+        # Widened to whole hours: 06:00 to 15:00
+        self.assertEqual(len(kpis['time']), 10)
+        self.assertEqual(pd.Timestamp(kpis['time'][0]), pd.Timestamp('2024-06-01 06:00', tz='UTC'))
+
+        expected = self.reference(3600, lo=pd.Timestamp('2024-06-01 06:00', tz='UTC'))
+        bucket = pd.Timestamp(kpis['time'][1]).value // 10**9 // 3600
+        _, energy_wh, covered = expected[(self.systems[0].id, bucket)]
+        _, insolation_wh, _ = expected[(None, bucket)]
+        self.assertAlmostEqual(kpis['energy_kwh'][1], energy_wh / 1000, places=6)
+        self.assertAlmostEqual(kpis['specific_yield'][1], energy_wh / 1000 / 16.56, places=6)
+        self.assertAlmostEqual(kpis['performance_ratio'][1], energy_wh / 16.56 / insolation_wh, places=6)
+        self.assertAlmostEqual(kpis['availability'][1], covered / 3600, places=6)
+        # Hours the outage cuts into are only partly available
+        self.assertAlmostEqual(max(kpis['availability']), 1.0, places=6)
+        self.assertLess(min(kpis['availability']), 0.7)
+
+        self.assertEqual(self.client.get('/api/kpis/', {'resolution': '1w'}).status_code, 400)
+
+    def test_archived_months_are_integrated_too(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(ARCHIVE_DIR=directory):
+            expected = energy_kpis('1d')
+            june = datetime(2024, 6, 1, tzinfo=dt_timezone.utc)
+            archive_month(ELECTRICAL, june, [self.systems[0].id])
+            self.assertFalse(ElectricalData.objects.filter(system=self.systems[0]).exists())
+            archived = energy_kpis('1d')
+        self.assertEqual([kpis['time'] for kpis in archived], [kpis['time'] for kpis in expected])
+        for kpis, expected_kpis in zip(archived, expected):
+            np.testing.assert_allclose(kpis['energy_kwh'], expected_kpis['energy_kwh'], rtol=1e-9)
+            np.testing.assert_allclose(kpis['availability'], expected_kpis['availability'], rtol=1e-6)
+
+
+class AnalyticsCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.system = create_system()
+        self.times = seed_data(self.system, periods=120)
+        refresh_modeled_power(self.system)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_hit_until_new_data(self):
+        first = self.client.get('/api/totals-p_dc/').data
+        with self.assertNumQueries(1):
+            # Only the system definitions; the result and watermarks come from the cache
+            self.assertEqual(self.client.get('/api/totals-p_dc/').data, first)
+
+        with mock.patch('monitoring.signals.deferred', DeferredNotifier(delay=3600)) as deferred:
+            self.client.post('/api/meteorologicaldata/', {
+                'time': (self.times[-1] + pd.Timedelta(minutes=1)).isoformat(), 'gti': 1000.0,
+            })
+            self.client.post('/api/electricaldata/', {
+                'system': self.system.id, 'time': (self.times[-1] + pd.Timedelta(minutes=30)).isoformat(),
+                'u_dc': 400.0,
+            })
+            deferred.flush()
+        self.assertNotEqual(self.client.get('/api/totals-p_dc/').data, first)
+
+        stats = self.client.get('/api/cache-stats/').data['total_calculated_power']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def write_elsewhere(self, cache):
+        # A row written by another process, which invalidates the watermarks in its own cache
+        ElectricalData.objects.create(
+            system=self.system, time=self.times[-1] + pd.Timedelta(minutes=30), u_dc=400.0,
+        )
+        with mock.patch('monitoring.cache.get_cache', return_value=cache):
+            invalidate_watermarks([self.system.id])
+
+    def misses(self):
+        return self.client.get('/api/cache-stats/').data['total_calculated_power']['misses']
+
+    def test_shared_cache_sees_other_processes_writes(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={
+            **settings.CACHES,
+            'analytics': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+        }):
+            self.client.get('/api/totals-p_dc/')
+            self.write_elsewhere(caches.create_connection('analytics'))
+            self.client.get('/api/totals-p_dc/')
+            self.assertEqual(self.misses(), 2)
+
+    @override_settings(ANALYTICS_WATERMARK_TIMEOUT=0.05)
+    def test_per_process_cache_rereads_watermarks(self):
+        self.client.get('/api/totals-p_dc/')
+        self.write_elsewhere(LocMemCache('another-process', {}))
+        self.client.get('/api/totals-p_dc/')
+        time.sleep(0.1)
+        self.client.get('/api/totals-p_dc/')
+        self.assertEqual(self.misses(), 2)
+
+
+class PVWattsStreamingTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.system = create_system()
+        seed_data(self.system, periods=120)
+        refresh_modeled_power(self.system)
+        self.user = User.objects.create(username='viewer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/pvsystems/{self.system.id}/calculate/'
+
+    def test_ndjson_matches_json(self):
+        expected = json.loads(self.client.get(self.url, {'format': 'json'}).content)
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_csv_matches_json(self):
+        expected = json.loads(self.client.get(self.url, {'format': 'json'}).content)
+        response = self.client.get(self.url, {'format': 'csv'})
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), len(expected))
+        self.assertEqual(rows[0]['time'], expected[0]['time'])
+        self.assertAlmostEqual(float(rows[-1]['calculated_power']), expected[-1]['calculated_power'])
+
+    async def test_streams_asynchronously_under_asgi(self):
+        expected = json.loads((await sync_to_async(self.client.get)(self.url, {'format': 'json'})).content)
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+        response = await self.async_client.get(
+            self.url, {'format': 'ndjson'}, headers={'Authorization': f'Bearer {token}'},
+        )
+        # A sync iterator would be read to the end before the first byte went out
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_errors_render_in_requested_format(self):
+        response = self.client.get('/api/pvsystems/999/calculate/', {'format': 'ndjson'})
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', json.loads(response.content))
+
+
+def reference_lttb(x, y, threshold):
+    """Textbook per-point LTTB loop."""
+    every = (len(x) - 2) / (threshold - 2)
+    selected, previous = [0], 0
+    for bucket in range(threshold - 2):
+        lo, hi = int(bucket * every) + 1, int((bucket + 1) * every) + 1
+        next_lo, next_hi = hi, min(int((bucket + 2) * every) + 1, len(x) - 1)
+        if bucket == threshold - 3:
+            next_lo, next_hi = len(x) - 1, len(x)
+        cx, cy = np.mean(x[next_lo:next_hi]), np.mean(y[next_lo:next_hi])
+        areas = [
+            abs((x[previous] - cx) * (y[i] - y[previous]) - (x[previous] - x[i]) * (cy - y[previous]))
+            for i in range(lo, hi)
+        ]
+        previous = lo + int(np.argmax(areas))
+        selected.append(previous)
+    return selected + [len(x) - 1]
+
+
+class DownsamplingTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.arange(5000, dtype=float)
+        self.y = rng.normal(0, 1, 5000).cumsum()
+
+    def test_lttb_matches_reference(self):
+        selected = lttb_indices(self.x, self.y, 200)
+        self.assertEqual(selected.tolist(), reference_lttb(self.x, self.y, 200))
+
+    def test_minmax_keeps_extremes(self):
+        selected = minmax_indices(self.y, 100)
+        self.assertLessEqual(len(selected), 100)
+        self.assertIn(int(np.argmax(self.y)), selected)
+        self.assertIn(int(np.argmin(self.y)), selected)
+
+
+class DownsampledEndpointTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.system = create_system()
+        self.times = seed_data(self.system, periods=600)
+        update_electrical_rollups(self.system.id, self.times[0], self.times[-1])
+        refresh_modeled_power(self.system)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_reads_rollups_when_they_have_enough_points(self):
+        response = self.client.get('/api/electricaldata/', {'system': self.system.id, 'max_points': 50})
+        self.assertEqual(response.data['resolution'], '5min')
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertEqual(set(response.data['results'][0]), {'time', 'p_dc', 'u_dc', 'i1', 't1', 't2'})
+
+    def test_falls_back_to_raw_rows(self):
+        response = self.client.get('/api/electricaldata/', {
+            'system': self.system.id, 'max_points': 1000, 'downsample': 'minmax',
+        })
+        self.assertEqual(response.data['resolution'], 'raw')
+        self.assertEqual(len(response.data['results']), ElectricalData.objects.count())
+
+    def test_requires_system_for_electrical(self):
+        response = self.client.get('/api/electricaldata/', {'max_points': 50})
+        self.assertEqual(response.status_code, 400)
+
+    def test_modeled_power(self):
+        url = f'/api/pvsystems/{self.system.id}/calculate/'
+        full = self.client.get(url).data
+        reduced = self.client.get(url, {'max_points': 40}).data
+        self.assertEqual(len(reduced), 40)
+        self.assertEqual(reduced[0], full[0])
+        self.assertEqual(reduced[-1], full[-1])
+
+
+class BatchIngestionTests(TestCase):
+    def setUp(self):
+        self.system = create_system()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='gateway'))
+
+    def test_json_batch_keeps_valid_rows(self):
+        readings = [
+            {'system': self.system.id, 'time': '2024-06-01T06:00:00Z', 'u_dc': 500.0, 'p_dc': 2500.0},
+            {'system': self.system.id, 'time': 'not a time', 'u_dc': 500.0},
+            {'system': 999, 'time': '2024-06-01T06:02:00Z'},
+            {'system': self.system.id, 'time': '2024-06-01T06:03:00Z', 'u_dc': 510.0},
+        ]
+        response = self.client.post('/api/electricaldata/batch/', readings, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2])
+        self.assertIn('time', response.data['errors'][0]['errors'])
+        self.assertIn('system', response.data['errors'][1]['errors'])
+        self.assertEqual(ElectricalData.objects.count(), 2)
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        def post(rows, day):
+            readings = [
+                {'system': self.system.id, 'time': f'2024-06-{day:02d}T06:{minute:02d}:00Z', 'u_dc': 500.0}
+                for minute in range(rows)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post('/api/electricaldata/batch/', readings, format='json')
+            return len(queries)
+
+        self.assertEqual(post(2, 1), post(50, 2))
+
+    def test_csv_batch(self):
+        body = (
+            'system,time,u_dc,p_dc\n'
+            f'{self.system.id},2024-06-01T06:00:00Z,500,2500\n'
+            f'{self.system.id},2024-06-01T06:01:00Z,,2400\n'
+        )
+        response = self.client.post('/api/electricaldata/batch/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertIsNone(ElectricalData.objects.get(time='2024-06-01T06:01:00Z').u_dc)
+
+    def test_rejects_non_list(self):
+        response = self.client.post('/api/electricaldata/batch/', {'system': self.system.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ElectricalData.objects.count(), 0)
+
+
+class WriteBehindBufferTests(SimpleTestCase):
+    def setUp(self):
+        self.batches = []
+
+    def write(self, batch):
+        self.batches.append(list(batch))
+        return len(batch)
+
+    def test_flushes_by_size_and_by_time(self):
+        async def scenario():
+            buffer = WriteBehindBuffer(self.write, max_size=100, flush_size=10, flush_interval=0.1)
+            buffer.start()
+            await buffer.put(list(range(5)))
+            await asyncio.sleep(0.02)
+            below_size = len(self.batches)
+            await buffer.put(list(range(5, 25)))
+            await asyncio.sleep(0.02)
+            await buffer.close()
+            return below_size
+
+        self.assertEqual(asyncio.run(scenario()), 0)
+        self.assertEqual([len(batch) for batch in self.batches], [10, 10, 5])
+        self.assertEqual(sum(self.batches, []), list(range(25)))
+
+    def test_interval_flush(self):
+        async def scenario():
+            buffer = WriteBehindBuffer(self.write, max_size=100, flush_size=10, flush_interval=0.05)
+            buffer.start()
+            await buffer.put([1, 2, 3])
+            await asyncio.sleep(0.15)
+            flushed = list(self.batches)
+            await buffer.close()
+            return flushed
+
+        self.assertEqual(asyncio.run(scenario()), [[1, 2, 3]])
+
+    def test_backpressure_when_full(self):
+        async def scenario():
+            buffer = WriteBehindBuffer(self.write, max_size=10, flush_size=10, flush_interval=60, put_timeout=0.05)
+            buffer.start()
+            await buffer.put(list(range(8)))
+            with self.assertRaises(BufferFull):
+                await buffer.put(list(range(5)))
+            await buffer.close()
+
+        asyncio.run(scenario())
+        self.assertEqual(self.batches, [list(range(8))])
+
+    def test_writes_through_when_not_running(self):
+        buffer = WriteBehindBuffer(self.write)
+        self.assertFalse(asyncio.run(buffer.put([1, 2])))
+        self.assertEqual(self.batches, [[1, 2]])
+
+    def test_rejects_batches_larger_than_the_buffer(self):
+        buffer = WriteBehindBuffer(self.write, max_size=10)
+        with self.assertRaises(BatchTooLarge):
+            asyncio.run(buffer.put(list(range(11))))
+        self.assertEqual(self.batches, [])
+
+    def flaky_scenario(self, failures, max_attempts):
+        calls = []
+
+        def write(batch):
+            calls.append(list(batch))
+            if len(calls) <= failures:
+                raise RuntimeError('database unavailable')
+            return self.write(batch)
+
+        async def scenario():
+            buffer = WriteBehindBuffer(
+                write, max_size=100, flush_size=3, flush_interval=60, max_attempts=max_attempts, retry_delay=0.001,
+            )
+            buffer.start()
+            await buffer.put(list(range(5)))
+            await buffer.close()
+            return buffer.stats()
+
+        with self.assertLogs('monitoring.ingestion', 'WARNING'):
+            stats = asyncio.run(scenario())
+        return calls, stats
+
+    def test_retries_failed_batches_in_order(self):
+        calls, stats = self.flaky_scenario(failures=2, max_attempts=3)
+        self.assertEqual(calls, [[0, 1, 2]] * 3 + [[3, 4]])
+        self.assertEqual(self.batches, [[0, 1, 2], [3, 4]])
+        self.assertEqual((stats['written'], stats['retries'], stats['failed'], stats['pending']), (5, 2, 0, 0))
+
+    def test_drops_after_max_attempts(self):
+        calls, stats = self.flaky_scenario(failures=2, max_attempts=2)
+        self.assertEqual(self.batches, [[3, 4]])
+        self.assertEqual((stats['written'], stats['failed'], stats['in_flight']), (2, 3, 0))
+
+
+class AsyncIngestionTests(TestCase):
+    def test_writes_through_without_lifespan(self):
+        system = create_system()
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='gateway'))
+        response = client.post('/api/ingest/electrical/', [
+            {'system': system.id, 'time': '2024-06-01T06:00:00Z', 'u_dc': 500.0},
+            {'system': system.id, 'time': 'bad'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['errors'][0]['row'], 1)
+        self.assertEqual(ElectricalData.objects.count(), 1)
+
+    def test_requires_authentication(self):
+        response = APIClient().post('/api/ingest/electrical/', [], format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_batch_larger_than_buffer_is_not_retryable(self):
+        system = create_system()
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='gateway'))
+        readings = [{'system': system.id, 'time': f'2024-06-01T06:0{minute}:00Z'} for minute in range(3)]
+        with mock.patch.object(ingestion.buffer, 'max_size', 2):
+            response = client.post('/api/ingest/electrical/', readings, format='json')
+        self.assertEqual(response.status_code, 413)
+        self.assertNotIn('Retry-After', response)
+        self.assertEqual(ElectricalData.objects.count(), 0)
+
+    def test_refresh_failure_does_not_fail_the_write(self):
+        system = create_system()
+        with mock.patch('monitoring.ingestion.notify_written', side_effect=RuntimeError('rollups')), \
+                self.assertLogs('monitoring.ingestion', 'ERROR'):
+            written = ingestion.write_readings([{'system': system, 'time': timezone.now(), 'u_dc': 500.0}])
+        self.assertEqual(written, 1)
+        self.assertEqual(ElectricalData.objects.count(), 1)
+
+
+class AsyncAnalyticsTests(TransactionTestCase):
+    # The async views query from pool threads, which only see committed data
+
+    def setUp(self):
+        get_cache().clear()
+        meteorological_grid.clear()
+        self.systems = [create_system(), create_system(name='System 2', capacity=8.0)]
+        seed_data(self.systems[0], periods=120)
+        seed_data(self.systems[1], start='2024-06-01 07:00', periods=120, seed=1)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_matches_sync_views_and_models_unmodeled_systems(self):
+        for sync_url, async_url in [
+            ('/api/pvsystems/scores/', '/api/async/pvsystems/scores/'),
+            ('/api/totals-p_dc/', '/api/async/totals-p_dc/'),
+            ('/api/system-totals/', '/api/async/system-totals/'),
+        ]:
+            get_cache().clear()
+            response = self.client.get(async_url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), 2)
+            get_cache().clear()
+            self.assertEqual(response.json(), json.loads(self.client.get(sync_url).content))
+
+    def test_system_totals_of_modeled_systems_without_raw_rows(self):
+        refresh_fleet_modeled_power()
+        # Raw rows leaving unannounced, as a partition detached by retention does
+        ElectricalData.objects.filter(system=self.systems[1]).delete()
+        for url in ('/api/system-totals/', '/api/async/system-totals/'):
+            get_cache().clear()
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            totals = {row['system_id']: row for row in response.json()}
+            self.assertEqual(totals[self.systems[1].id]['total_voltage'], 0)
+            self.assertGreater(totals[self.systems[1].id]['total_calculated_power'], 0)
+
+    def test_shares_cache_with_sync_view(self):
+        self.client.get('/api/system-totals/')
+        self.client.get('/api/async/system-totals/')
+        stats = self.client.get('/api/cache-stats/').data['system_totals']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get('/api/async/system-totals/').status_code, 401)
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_profiles_queries_on_pool_threads(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username='viewer'))
+        with self.assertLogs('monitoring.profiling', 'INFO'):
+            timing = server_timing(client.get('/api/async/system-totals/'))
+        self.assertGreater(int(re.search(r'(\d+) queries', timing['sql']).group(1)), 3)
+        self.assertIn('pvlib', timing)
+        self.assertIn('render', timing)
+
+
+def server_timing(response):
+    """The metrics of a ``Server-Timing`` header, by name."""
+    return {
+        metric.split(';')[0]: metric for metric in re.split(r',\s*', response.get('Server-Timing', '')) if metric
+    }
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.system = create_system()
+        seed_data(self.system, periods=120)
+        ModeledPower.objects.all().delete()
+        # The middleware chain is built on a client's first request, under these settings
+        self.user = User.objects.create(username='viewer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_and_log_line(self):
+        url = f'/api/pvsystems/{self.system.id}/calculate/'
+        with self.assertLogs('monitoring.profiling', 'INFO') as logs:
+            response = self.client.get(url)
+        timing = server_timing(response)
+        self.assertEqual(
+            list(timing), ['sql', 'load', 'meteo', 'resample', 'pvlib', 'store', 'render', 'total'],
+        )
+        self.assertRegex(timing['total'], r'^total;dur=\d+\.\d$')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['path'], record['status']), (url, 200))
+        self.assertEqual(record['queries'], int(re.search(r'(\d+) queries', timing['sql']).group(1)))
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(list(record['phases']), list(timing)[1:-1])
+
+    def test_dumps_folded_stacks_of_slow_requests(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            PROFILING_SAMPLE_THRESHOLD=0.001, PROFILING_SAMPLE_INTERVAL=0.5, PROFILING_DIR=directory,
+        ), self.assertLogs('monitoring.profiling', 'INFO') as logs:
+            self.client.get(f'/api/pvsystems/{self.system.id}/calculate/')
+            path = json.loads(logs.records[0].getMessage())['profile']
+            self.assertEqual(os.path.dirname(path), directory)
+            with open(path) as file:
+                lines = file.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, r'^\S.* \d+$')
+        self.assertTrue(any('refresh_fleet_modeled_power' in line for line in lines))
+
+    async def test_samples_sync_views_under_asgi(self):
+        # The middleware runs on the event loop, the sync view on another thread
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            PROFILING_SAMPLE_THRESHOLD=0.001, PROFILING_SAMPLE_INTERVAL=0.5, PROFILING_DIR=directory,
+        ), self.assertLogs('monitoring.profiling', 'INFO') as logs:
+            response = await self.async_client.get(
+                f'/api/pvsystems/{self.system.id}/calculate/', headers={'Authorization': f'Bearer {token}'},
+            )
+            self.assertEqual(response.status_code, 200)
+            with open(json.loads(logs.records[0].getMessage())['profile']) as file:
+                stacks = file.read()
+        self.assertIn('refresh_fleet_modeled_power', stacks)
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_by_default(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username='viewer'))
+        self.assertNotIn('Server-Timing', client.get(f'/api/pvsystems/{self.system.id}/calculate/'))
+
+
+def parse_metrics(text):
+    """``{(name, ((label, value), ...)): value}`` of a Prometheus text exposition."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        name, _, labels = series.partition('{')
+        samples[(name, tuple(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', labels)))] = float(value)
+    return samples
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def test_exposition_format(self):
+        registry = metrics.Registry()
+        requests = metrics.Counter('requests_total', 'Requests', ['path'], registry=registry)
+        latency = metrics.Histogram('latency_seconds', 'Latency', buckets=(0.1, 1), registry=registry)
+        metrics.Gauge('open', 'Open things', collect=lambda: {(): 3}, registry=registry)
+        requests.inc(path='/a"b')
+        requests.inc(2, path='/a"b')
+        for value in (0.05, 0.5, 5):
+            latency.observe(value)
+        self.assertEqual(metrics.render(registry, directory=''), '\n'.join([
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{path="/a\\"b"} 3',
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 3',
+            'latency_seconds_sum 5.55',
+            'latency_seconds_count 3',
+            '# HELP open Open things',
+            '# TYPE open gauge',
+            'open 3',
+        ]) + '\n')
+
+    def test_sums_the_snapshots_of_every_worker(self):
+        def worker(rows, connections):
+            registry = metrics.Registry()
+            metrics.Counter('rows_total', 'Rows', registry=registry).inc(rows)
+            metrics.Gauge('connections', 'Connections', registry=registry).set(connections)
+            metrics.Histogram('seconds', 'Seconds', buckets=(1,), registry=registry).observe(rows)
+            return registry
+
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True)
+        with tempfile.TemporaryDirectory() as directory:
+            for pid, registry in [(os.getppid(), worker(1, 2)), (int(exited.stdout), worker(4, 8))]:
+                with open(os.path.join(directory, f'{pid}-0.json'), 'w') as file:
+                    json.dump(registry.snapshot(), file)
+            samples = parse_metrics(metrics.render(worker(2, 1), directory))
+            # The exited worker's snapshot was folded into the aggregate of exited processes
+            self.assertEqual(
+                sorted(name for name in os.listdir(directory) if name.endswith('.json')),
+                [f'{os.getppid()}-0.json', 'exited.json'],
+            )
+            self.assertEqual(parse_metrics(metrics.render(worker(2, 1), directory)), samples)
+
+        self.assertEqual(samples[('rows_total', ())], 7)
+        self.assertEqual(samples[('seconds_bucket', (('le', '1'),))], 1)
+        self.assertEqual(samples[('seconds_count', ())], 3)
+        # The exited worker's connections are gone
+        self.assertEqual(samples[('connections', ())], 3)
+
+    def test_exited_processes_with_a_reused_pid_add_up(self):
+        registry = metrics.Registry()
+        rows = metrics.Counter('rows_total', 'Rows', registry=registry)
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True)
+        with tempfile.TemporaryDirectory() as directory:
+            for count in (4, 3):
+                # Two processes given the same pid in turn
+                rows.reset()
+                rows.inc(count)
+                with open(os.path.join(directory, f'{int(exited.stdout)}-{count}.json'), 'w') as file:
+                    json.dump(registry.snapshot(), file)
+                totals = parse_metrics(metrics.render(metrics.Registry(), directory))
+            self.assertEqual(totals[('rows_total', ())], 7)
+
+    def test_flush_writes_this_process_snapshot(self):
+        registry = metrics.Registry()
+        metrics.Counter('rows_total', 'Rows', registry=registry).inc(5)
+        with tempfile.TemporaryDirectory() as directory:
+            registry.flush(directory)
+            self.assertEqual(os.listdir(directory), [registry.file_name])
+            self.assertTrue(registry.file_name.startswith(f'{os.getpid()}-'))
+            registry.flush(directory)
+            # The process's own snapshot is read from memory, not counted twice
+            samples = parse_metrics(metrics.render(registry, directory))
+        self.assertEqual(samples[('rows_total', ())], 5)
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        metrics.default_registry.reset()
+        self.system = create_system()
+        seed_data(self.system, periods=60)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='gateway'))
+
+    def scrape(self, **headers):
+        response = APIClient().get('/metrics', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return parse_metrics(response.content.decode())
+
+    def test_requests_ingest_cache_and_database(self):
+        readings = [
+            {'system': self.system.id, 'time': f'2024-06-02T06:0{minute}:00Z', 'u_dc': 500.0} for minute in range(3)
+        ]
+        self.assertEqual(self.client.post('/api/electricaldata/batch/', readings, format='json').status_code, 201)
+        self.client.get('/api/system-totals/')
+        self.client.get('/api/system-totals/')
+        samples = self.scrape()
+
+        endpoint = (('endpoint', 'system_totals'), ('method', 'GET'))
+        self.assertEqual(samples[('http_request_duration_seconds_count', endpoint)], 2)
+        self.assertEqual(samples[('http_request_duration_seconds_bucket', (*endpoint, ('le', '+Inf')))], 2)
+        self.assertEqual(samples[(
+            'http_requests_total', (('endpoint', 'electricaldata-batch'), ('method', 'POST'), ('status', '201')),
+        )], 1)
+        self.assertEqual(samples[('ingested_rows_total', (('table', 'electricaldata'), ('path', 'batch')))], 3)
+        for outcome in ('hits', 'misses'):
+            self.assertEqual(samples[(
+                'analytics_cache_requests_total', (('endpoint', 'system_totals'), ('outcome', outcome)),
+            )], 1)
+        self.assertGreater(samples[('db_queries_total', (('alias', 'default'),))], 0)
+        self.assertGreaterEqual(samples[('db_connections_open', (('alias', 'default'),))], 1)
+        self.assertEqual(samples[('db_queries_in_flight', (('alias', 'default'),))], 0)
+
+    def test_importer_counts_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'meteo.csv')
+            pd.DataFrame({
+                'Time': ['06/02/2024 06:00', '06/02/2024 06:01'],
+                **{column: [400.0, 410.0] for column in METEOROLOGICAL_COLUMNS},
+            }).to_csv(path, index=False)
+            import_file(MeteorologicalData, path, use_copy=False)
+        samples = self.scrape()
+        self.assertEqual(samples[('ingested_rows_total', (('table', 'meteorologicaldata'), ('path', 'import')))], 2)
+
+    @override_settings(METRICS_TOKEN='scraper', METRICS_ALLOWED_IPS=[])
+    def test_token(self):
+        self.assertEqual(APIClient().get('/metrics').status_code, 401)
+        self.scrape(Authorization='Bearer scraper')
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowed_ips(self):
+        self.assertEqual(APIClient().get('/metrics').status_code, 403)
+        self.assertEqual(APIClient().get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_not_served_unprotected_unless_debugging(self):
+        self.assertEqual(APIClient().get('/metrics').status_code, 403)
+        with override_settings(DEBUG=True):
+            self.scrape()
+
+
+class MeteorologicalGridTests(TransactionTestCase):
+    # The grid only caches committed rows, so these run outside a test transaction
+
+    def setUp(self):
+        self.loaded = []
+        self.grid = self.make_grid(64 * 1024)
+        self.times = seed_data(create_system(), periods=600)
+
+    def make_grid(self, max_bytes):
+        def load(lo, hi):
+            self.loaded.append((lo, hi))
+            return load_meteorological(lo, hi)
+        return MeteorologicalGrid(load, METEOROLOGICAL_FIELDS, RESAMPLE_RULE, max_bytes)
+
+    def assertMatchesResample(self, frame, lo, hi):
+        expected = resample_meteorological(load_meteorological(lo, hi))
+        pd.testing.assert_frame_equal(frame, expected, check_freq=False)
+
+    def test_frames_match_resampled_rows_and_reuse_cached_bins(self):
+        start = self.times[0]
+        for lo, hi in [(0, 120), (60, 300), (30, 90), (-60, 660), (200, 260)]:
+            lo, hi = start + pd.Timedelta(minutes=lo), start + pd.Timedelta(minutes=hi)
+            self.assertMatchesResample(self.grid.frame(lo, hi), lo, hi)
+        # Only the bins outside those already held were ever loaded
+        self.assertEqual(self.loaded, [
+            (start, start + pd.Timedelta(minutes=120)),
+            (start + pd.Timedelta(minutes=120), start + pd.Timedelta(minutes=300)),
+            (start - pd.Timedelta(minutes=60), start),
+            (start + pd.Timedelta(minutes=300), start + pd.Timedelta(minutes=660)),
+        ])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.grid.frame(start, start + pd.Timedelta(minutes=600))
+        self.assertEqual(len(queries), 1)
+
+    def test_new_rows_extend_the_cache(self):
+        lo, hi = self.times[0], pd.Timestamp('2024-06-01 17:00', tz='UTC')
+        self.grid.frame(lo, hi)
+        MeteorologicalData.objects.bulk_create([
+            MeteorologicalData(time=self.times[-1] + pd.Timedelta(minutes=minute), gti=100.0 + minute, air_temp=20.0)
+            for minute in range(1, 31)
+        ])
+        self.loaded.clear()
+        self.assertMatchesResample(self.grid.frame(lo, hi), lo, hi)
+        # Everything from the bin of the first new row on was reloaded, nothing before it
+        self.assertEqual(self.loaded, [(pd.Timestamp('2024-06-01 16:00', tz='UTC'), hi)])
+
+    def test_memory_cap_evicts_the_oldest_bins(self):
+        bins = 50
+        grid = self.make_grid(bins * (4 + 8 * len(METEOROLOGICAL_FIELDS)))
+        lo = self.times[0]
+        for hours in range(1, 11):
+            hi = lo + pd.Timedelta(hours=hours)
+            self.assertMatchesResample(grid.frame(lo, hi), lo, hi)
+            stats = grid.stats()
+            self.assertLessEqual(stats['bins'], bins)
+            self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+        self.assertEqual(pd.Timestamp(stats['end']), lo + pd.Timedelta(hours=10))
+
+    def test_modeling_reads_through_the_shared_grid(self):
+        system = PVSystem.objects.get()
+        meteorological_grid.clear()
+        refresh_modeled_power(system)
+        self.assertGreater(meteorological_grid.stats()['bins'], 0)
+        modeled = modeled_series(system)
+
+        with mock.patch.object(meteorological_grid, 'max_bytes', 0):
+            ModeledPower.objects.all().delete()
+            meteorological_grid.clear()
+            refresh_modeled_power(system)
+            self.assertEqual(meteorological_grid.stats()['bins'], 0)
+        self.assertEqual(modeled_series(system), modeled)
+
+
+class HDF5ExportTests(TestCase):
+    def setUp(self):
+        self.systems = [create_system(), create_system(name='System 2')]
+        self.times = seed_data(self.systems[0], periods=100)
+        seed_data(self.systems[1], periods=100, seed=1)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_endpoint_filters_and_round_trips(self):
+        start, end = self.times[10], self.times[60]
+        response = self.client.get('/api/export/electrical/', {
+            'system': self.systems[1].id, 'start': start.isoformat(), 'end': end.isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        expected = ElectricalData.objects.filter(
+            system=self.systems[1], time__gte=start, time__lt=end
+        ).order_by('time')
+
+        with h5py.File(io.BytesIO(b''.join(response.streaming_content)), 'r') as hdf5:
+            self.assertEqual(list(hdf5['electrical']), [str(self.systems[1].id)])
+            group = hdf5['electrical'][str(self.systems[1].id)]
+            times = pd.to_datetime(group['time'][:], utc=True)
+            self.assertEqual(list(times), [row.time for row in expected])
+            np.testing.assert_array_equal(group['p_dc'][:], [row.p_dc for row in expected])
+
+
+class JobQueueTests(TransactionTestCase):
+    # Workers close and reopen connections between jobs, which a TestCase transaction doesn't survive
+
+    def setUp(self):
+        meteorological_grid.clear()
+        self.systems = [create_system(), create_system(name='System 2', capacity=8.0)]
+        seed_data(self.systems[0], periods=120)
+        seed_data(self.systems[1], periods=120, seed=1)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_identical_in_flight_jobs_are_deduplicated(self):
+        params = {'kind': 'recompute', 'params': {'system_ids': [self.systems[1].id, self.systems[0].id]}}
+        first = self.client.post('/api/jobs/', params, format='json')
+        self.assertEqual(first.status_code, 201)
+        # Same systems in another order: the same job
+        params['params']['system_ids'].reverse()
+        second = self.client.post('/api/jobs/', params, format='json')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['id'], first.json()['id'])
+
+        self.assertEqual(run_next_job().status, 'succeeded')
+        third = self.client.post('/api/jobs/', params, format='json')
+        self.assertEqual(third.status_code, 201)
+        self.assertNotEqual(third.json()['id'], first.json()['id'])
+
+    def test_worker_runs_score_job_and_stores_result(self):
+        response = self.client.post('/api/jobs/', {'kind': 'score'}, format='json')
+        self.assertEqual(self.client.get(f"/api/jobs/{response.json()['id']}/result/").status_code, 409)
+        call_command('run_jobs', '--burst', '--concurrency', '2', stdout=io.StringIO())
+
+        job = self.client.get(f"/api/jobs/{response.json()['id']}/").json()
+        self.assertEqual((job['status'], job['progress'], job['attempts']), ('succeeded', 1, 1))
+        result = self.client.get(f"/api/jobs/{job['id']}/result/").json()
+        self.assertEqual(result, json.loads(self.client.get('/api/pvsystems/scores/').content))
+        self.assertEqual(len(result), 2)
+
+    def test_export_job_result_is_the_hdf5_file(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(JOB_RESULTS_DIR=directory):
+            job, _ = submit('export', {'system_ids': [self.systems[0].id]})
+            rows = ElectricalData.objects.filter(system=self.systems[0]).count()
+            self.assertEqual(run_next_job().result, {'file': f'job-{job.id}.h5', 'rows': rows})
+            response = self.client.get(f'/api/jobs/{job.id}/result/')
+            with h5py.File(io.BytesIO(b''.join(response.streaming_content)), 'r') as hdf5:
+                self.assertEqual(list(hdf5['electrical']), [str(self.systems[0].id)])
+
+    def test_export_job_end_is_exclusive(self):
+        times = ElectricalData.objects.filter(system=self.systems[0]).order_by('time').values_list('time', flat=True)
+        start, end = times[0], times[1]
+        with tempfile.TemporaryDirectory() as directory, override_settings(JOB_RESULTS_DIR=directory):
+            submit('export', {
+                'system_ids': [self.systems[0].id], 'start': start.isoformat(), 'end': end.isoformat(),
+            })
+            self.assertEqual(run_next_job().result['rows'], 1)
+
+    @override_settings(JOB_HEARTBEAT_INTERVAL=0.02)
+    def test_long_running_job_is_not_requeued(self):
+        def slow(job, progress):
+            time.sleep(0.3)
+            return {'requeued': jobs.requeue_stale(stale_after=0.1)}
+
+        submit('score')
+        with mock.patch.dict(jobs.HANDLERS, {'score': slow}):
+            job = run_next_job('worker-1')
+        self.assertEqual((job.status, job.result), ('succeeded', {'requeued': 0}))
+
+    def test_job_taken_over_keeps_its_new_owner(self):
+        def taken_over(job, progress):
+            # Requeued as stale and claimed by another worker meanwhile
+            Job.objects.filter(id=job.id).update(worker='worker-2')
+            return {}
+
+        job, _ = submit('score')
+        with mock.patch.dict(jobs.HANDLERS, {'score': taken_over}), self.assertLogs('monitoring.jobs', 'WARNING'):
+            run_next_job('worker-1')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), ('running', 'worker-2'))
+
+    @override_settings(JOB_STALE_AFTER=0.2, JOB_HEARTBEAT_INTERVAL=0.05)
+    def test_worker_loop_requeues_jobs_of_dead_workers(self):
+        def handle(job, progress):
+            time.sleep(job.params.get('sleep', 0))
+            return {}
+
+        # Keeps the loop busy while the jobs below go stale
+        submit('score', {'sleep': 1.5})
+        retried, _ = submit('score', {'system_ids': [self.systems[0].id]})
+        last, _ = submit('score', {'system_ids': [self.systems[1].id]}, max_attempts=1)
+        # Claimed by a worker that dies right after the loop has started
+        Job.objects.filter(id__in=[retried.id, last.id]).update(
+            status='running', worker='dead:1', attempts=1, updated_at=timezone.now(),
+        )
+        with mock.patch.dict(jobs.HANDLERS, {'score': handle}):
+            call_command('run_jobs', '--burst', stdout=io.StringIO())
+
+        retried.refresh_from_db()
+        self.assertEqual((retried.status, retried.attempts), ('succeeded', 2))
+        last.refresh_from_db()
+        self.assertEqual((last.status, last.attempts), ('failed', 1))
+        # Neither blocks a resubmission any more
+        self.assertTrue(submit('score', {'system_ids': [self.systems[1].id]})[1])
+
+    def test_expired_export_files_are_purged(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(JOB_RESULTS_DIR=directory):
+            for name in ('job-1.h5', 'job-2.h5.partial', 'job-3.h5', 'notes.txt'):
+                open(os.path.join(directory, name), 'w').close()
+            expired = time.time() - 3 * 3600
+            for name in ('job-1.h5', 'job-2.h5.partial', 'notes.txt'):
+                os.utime(os.path.join(directory, name), (expired, expired))
+            self.assertEqual(jobs.purge_results(retain_hours=2), 2)
+            self.assertEqual(sorted(os.listdir(directory)), ['job-3.h5', 'notes.txt'])
+
+    @override_settings(JOB_RETRY_DELAY=0)
+    def test_failing_job_is_retried_then_failed(self):
+        def fail(job, progress):
+            raise RuntimeError('boom')
+
+        job, _ = submit('score', max_attempts=2)
+        with mock.patch.dict(jobs.HANDLERS, {'score': fail}):
+            self.assertEqual(run_next_job().status, 'queued')
+            job = run_next_job()
+        self.assertEqual((job.status, job.attempts, job.error), ('failed', 2, 'RuntimeError: boom'))
+        self.assertIsNone(run_next_job())
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archive_settings = override_settings(ARCHIVE_DIR=directory.name)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+        self.directory = directory.name
+
+        get_cache().clear()
+        self.system = create_system()
+        # Straddles the end of May, so May can be archived while June stays in the database
+        self.times = seed_data(self.system, start='2024-05-31 20:00')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def archive_may(self):
+        may = datetime(2024, 5, 1, tzinfo=dt_timezone.utc)
+        return archive_month(ELECTRICAL, may) + archive_month(METEOROLOGICAL, may)
+
+    def test_modeling_reads_archived_ranges_transparently(self):
+        refresh_modeled_power(self.system)
+        expected = modeled_series(self.system)
+        totals = self.client.get('/api/system-totals/').json()
+
+        hot = ElectricalData.objects.count() + MeteorologicalData.objects.count()
+        moved = self.archive_may()
+        self.assertEqual(ElectricalData.objects.count() + MeteorologicalData.objects.count(), hot - moved)
+        self.assertFalse(ElectricalData.objects.filter(time__lt='2024-06-01').exists())
+
+        refresh_modeled_power(self.system)
+        self.assertEqual(modeled_series(self.system), expected)
+        archived_totals = self.client.get('/api/system-totals/').json()
+        self.assertEqual(archived_totals[0].keys(), totals[0].keys())
+        for field in ['total_voltage', 'total_current_t1', 'total_gti', 'total_air_temp']:
+            self.assertAlmostEqual(archived_totals[0][field], totals[0][field], places=6)
+
+        # Refreshing around the boundary finds the neighbouring rows in the archive
+        ElectricalData.objects.filter(system=self.system, time=self.times[241]).delete()
+        refresh_modeled_power(self.system, self.times[241], self.times[241])
+        incremental = modeled_series(self.system)
+        refresh_modeled_power(self.system)
+        self.assertEqual(incremental, modeled_series(self.system))
+
+    def rollups(self):
+        return [
+            (resolution, time, samples, round(energy_wh, 6), round(mean_u_dc, 6))
+            for resolution, time, samples, energy_wh, mean_u_dc in ElectricalRollup.objects.order_by(
+                'resolution', 'time',
+            ).values_list('resolution', 'time', 'samples', 'energy_wh', 'mean_u_dc')
+        ]
+
+    def test_rollups_keep_archived_rows(self):
+        update_electrical_rollups(self.system.id, self.times[0], self.times[-1])
+        expected = self.rollups()
+        self.archive_may()
+
+        # A late reading of an archived day is rolled up along with the archived ones
+        late = self.times[0] + pd.Timedelta(seconds=30)
+        ElectricalData.objects.create(system=self.system, time=late, u_dc=480.0, p_dc=0.0)
+        update_electrical_rollups(self.system.id, late, late)
+        day = ElectricalRollup.objects.get(resolution='1d', time=self.times[0].floor('1D'))
+        self.assertEqual(day.samples, next(row[2] for row in expected if row[:2] == ('1d', day.time)) + 1)
+
+        ElectricalData.objects.filter(time=late).delete()
+        ElectricalRollup.objects.all().delete()
+        call_command('rebuild_rollups', '--skip-meteo', stdout=io.StringIO())
+        self.assertEqual(self.rollups(), expected)
+
+    def test_rows_written_later_join_the_archived_month(self):
+        self.archive_may()
+        first = ArchivedMonth.objects.get(kind=ELECTRICAL, system=self.system)
+        late = ElectricalData.objects.create(system=self.system, time=self.times[0], u_dc=480.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive_month(ELECTRICAL, datetime(2024, 5, 1, tzinfo=dt_timezone.utc)), 1)
+        archived = ArchivedMonth.objects.get(kind=ELECTRICAL, system=self.system)
+        self.assertEqual((archived.rows, archived.first_time), (first.rows + 1, late.time))
+        self.assertFalse(os.path.exists(os.path.join(self.directory, first.path)))
+        columns = read_month(archived, ['time', 'u_dc'])
+        self.assertEqual(columns['u_dc'][0], 480.0)
+        self.assertTrue((np.diff(columns['time'].view('int64')) > 0).all())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are checked against PostgreSQL')
+class TimeSeriesIndexPlanTests(TestCase):
+    rows = 3_000_000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.systems = [create_system(name=f'System {i}') for i in range(3)]
+        ensure_partitions(start=datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO monitoring_electricaldata (system_id, time, u_dc, p_dc)
+                SELECT %s + (n %% 3), timestamptz '2020-01-01' + (n / 3) * interval '1 minute', 500, 1000
+                FROM generate_series(0, %s - 1) AS n
+                """,
+                [cls.systems[0].id, cls.rows],
+            )
+            cursor.execute(
+                """
+                INSERT INTO monitoring_meteorologicaldata (time, gti, air_temp, wind_speed)
+                SELECT timestamptz '2020-01-01' + n * interval '1 minute', 500, 20, 2
+                FROM generate_series(0, %s - 1) AS n
+                """,
+                [cls.rows // 3],
+            )
+            cursor.execute('ANALYZE monitoring_electricaldata')
+            cursor.execute('ANALYZE monitoring_meteorologicaldata')
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        # Empty monthly partitions (ahead of the data) cost nothing to scan sequentially
+        empty = {name for name, month in partitions() if not ElectricalData.objects.filter(
+            time__gte=month, time__lt=add_months(month, 1)
+        ).exists()}
+        self.assertFalse(set(re.findall(r'Seq Scan on (\w+)', plan)) - empty, plan)
+        self.assertIn('Index', plan)
+
+    def test_system_time_range(self):
+        self.assertUsesIndex(ElectricalData.objects.filter(
+            system=self.systems[1], time__range=('2020-06-01', '2020-06-02')
+        ))
+
+    def test_system_latest_row(self):
+        self.assertUsesIndex(ElectricalData.objects.filter(system=self.systems[2]).order_by('-time')[:1])
+
+    def test_fleet_time_range(self):
+        self.assertUsesIndex(ElectricalData.objects.filter(time__range=('2020-06-01', '2020-06-02')))
+
+    def test_meteorological_time_range(self):
+        self.assertUsesIndex(MeteorologicalData.objects.filter(time__range=('2020-06-01', '2020-06-02')))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning is PostgreSQL-only')
+class ElectricalPartitionTests(TestCase):
+    def setUp(self):
+        self.system = create_system()
+
+    def add_row(self, time):
+        return ElectricalData.objects.create(system=self.system, time=time, p_dc=1000)
+
+    def partition_of(self, row):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM monitoring_electricaldata WHERE id = %s', [row.id])
+            return cursor.fetchone()[0]
+
+    def test_rows_route_to_monthly_partitions_and_ranges_are_pruned(self):
+        ensure_partitions(start=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        row = self.add_row(datetime(2024, 1, 15, tzinfo=dt_timezone.utc))
+        self.add_row(datetime(2024, 2, 15, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.partition_of(row), 'monitoring_electricaldata_p2024_01')
+
+        plan = ElectricalData.objects.filter(time__range=('2024-01-10', '2024-01-20')).explain()
+        self.assertIn('monitoring_electricaldata_p2024_01', plan)
+        self.assertNotIn('monitoring_electricaldata_p2024_02', plan)
+        self.assertNotIn(DEFAULT_PARTITION, plan)
+
+    def test_backfilled_rows_leave_the_default_partition(self):
+        row = self.add_row(datetime(2019, 5, 3, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.partition_of(row), DEFAULT_PARTITION)
+
+        self.assertIn('monitoring_electricaldata_p2019_05', ensure_partitions())
+        self.assertEqual(self.partition_of(row), 'monitoring_electricaldata_p2019_05')
+        self.assertEqual(ElectricalData.objects.get(id=row.id).time, row.time)
+
+    def test_retention_detaches_old_partitions(self):
+        ensure_partitions(start=datetime(2019, 1, 1, tzinfo=dt_timezone.utc))
+        self.add_row(datetime(2019, 1, 3, tzinfo=dt_timezone.utc))
+        recent = self.add_row(timezone.now())
+
+        self.assertIn('monitoring_electricaldata_p2019_01', apply_retention(keep_months=12))
+        self.assertEqual(list(ElectricalData.objects.values_list('id', flat=True)), [recent.id])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM monitoring_electricaldata_p2019_01')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        # Left alone once detached
+        self.assertNotIn('monitoring_electricaldata_p2019_01', ensure_partitions(
+            start=datetime(2019, 1, 1, tzinfo=dt_timezone.utc)
+        ))
+
+    def test_retention_can_drop_old_partitions(self):
+        ensure_partitions(start=datetime(2019, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertIn('monitoring_electricaldata_p2019_01', apply_retention(keep_months=12, drop=True))
+        self.assertNotIn('monitoring_electricaldata_p2019_01', connection.introspection.table_names())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning is PostgreSQL-only')
+class PartitionMigrationTests(TransactionTestCase):
+    # Migrates the test database back and forth, so runs outside a test transaction
+
+    def tearDown(self):
+        call_command('migrate', 'monitoring', verbosity=0)
+
+    def table_state(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*), SUM(u_dc), MAX(id) FROM monitoring_electricaldata')
+            rows = cursor.fetchone()
+            cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'monitoring_electricaldata'")
+            return rows, cursor.fetchone()[0]
+
+    def test_partitioning_round_trip_keeps_rows_and_ids(self):
+        call_command('migrate', 'monitoring', '0007', verbosity=0)
+        system = create_system()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO monitoring_electricaldata (system_id, time, u_dc, p_dc)
+                SELECT %s, timestamptz '2024-11-01' + n * interval '1 minute', 500 + n %% 7, 1000
+                FROM generate_series(0, 100000 - 1) AS n
+                """,
+                [system.id],
+            )
+        rows, kind = self.table_state()
+        self.assertEqual(kind, 'r')
+
+        call_command('migrate', 'monitoring', '0008', verbosity=0)
+        self.assertEqual(self.table_state(), (rows, 'p'))
+        created = ElectricalData.objects.create(system=system, time=timezone.now(), u_dc=1.0)
+        self.assertEqual(created.id, rows[2] + 1)
+        created.delete()
+
+        call_command('migrate', 'monitoring', '0007', verbosity=0)
+        self.assertEqual(self.table_state(), (rows, 'r'))
+        self.assertGreater(ElectricalData.objects.create(system=system, time=timezone.now(), u_dc=1.0).id, rows[2] + 1)
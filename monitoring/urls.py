@@ -2,7 +2,7 @@
 
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
-from .views import PVSystemViewSet, ElectricalDataViewSet, MeteorologicalDataViewSet, UserCreate, create_simple_user, calculate_pvwatts, calculate_system_scores, UserViewSet, CustomTokenObtainPairView, get_total_calculated_power, get_system_totals
+from .views import PVSystemViewSet, ElectricalDataViewSet, MeteorologicalDataViewSet, UserCreate, create_simple_user, calculate_pvwatts, calculate_system_scores, UserViewSet, CustomTokenObtainPairView, get_total_calculated_power, get_system_totals, RollupList, get_cache_stats, export_electrical_hdf5, ingest_electrical, calculate_system_scores_async, get_total_calculated_power_async, get_system_totals_async, JobViewSet, get_energy_kpis, get_metrics
 from rest_framework_simplejwt.views import (
     TokenRefreshView,
     TokenVerifyView,
@@ -13,8 +13,11 @@ router.register(r'pvsystems', PVSystemViewSet)
 router.register(r'electricaldata', ElectricalDataViewSet)
 router.register(r'meteorologicaldata', MeteorologicalDataViewSet)
 router.register(r'users', UserViewSet, basename='user')  # Register the UserViewSet with basename
+router.register(r'jobs', JobViewSet, basename='job')
 
 urlpatterns = [
+    # Listed before the router so 'pvsystems/scores/' isn't taken for a detail route
+    path('api/pvsystems/scores/', calculate_system_scores, name='system_scores'),
     path('api/', include(router.urls)),
     path('api/register-admin/', UserCreate.as_view(), name='admin-create'),
     path('api/register-user/', create_simple_user, name='user-create'),
@@ -23,9 +26,17 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('api/pvsystems/<int:system_id>/calculate/', calculate_pvwatts, name='calculate_pvwatts'),
-    path('api/pvsystems/scores/', calculate_system_scores, name='system_scores'),
     path('api/totals-p_dc/', get_total_calculated_power, name='get_total_calculated_power'),  
     path('api/system-totals/', get_system_totals, name='system_totals'),
+    path('api/kpis/', get_energy_kpis, name='energy_kpis'),
+    path('metrics', get_metrics, name='metrics'),
+    path('api/rollups/', RollupList.as_view(), name='rollups'),
+    path('api/cache-stats/', get_cache_stats, name='cache_stats'),
+    path('api/export/electrical/', export_electrical_hdf5, name='export_electrical_hdf5'),
+    path('api/ingest/electrical/', ingest_electrical, name='ingest_electrical'),
+    path('api/async/pvsystems/scores/', calculate_system_scores_async, name='system_scores_async'),
+    path('api/async/totals-p_dc/', get_total_calculated_power_async, name='get_total_calculated_power_async'),
+    path('api/async/system-totals/', get_system_totals_async, name='system_totals_async'),
 
 
 ]
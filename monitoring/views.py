@@ -1,18 +1,56 @@
 # monitoring/views.py
 
-from rest_framework import generics, viewsets, status
-from .serializers import UserSerializer, PVSystemSerializer, ElectricalDataSerializer, MeteorologicalDataSerializer
+import asyncio
+import hmac
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from rest_framework import generics, mixins, viewsets, status
+from .serializers import (
+    UserSerializer, PVSystemSerializer, ElectricalDataSerializer, MeteorologicalDataSerializer,
+    ElectricalRollupSerializer, MeteorologicalRollupSerializer, ElectricalReadingSerializer, JobSerializer,
+)
 from django.contrib.auth.models import User
-from django.db.models import Sum, F
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from django.db.models import ExpressionWrapper, F, FloatField
 from rest_framework_simplejwt.views import TokenObtainPairView
-from .models import PVSystem, ElectricalData, MeteorologicalData
+from .models import (
+    PVSystem, ElectricalData, MeteorologicalData, ModeledPower, ElectricalRollup, MeteorologicalRollup, Job,
+    ROLLUP_RESOLUTIONS,
+)
 from rest_framework.permissions import IsAuthenticated,IsAdminUser
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.exceptions import NotFound
-import pandas as pd
-import pvlib
-import numpy as np  # Import numpy
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, ValidationError
+from .modeling import MissingDataError, refresh_fleet_modeled_power, refresh_modeled_power, unmodeled_system_ids
+from .signals import notify_written, notify_written_soon
+from .filters import TimeSeriesFilter, parse_downsample_params, parse_system_param, parse_time_param
+from .downsampling import downsample
+from .loaders import load_frame
+from .pagination import TimeKeysetPagination
+from .parsers import CSVParser
+from .analytics import (
+    electrical_totals, meteorological_totals, model_unmodeled_systems, modeled_power_totals, system_powers,
+    system_scores, system_totals,
+)
+from .cache import CACHED_ENDPOINTS, cache_stats, cached_analytics, lookup, store
+from .exports import write_electrical_hdf5
+from .kpis import KPI_RESOLUTIONS, energy_kpis
+from . import ingestion, jobs, metrics
+from .profiling import bind, phase
+from .renderers import CSVRenderer, NDJSONRenderer, StreamingRenderer, STREAM_CHUNK_SIZE
 
 
 class UserCreate(generics.CreateAPIView):
@@ -70,318 +108,467 @@ class PVSystemViewSet(viewsets.ModelViewSet):
     serializer_class = PVSystemSerializer
     permission_classes = [IsAuthenticated]
 
-class ElectricalDataViewSet(viewsets.ModelViewSet):
+    def perform_update(self, serializer):
+        previous_capacity = serializer.instance.capacity
+        super().perform_update(serializer)
+        # The modeled series scales with capacity
+        if serializer.instance.capacity != previous_capacity:
+            try:
+                refresh_modeled_power(serializer.instance)
+            except MissingDataError:
+                pass
+
+class RawDataMixin:
+    """Tell the derived tables about raw rows written through the API, shortly after (see ``RAW_DATA_NOTIFY_DELAY``)."""
+
+    def notify_raw_data(self, instance):
+        notify_written_soon(type(instance), [instance])
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.notify_raw_data(serializer.instance)
+        metrics.rows_ingested.inc(table=serializer.instance._meta.model_name, path='api')
+
+    def perform_update(self, serializer):
+        previous = type(serializer.instance).objects.get(pk=serializer.instance.pk)
+        super().perform_update(serializer)
+        self.notify_raw_data(previous)
+        self.notify_raw_data(serializer.instance)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        self.notify_raw_data(instance)
+
+def frame_rows(frame):
+    """Rows of ``frame`` as tuples, NaN as None."""
+    return frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+
+class DownsampleMixin:
+    """
+    ``?max_points=<n>`` on list returns at most ``n`` chart points instead of pages of rows.
+
+    Points come from the coarsest rollup resolution that still has ``n``
+    buckets in range, or from the raw rows when none does, and are then
+    reduced with LTTB on ``chart_value`` (``?downsample=minmax`` keeps each
+    bucket's extremes instead). Either way the points carry ``chart_fields``.
+    """
+    chart_fields = []
+    chart_value = None
+    chart_rollup = None
+    chart_rollup_fields = {}
+    chart_requires_system = False
+
+    def list(self, request, *args, **kwargs):
+        max_points, mode = parse_downsample_params(request)
+        if max_points is None:
+            return super().list(request, *args, **kwargs)
+        if self.chart_requires_system and parse_system_param(request) is None:
+            raise ValidationError({'system': 'This parameter is required with max_points.'})
+
+        resolution, queryset = self.get_chart_source(max_points)
+        fields = ['time', *self.chart_fields]
+        frame = downsample(load_frame(queryset.order_by('time'), fields), self.chart_value, max_points, mode)
+        return Response({
+            'resolution': resolution,
+            'results': [dict(zip(fields, row)) for row in frame_rows(frame)],
+        })
+
+    def get_chart_source(self, max_points):
+        for resolution, _ in reversed(ROLLUP_RESOLUTIONS):
+            rollups = self.filter_queryset(self.chart_rollup.objects.filter(resolution=resolution))
+            # Every bucket holds at least one raw row, so raw data never has fewer points than this
+            if rollups.count() >= max_points:
+                return resolution, rollups.annotate(**self.chart_rollup_fields)
+        return 'raw', self.filter_queryset(self.get_queryset())
+
+def rollup_mean(field):
+    return ExpressionWrapper(F(f'{field}_sum') / F('samples'), output_field=FloatField())
+
+class ElectricalDataViewSet(RawDataMixin, DownsampleMixin, viewsets.ModelViewSet):
     queryset = ElectricalData.objects.all()
     serializer_class = ElectricalDataSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [TimeSeriesFilter]
+    pagination_class = TimeKeysetPagination
+    chart_fields = ['p_dc', 'u_dc', 'i1', 't1', 't2']
+    chart_value = 'p_dc'
+    chart_rollup = ElectricalRollup
+    chart_rollup_fields = {field: F(f'mean_{field}') for field in chart_fields}
+    chart_requires_system = True
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, CSVParser])
+    def batch(self, request):
+        """
+        Ingest up to 10,000 readings posted as a JSON array or a CSV body with a header row.
+
+        Invalid rows are reported by index and skipped; the valid ones are
+        written with one ``bulk_create``.
+        """
+        serializer = ElectricalReadingSerializer(data=request.data, many=True)
+        # Only fails for a malformed batch (not a list, empty, too long); row errors are collected
+        serializer.is_valid(raise_exception=True)
+        readings = serializer.save()
+        notify_written(ElectricalData, readings)
+        metrics.rows_ingested.inc(len(readings), table='electricaldata', path='batch')
+        return Response(
+            {'created': len(readings), 'errors': serializer.row_errors},
+            status=status.HTTP_201_CREATED if readings else status.HTTP_400_BAD_REQUEST,
+        )
 
-class MeteorologicalDataViewSet(viewsets.ModelViewSet):
+class MeteorologicalDataViewSet(RawDataMixin, DownsampleMixin, viewsets.ModelViewSet):
     queryset = MeteorologicalData.objects.all()
     serializer_class = MeteorologicalDataSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [TimeSeriesFilter]
+    pagination_class = TimeKeysetPagination
+    chart_fields = ['gti', 'ghi', 'air_temp', 'wind_speed']
+    chart_value = 'gti'
+    chart_rollup = MeteorologicalRollup
+    chart_rollup_fields = {
+        'gti': rollup_mean('gti'),
+        'ghi': rollup_mean('ghi'),
+        'air_temp': F('mean_air_temp'),
+        'wind_speed': F('mean_wind_speed'),
+    }
+
+class RollupList(generics.ListAPIView):
+    """
+    Pre-aggregated series: ``?kind=electrical|meteorological`` (default
+    electrical) at ``?resolution=5min|1h|1d`` (default 1h), filterable with
+    ``system``, ``start`` and ``end`` like the raw series.
+    """
+    permission_classes = [IsAuthenticated]
+    filter_backends = [TimeSeriesFilter]
+    pagination_class = TimeKeysetPagination
+    kinds = {
+        'electrical': (ElectricalRollup, ElectricalRollupSerializer),
+        'meteorological': (MeteorologicalRollup, MeteorologicalRollupSerializer),
+    }
+
+    def get_kind(self):
+        kind = self.request.query_params.get('kind', 'electrical')
+        if kind not in self.kinds:
+            raise ValidationError({'kind': f"Choose one of: {', '.join(self.kinds)}."})
+        return self.kinds[kind]
+
+    def get_queryset(self):
+        resolution = self.request.query_params.get('resolution', '1h')
+        resolutions = [value for value, _ in ROLLUP_RESOLUTIONS]
+        if resolution not in resolutions:
+            raise ValidationError({'resolution': f"Choose one of: {', '.join(resolutions)}."})
+        model, _ = self.get_kind()
+        return model.objects.filter(resolution=resolution)
+
+    def get_serializer_class(self):
+        _, serializer_class = self.get_kind()
+        return serializer_class
+
+class JobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                 viewsets.GenericViewSet):
+    """
+    Background jobs run by ``manage.py run_jobs``. POST ``{"kind", "params"}``
+    to queue one (200 with the existing job when an identical one is queued or
+    running), poll the job for ``status`` and ``progress``, and fetch its
+    output from ``result/`` once it has succeeded. ``?status=`` and ``?kind=``
+    filter the list.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Job.objects.order_by('-id')
+        for param in ('status', 'kind'):
+            if param in self.request.query_params:
+                queryset = queryset.filter(**{param: self.request.query_params[param]})
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, created = jobs.submit(serializer.validated_data['kind'], serializer.validated_data.get('params', {}))
+        return Response(
+            self.get_serializer(job).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    @action(detail=True)
+    def result(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'succeeded':
+            return Response(
+                {'detail': f'Job {job.id} has not succeeded (status: {job.status}).'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if job.kind == 'export':
+            path = jobs.result_path(job)
+            if not os.path.exists(path):
+                raise NotFound('The export file is no longer available.')
+            return FileResponse(
+                open(path, 'rb'), as_attachment=True, filename='electrical.h5', content_type='application/x-hdf5'
+            )
+        return Response(job.result)
+
+PVWATTS_FIELDS = ['time', 'calculated_power', 'current_t1', 'current_t2', 'voltage', 'gti', 'air_temp']
+
+
+def pvwatts_records(rows):
+    """Turn ``(time, calculated_power, t1, t2, u_dc, gti, air_temp)`` rows into API records, lazily."""
+    for time, calculated_power, t1, t2, u_dc, gti, air_temp in rows:
+        yield {
+            'time': time,
+            'calculated_power': calculated_power,
+            'current_t1': t1 or 0,
+            'current_t2': t2 or 0,
+            'voltage': u_dc or 0,
+            'gti': gti or 0,
+            'air_temp': air_temp or 0,
+        }
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer, CSVRenderer])
+@cached_analytics('calculate_pvwatts', system_kwarg='system_id')
 def calculate_pvwatts(request, system_id):
     try:
         system = PVSystem.objects.get(id=system_id)
     except PVSystem.DoesNotExist:
         raise NotFound('System not found')
-
-    # Filter electrical data for the system
-    electrical_data = ElectricalData.objects.filter(system=system)
-
-    if not electrical_data.exists():
-        return Response({'error': 'No electrical data found for this system'})
-
-    # Get the time range from the electrical data
-    start_time = electrical_data.order_by('time').first().time
-    end_time = electrical_data.order_by('-time').first().time
-
-    # Filter meteorological data within the time range
-    meteorological_data = MeteorologicalData.objects.filter(time__range=(start_time, end_time))
-
-    if not meteorological_data.exists():
-        return Response({'error': 'No meteorological data found for the given time range'})
-
-    # Convert to DataFrame for easy manipulation
-    electrical_df = pd.DataFrame.from_records(electrical_data.values())
-    meteorological_df = pd.DataFrame.from_records(meteorological_data.values())
-
-    # Ensure both dataframes have time as the index
-    electrical_df.set_index('time', inplace=True)
-    meteorological_df.set_index('time', inplace=True)
-
-    # Resample to ensure consistent intervals and fill missing values
-    electrical_df = electrical_df.resample('5min').mean().interpolate()
-    meteorological_df = meteorological_df.resample('5min').mean().interpolate()
-
-    # Merge the dataframes
-    merged_df = pd.merge_asof(electrical_df, meteorological_df, left_index=True, right_index=True)
-
-    # Calculate power using PVWatts model
-    p_stc = system.capacity * 1000  # Convert kW to W
-    temp_coeff = -0.005  # Assuming a typical temperature coefficient
-
-    results = []
-    for index, row in merged_df.iterrows():
-        gti = row['gti']
-        air_temp = row['air_temp']
-        wind_speed = row['wind_speed']
-
-        if gti <= 0:
-            results.append({
-                'time': index,
-                'calculated_power': 0,
-                'current_t1': row.get('t1', None),
-                'current_t2': row.get('t2', None),
-                'voltage': row.get('u_dc', None),
-                'gti': gti,
-                'air_temp': air_temp
-            })
-            continue
-
-        # Calculate cell temperature
-        temp_cell = pvlib.temperature.pvsyst_cell(
-            poa_global=gti,
-            temp_air=air_temp,
-            wind_speed=wind_speed
+    max_points, mode = parse_downsample_params(request)
+
+    modeled_power = ModeledPower.objects.filter(system=system)
+    if not modeled_power.exists():
+        # Build the series on first use for systems that were never modeled
+        try:
+            refresh_modeled_power(system)
+        except MissingDataError as exc:
+            return Response({'error': str(exc)})
+
+    fields = ['time', 'calculated_power', 't1', 't2', 'u_dc', 'gti', 'air_temp']
+    modeled_power = modeled_power.order_by('time')
+    if max_points is None:
+        rows = modeled_power.values_list(*fields).iterator(chunk_size=STREAM_CHUNK_SIZE)
+    else:
+        rows = frame_rows(downsample(load_frame(modeled_power, fields), 'calculated_power', max_points, mode))
+
+    records = pvwatts_records(rows)
+    if isinstance(request.accepted_renderer, StreamingRenderer):
+        # ?format=ndjson / ?format=csv: send rows as they are read instead of building the whole list
+        return request.accepted_renderer.streaming_response(
+            records, PVWATTS_FIELDS, asynchronous=isinstance(request._request, ASGIRequest),
         )
-
-        # Calculate DC power using PVWatts model
-        p_dc = pvlib.pvsystem.pvwatts_dc(gti, temp_cell, p_stc, gamma_pdc=temp_coeff)
-
-        # Ensure the calculated power is within valid range
-        if not np.isfinite(p_dc) or np.isnan(p_dc):
-            p_dc = 0  # Set to zero if the value is not finite or NaN
-
-        results.append({
-            'time': index,
-            'calculated_power': p_dc,
-            'current_t1': row.get('t1', None),
-            'current_t2': row.get('t2', None),
-            'voltage': row.get('u_dc', None),
-            'gti': gti,
-            'air_temp': air_temp
-        })
-
-    # Sanitize the results to ensure all values are JSON compliant
-    for result in results:
-        for key, value in result.items():
-            if isinstance(value, float) and (np.isnan(value) or not np.isfinite(value)):
-                result[key] = 0  # Set invalid float values to zero
-
-    return Response(results)
+    return Response(list(records))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_analytics('system_scores')
 def calculate_system_scores(request):
-    systems = PVSystem.objects.all()
-    scores = []
-
-    for system in systems:
-        # Filter electrical data for the system
-        electrical_data = ElectricalData.objects.filter(system=system)
-
-        if not electrical_data.exists():
-            continue
-
-        # Get the time range from the electrical data
-        start_time = electrical_data.order_by('time').first().time
-        end_time = electrical_data.order_by('-time').first().time
-
-        # Filter meteorological data within the time range
-        meteorological_data = MeteorologicalData.objects.filter(time__range=(start_time, end_time))
-
-        if not meteorological_data.exists():
-            continue
-
-        # Convert to DataFrame for easy manipulation
-        electrical_df = pd.DataFrame.from_records(electrical_data.values())
-        meteorological_df = pd.DataFrame.from_records(meteorological_data.values())
-
-        # Ensure both dataframes have time as the index
-        electrical_df.set_index('time', inplace=True)
-        meteorological_df.set_index('time', inplace=True)
-
-        # Resample to ensure consistent intervals and fill missing values
-        electrical_df = electrical_df.resample('5min').mean().interpolate()
-        meteorological_df = meteorological_df.resample('5min').mean().interpolate()
-
-        # Merge the dataframes
-        merged_df = pd.merge_asof(electrical_df, meteorological_df, left_index=True, right_index=True)
-
-        # Calculate power using PVWatts model
-        p_stc = system.capacity * 1000  # Convert kW to W
-        temp_coeff = -0.005  # Assuming a typical temperature coefficient
-
-        total_power_produced = 0
-        for index, row in merged_df.iterrows():
-            gti = row['gti']
-            air_temp = row['air_temp']
-            wind_speed = row['wind_speed']
-
-            if gti <= 0:
-                continue
-
-            # Calculate cell temperature
-            temp_cell = pvlib.temperature.pvsyst_cell(
-                poa_global=gti,
-                temp_air=air_temp,
-                wind_speed=wind_speed
-            )
-
-            # Calculate DC power using PVWatts model
-            p_dc = pvlib.pvsystem.pvwatts_dc(gti, temp_cell, p_stc, gamma_pdc=temp_coeff)
-
-            # Ensure the calculated power is within valid range
-            if np.isfinite(p_dc) and not np.isnan(p_dc):
-                total_power_produced += p_dc
-                print(f"Total power produced: {total_power_produced}")
-
-
-        # Normalize power by system capacity and number of panels
-        normalized_power = total_power_produced / (system.capacity * 1000 * system.number_of_panels)
-
-        # Apply scaling factor
-        score = min(max(normalized_power * 20, 0), 20)  # Adjusting the factor to 20 for better distribution
-
-        scores.append({
-            'system_id': system.id,
-            'name': system.name,
-            'score': score,
-            'capacity': system.capacity,
-            'num_panels': system.number_of_panels
-        })
-
-    return Response(scores)
+    model_unmodeled_systems()
+    return Response(system_scores(PVSystem.objects.all(), modeled_power_totals()))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_analytics('total_calculated_power')
 def get_total_calculated_power(request):
-    systems = PVSystem.objects.all()
-    system_powers = []
-
-    for system in systems:
-        electrical_data = ElectricalData.objects.filter(system=system)
-        if not electrical_data.exists():
-            continue
-
-        start_time = electrical_data.order_by('time').first().time
-        end_time = electrical_data.order_by('-time').first().time
-
-        meteorological_data = MeteorologicalData.objects.filter(time__range=(start_time, end_time))
-        if not meteorological_data.exists():
-            continue
-
-        electrical_df = pd.DataFrame.from_records(electrical_data.values())
-        meteorological_df = pd.DataFrame.from_records(meteorological_data.values())
-
-        electrical_df.set_index('time', inplace=True)
-        meteorological_df.set_index('time', inplace=True)
-
-        electrical_df = electrical_df.resample('5min').mean().interpolate()
-        meteorological_df = meteorological_df.resample('5min').mean().interpolate()
-
-        merged_df = pd.merge_asof(electrical_df, meteorological_df, left_index=True, right_index=True)
-
-        p_stc = system.capacity * 1000  # Convert kW to W
-        temp_coeff = -0.005  # Assuming a typical temperature coefficient
-
-        total_power = 0
-
-        for _, row in merged_df.iterrows():
-            gti = row['gti']
-            air_temp = row['air_temp']
-            wind_speed = row['wind_speed']
-
-            if gti <= 0:
-                continue
-
-            temp_cell = pvlib.temperature.pvsyst_cell(
-                poa_global=gti,
-                temp_air=air_temp,
-                wind_speed=wind_speed
-            )
-
-            p_dc = pvlib.pvsystem.pvwatts_dc(gti, temp_cell, p_stc, gamma_pdc=temp_coeff)
-            if np.isfinite(p_dc) and not np.isnan(p_dc):
-                total_power += p_dc
-
-        system_powers.append({
-            'system_id': system.id,
-            'name': system.name,
-            'total_calculated_power': total_power
-        })
-
-    return Response(system_powers)
+    model_unmodeled_systems()
+    return Response(system_powers(PVSystem.objects.all(), modeled_power_totals()))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_analytics('system_totals')
 def get_system_totals(request):
-    systems = PVSystem.objects.all()
-    system_totals = []
-
-    for system in systems:
-        electrical_data = ElectricalData.objects.filter(system=system)
-        if not electrical_data.exists():
-            continue
-
-        start_time = electrical_data.order_by('time').first().time
-        end_time = electrical_data.order_by('-time').first().time
+    model_unmodeled_systems()
+    return Response(system_totals(
+        PVSystem.objects.all(), modeled_power_totals(), electrical_totals(), meteorological_totals()
+    ))
 
-        meteorological_data = MeteorologicalData.objects.filter(
-            time__range=(start_time, end_time)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_analytics('energy_kpis')
+def get_energy_kpis(request):
+    """
+    Energy, specific yield, performance ratio and availability per bucket of
+    ``?resolution=5min|1h|1d`` (default 1d), filterable with ``system``,
+    ``start`` and ``end``.
+    """
+    resolution = request.query_params.get('resolution', '1d')
+    if resolution not in KPI_RESOLUTIONS:
+        raise ValidationError({'resolution': f"Choose one of: {', '.join(KPI_RESOLUTIONS)}."})
+    system_id = parse_system_param(request)
+    return Response(energy_kpis(
+        resolution,
+        parse_time_param(request, 'start'),
+        parse_time_param(request, 'end'),
+        None if system_id is None else [system_id],
+    ))
+
+# Async variants of the fleet views for the ASGI server. The independent
+# queries run concurrently on a bounded thread pool, systems that were never
+# modeled are modeled concurrently, one per task, and the event loop is never
+# blocked. They share the sync views' cache entries.
+
+analytics_executor = ThreadPoolExecutor(
+    max_workers=settings.ANALYTICS_THREADS, thread_name_prefix='analytics'
+)
+
+async def in_executor(func, *args):
+    """Run ``func`` on the analytics pool, with its own database connection."""
+    def call():
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return await asyncio.get_running_loop().run_in_executor(analytics_executor, bind(call))
+
+async def model_unmodeled_systems_concurrently():
+    system_ids = await in_executor(unmodeled_system_ids)
+    if not system_ids:
+        return
+    if connection.vendor != 'postgresql':
+        # SQLite takes one writer at a time, so model them together instead
+        await in_executor(refresh_fleet_modeled_power, system_ids)
+        return
+    await asyncio.gather(*(
+        in_executor(refresh_fleet_modeled_power, [system_id]) for system_id in system_ids
+    ))
+
+async def serve_fleet_analytics(request, endpoint, *loaders, build):
+    """
+    Authenticate, answer from the cache or run ``loaders`` concurrently and ``build`` the data.
+
+    ``build`` receives the systems followed by each loader's result.
+    """
+    try:
+        request = await sync_to_async(authenticated_request)(request)
+    except APIException as exc:
+        return api_error_response(exc)
+
+    key, data = await in_executor(lookup, endpoint, {}, request.query_params)
+    if data is None:
+        await model_unmodeled_systems_concurrently()
+        systems, *results = await asyncio.gather(
+            in_executor(list, PVSystem.objects.all()),
+            *(in_executor(loader) for loader in loaders),
         )
-        if not meteorological_data.exists():
-            continue
+        data = build(systems, *results)
+        await in_executor(store, key, data)
+    with phase('render'):
+        return JsonResponse(data, safe=False, encoder=JSONEncoder)
 
-        electrical_df = pd.DataFrame.from_records(electrical_data.values())
-        meteorological_df = pd.DataFrame.from_records(meteorological_data.values())
+async def calculate_system_scores_async(request):
+    return await serve_fleet_analytics(request, 'system_scores', modeled_power_totals, build=system_scores)
 
-        electrical_df.set_index('time', inplace=True)
-        meteorological_df.set_index('time', inplace=True)
+async def get_total_calculated_power_async(request):
+    return await serve_fleet_analytics(
+        request, 'total_calculated_power', modeled_power_totals, build=system_powers
+    )
 
-        electrical_df = electrical_df.resample('5min').mean().interpolate()
-        meteorological_df = meteorological_df.resample('5min').mean().interpolate()
+async def get_system_totals_async(request):
+    return await serve_fleet_analytics(
+        request, 'system_totals', modeled_power_totals, electrical_totals, meteorological_totals,
+        build=system_totals,
+    )
 
-        merged_df = pd.merge_asof(electrical_df, meteorological_df, left_index=True, right_index=True)
-
-        p_stc = system.capacity * 1000  # Convert kW to W
-        temp_coeff = -0.005  # Assuming a typical temperature coefficient
-        total_calculated_power = 0
-
-        for _, row in merged_df.iterrows():
-            gti = row['gti']
-            air_temp = row['air_temp']
-            wind_speed = row['wind_speed']
-
-            if gti <= 0:
-                continue
-
-            temp_cell = pvlib.temperature.pvsyst_cell(
-                poa_global=gti,
-                temp_air=air_temp,
-                wind_speed=wind_speed
-            )
-
-            p_dc = pvlib.pvsystem.pvwatts_dc(gti, temp_cell, p_stc, gamma_pdc=temp_coeff)
-            if np.isfinite(p_dc) and not np.isnan(p_dc):
-                total_calculated_power += p_dc
-
-        total_voltage = electrical_data.aggregate(total=Sum('u_dc'))['total'] or 0
-        total_current_t1 = electrical_data.aggregate(total=Sum('t1'))['total'] or 0
-        total_gti = meteorological_data.aggregate(total=Sum('gti'))['total'] or 0
-        total_air_temp = meteorological_data.aggregate(total=Sum('air_temp'))['total'] or 0
-
-        system_totals.append({
-            'system_id': system.id,
-            'name': system.name,
-            'total_voltage': total_voltage,
-            'total_calculated_power': total_calculated_power,
-            'total_current_t1': total_current_t1,
-            'total_gti': total_gti,
-            'total_air_temp': total_air_temp,
-        })
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_cache_stats(request):
+    return Response(cache_stats(CACHED_ENDPOINTS))
+
+@require_GET
+def get_metrics(request):
+    """
+    Every worker's metrics in the Prometheus text format, for scraping.
+
+    Scrapers must send ``METRICS_TOKEN`` as a bearer token or come from one
+    of ``METRICS_ALLOWED_IPS``; with neither set, metrics are only served
+    with ``DEBUG`` on.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    allowed_ips = settings.METRICS_ALLOWED_IPS
+    if not token and not allowed_ips and not settings.DEBUG:
+        return HttpResponse(
+            'Set METRICS_TOKEN or METRICS_ALLOWED_IPS to serve metrics', status=status.HTTP_403_FORBIDDEN,
+            content_type='text/plain; charset=utf-8',
+        )
+    authorized = (
+        (not token and not allowed_ips)
+        or request.META.get('REMOTE_ADDR') in allowed_ips
+        or bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    )
+    if not authorized and token:
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED, headers={'WWW-Authenticate': 'Bearer'})
+    if not authorized:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
-    return Response(system_totals)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_electrical_hdf5(request):
+    """Download electrical data as HDF5, filtered with the same ``system``/``start``/``end`` params as the viewset."""
+    queryset = TimeSeriesFilter().filter_queryset(request, ElectricalData.objects.all(), None)
+    # Spooled to disk rather than memory; the file is removed once the response is closed
+    target = tempfile.TemporaryFile()
+    write_electrical_hdf5(target, queryset)
+    target.seek(0)
+    return FileResponse(target, as_attachment=True, filename='electrical.h5', content_type='application/x-hdf5')
+
+def authenticated_request(request, parsers=()):
+    """Wrap a plain Django request as a DRF request, authenticated as the DRF views require."""
+    request = Request(
+        request,
+        parsers=list(parsers),
+        authenticators=[authentication() for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    if not IsAuthenticated().has_permission(request, None):
+        raise NotAuthenticated()
+    return request
+
+def api_error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return JsonResponse(detail, status=exc.status_code, safe=False)
+
+def validate_readings(request):
+    """
+    Authenticate and validate a batch of electrical readings the way the DRF views do.
+
+    Returns ``(serializer, None)``, or ``(None, response)`` with the error response.
+    """
+    try:
+        request = authenticated_request(request, parsers=[JSONParser(), CSVParser()])
+        serializer = ElectricalReadingSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+    except APIException as exc:
+        return None, api_error_response(exc)
+    return serializer, None
+
+@csrf_exempt
+@require_POST
+async def ingest_electrical(request):
+    """
+    Async counterpart of the batch endpoint for telemetry bursts.
+
+    Valid readings are handed to the write-behind buffer and the request
+    returns 202 without waiting for the insert. When the buffer isn't running
+    (no ASGI lifespan, e.g. under WSGI) they are written before returning
+    (201). A full buffer answers 503 with ``Retry-After``, a batch larger than
+    the whole buffer 413.
+    """
+    serializer, error = await sync_to_async(validate_readings)(request)
+    if error is not None:
+        return error
+    readings = serializer.validated_data
+    if not readings:
+        return JsonResponse({'accepted': 0, 'errors': serializer.row_errors}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        buffered = await ingestion.buffer.put(readings)
+    except ingestion.BatchTooLarge as exc:
+        # Retrying can't help, unlike a full buffer
+        return JsonResponse({'detail': str(exc)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except ingestion.BufferFull as exc:
+        return JsonResponse(
+            {'detail': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'}
+        )
+    return JsonResponse(
+        {'accepted': len(readings), 'errors': serializer.row_errors},
+        status=status.HTTP_202_ACCEPTED if buffered else status.HTTP_201_CREATED,
+    )
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pv_monitoring.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up; runs the ingestion write-behind buffer for the server's lifetime
+from monitoring.ingestion import LifespanMiddleware  # noqa: E402
+
+application = LifespanMiddleware(django_application)
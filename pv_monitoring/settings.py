@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'monitoring.metrics.MetricsMiddleware',
+    'monitoring.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -134,7 +136,7 @@ WSGI_APPLICATION = 'pv_monitoring.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-from decouple import config
+from decouple import Csv, config
 
 DATABASES = {
     'default': {
@@ -148,6 +150,107 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The analytics cache defaults to per-process memory; point it at
+# django.core.cache.backends.filebased.FileBasedCache and a directory (or any
+# other shared backend) to share entries and hit/miss counters between workers.
+# A per-process cache can't see other processes' writes, so it re-reads the
+# data watermarks every ANALYTICS_WATERMARK_TIMEOUT seconds: results may lag
+# writes by other workers and management commands by that long (0: never lag,
+# at the cost of two grouped queries per request).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analytics': {
+        'BACKEND': config('ANALYTICS_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('ANALYTICS_CACHE_LOCATION', default='analytics'),
+        'TIMEOUT': config('ANALYTICS_CACHE_TIMEOUT', cast=int, default=3600),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('ANALYTICS_CACHE_MAX_ENTRIES', cast=int, default=1000),
+        },
+    },
+}
+
+ANALYTICS_WATERMARK_TIMEOUT = config('ANALYTICS_WATERMARK_TIMEOUT', cast=float, default=5)
+
+# Threads the async analytics views run queries and modeling on
+ANALYTICS_THREADS = config('ANALYTICS_THREADS', cast=int, default=8)
+
+# Processes the modeling pipeline runs on (0 or 1: in-process), the span of time per task, and
+# the raw rows a refresh needs before it is worth handing to the pool (small refreshes, like
+# those following a few API writes, stay in-process)
+MODELING_WORKERS = config('MODELING_WORKERS', cast=int, default=0)
+MODELING_CHUNK = config('MODELING_CHUNK', default='30D')
+MODELING_PARALLEL_MIN_ROWS = config('MODELING_PARALLEL_MIN_ROWS', cast=int, default=500000)
+
+# Bytes of the in-process cache of the 5-minute meteo grid shared by the modeling pipeline
+# (0 disables it; the oldest bins are evicted past the cap)
+METEO_GRID_MAX_BYTES = config('METEO_GRID_MAX_BYTES', cast=int, default=64 * 1024 * 1024)
+
+# Seconds rows created, edited or deleted one at a time through the API wait before the
+# modeled power and rollups they affect are refreshed, coalesced with other such writes
+# (0 refreshes them within the request)
+RAW_DATA_NOTIFY_DELAY = config('RAW_DATA_NOTIFY_DELAY', cast=float, default=1.0)
+
+# Write-behind buffer for /api/ingest/electrical/ (only active under an ASGI server with lifespan events)
+INGEST_BUFFER_MAX_SIZE = config('INGEST_BUFFER_MAX_SIZE', cast=int, default=50_000)
+INGEST_BUFFER_FLUSH_SIZE = config('INGEST_BUFFER_FLUSH_SIZE', cast=int, default=5000)
+INGEST_BUFFER_FLUSH_INTERVAL = config('INGEST_BUFFER_FLUSH_INTERVAL', cast=float, default=1.0)
+INGEST_BUFFER_PUT_TIMEOUT = config('INGEST_BUFFER_PUT_TIMEOUT', cast=float, default=2.0)
+# Attempts at writing a buffered batch before it is dropped, and the delay before the first
+# retry (doubled per attempt)
+INGEST_BUFFER_MAX_ATTEMPTS = config('INGEST_BUFFER_MAX_ATTEMPTS', cast=int, default=5)
+INGEST_BUFFER_RETRY_DELAY = config('INGEST_BUFFER_RETRY_DELAY', cast=float, default=0.5)
+
+# Background jobs run by `manage.py run_jobs`: attempts per job, base retry delay (doubled
+# per attempt), seconds between the heartbeats workers send for running jobs, seconds
+# without a heartbeat before a running job is requeued, where export jobs write their
+# files and how many hours those files are kept
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', cast=int, default=3)
+JOB_RETRY_DELAY = config('JOB_RETRY_DELAY', cast=float, default=30)
+JOB_HEARTBEAT_INTERVAL = config('JOB_HEARTBEAT_INTERVAL', cast=float, default=30)
+JOB_STALE_AFTER = config('JOB_STALE_AFTER', cast=float, default=300)
+JOB_RESULTS_DIR = config('JOB_RESULTS_DIR', default=str(BASE_DIR / 'job_results'))
+JOB_RESULTS_RETAIN_HOURS = config('JOB_RESULTS_RETAIN_HOURS', cast=float, default=168)
+
+# PostgreSQL monthly partitions of the electrical table (`manage.py partition_electrical`):
+# months created ahead of the current one, and months kept before older partitions are
+# detached (0 keeps everything)
+PARTITION_MONTHS_AHEAD = config('PARTITION_MONTHS_AHEAD', cast=int, default=3)
+PARTITION_RETAIN_MONTHS = config('PARTITION_RETAIN_MONTHS', cast=int, default=0)
+
+# Cold tier: raw rows older than ARCHIVE_AFTER_MONTHS whole months are moved to HDF5 files
+# under ARCHIVE_DIR by `manage.py archive_raw_data` (0 disables archiving)
+ARCHIVE_DIR = config('ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+ARCHIVE_AFTER_MONTHS = config('ARCHIVE_AFTER_MONTHS', cast=int, default=0)
+
+# Energy KPIs (/api/kpis/): readings further apart than this many seconds are an outage
+# rather than an interval to integrate over
+KPI_MAX_GAP = config('KPI_MAX_GAP', cast=float, default=600)
+
+# Per-request profiling: Server-Timing headers and a JSON line per request on the
+# monitoring.profiling logger. With PROFILING_SAMPLE_THRESHOLD (ms) above 0 requests are
+# also sampled every PROFILING_SAMPLE_INTERVAL ms, and slower ones leave folded stacks
+# (flamegraph.pl / speedscope input) under PROFILING_DIR
+PROFILING_ENABLED = config('PROFILING_ENABLED', cast=bool, default=False)
+PROFILING_SAMPLE_THRESHOLD = config('PROFILING_SAMPLE_THRESHOLD', cast=float, default=0)
+PROFILING_SAMPLE_INTERVAL = config('PROFILING_SAMPLE_INTERVAL', cast=float, default=5)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+
+# Prometheus metrics served at /metrics (see monitoring/metrics.py). Each worker counts in
+# memory; set METRICS_DIR to a directory all workers can write to so that any of them
+# serves the totals, their snapshots being written every METRICS_FLUSH_INTERVAL seconds.
+# Scrapes must send METRICS_TOKEN as a bearer token or come from one of METRICS_ALLOWED_IPS
+# (comma-separated); with neither set, /metrics is only served with DEBUG on.
+METRICS_ENABLED = config('METRICS_ENABLED', cast=bool, default=True)
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', cast=float, default=5.0)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', cast=Csv(), default='')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -199,6 +302,10 @@ LOGGING = {
             'level': 'ERROR',
             'class': 'logging.StreamHandler',
         },
+        'profiling': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
+        },
     },
     'loggers': {
         'django': {
@@ -206,5 +313,10 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'monitoring.profiling': {
+            'handlers': ['profiling'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }